@@ -4,11 +4,394 @@ import requests
 import re
 import json
 import base64
+import bisect
 import glob
-from urllib.parse import parse_qs
+from itertools import chain
+from urllib.parse import parse_qs, urlsplit
 from robot.api.deco import keyword
 from browsermobproxy import Client
 
+HAR_SYNC_MODES = ('full', 'rotate')
+_MISSING = object()
+
+
+def _url_matches(url, url_pattern=None, exact_match=False, url_contains=None):
+    """Apply the keywords' URL filter: substring, exact URL, or regex search."""
+    if url_contains:
+        # Simple substring match
+        return url_contains in url
+    if url_pattern:
+        if exact_match:
+            # Exact match
+            return url == url_pattern
+        # Regex pattern match
+        return bool(re.search(url_pattern, url))
+    return True
+
+
+def _normalize_path(path):
+    """URL path with repeated and trailing slashes removed ('' -> '/')."""
+    return '/' + '/'.join(segment for segment in path.split('/') if segment)
+
+
+def _normalize_prefix(prefix):
+    """
+    Path prefix normalized like paths: leading slash added, repeated slashes
+    collapsed. The last segment stays partial ('/api/' = below /api, '/ap' = '/ap...').
+    """
+    segments = prefix.split('/')
+    parent = '/'.join(segment for segment in segments[:-1] if segment)
+    return '/' + (parent + '/' if parent else '') + segments[-1]
+
+
+def _normalize_suffix(suffix):
+    """
+    Path suffix normalized like paths: repeated and trailing slashes removed.
+    The first segment stays partial ('ser/login' = '...ser/login').
+    """
+    segments = suffix.split('/')
+    rest = [segment for segment in segments[1:] if segment]
+    if rest:
+        return segments[0] + '/' + '/'.join(rest)
+    return segments[0] or '/'
+
+
+def _json_field(body, path):
+    """Value at dotted `path` in a parsed JSON body ('items.0.id'), or _MISSING."""
+    for part in path.split('.'):
+        if isinstance(body, list) and part.isdigit() and int(part) < len(body):
+            body = body[int(part)]
+        elif isinstance(body, dict) and part in body:
+            body = body[part]
+        else:
+            return _MISSING
+    return body
+
+
+def _field_matches(value, expected):
+    """
+    Compare a JSON field with an expected value: callables are predicates, and
+    strings (as passed from Robot) also match the field's JSON text ('10', 'true').
+    """
+    if value is _MISSING:
+        return False
+    if callable(expected):
+        return bool(expected(value))
+    if value == expected:
+        return True
+    return isinstance(expected, str) and not isinstance(value, str) and json.dumps(value) == expected
+
+
+class _TrieNode:
+    __slots__ = ('children', 'positions')
+
+    def __init__(self):
+        self.children = {}
+        self.positions = []
+
+
+class _PathTrie:
+    """
+    Trie of URL path segments. Every node keeps the store positions of all paths
+    below it, in capture order, so a prefix lookup is one walk down the trie.
+    Built over reversed segments it answers suffix lookups.
+    """
+    def __init__(self):
+        self.root = _TrieNode()
+
+    def add(self, segments, position):
+        node = self.root
+        node.positions.append(position)
+        for segment in segments:
+            node = node.children.setdefault(segment, _TrieNode())
+            node.positions.append(position)
+
+    def find(self, segments, partial='', match=str.startswith):
+        """
+        Positions of the paths starting with `segments` whose next segment
+        `match`es `partial` (any path below `segments` when partial is empty).
+        """
+        node = self.root
+        for segment in segments:
+            node = node.children.get(segment)
+            if node is None:
+                return []
+        if not partial:
+            return node.positions
+        postings = [child.positions for key, child in node.children.items() if match(key, partial)]
+        if len(postings) == 1:
+            return postings[0]
+        return sorted(chain.from_iterable(postings))
+
+
+def _parse_response(entry):
+    """Response metadata and body of a HAR entry, JSON bodies parsed."""
+    url = entry['request']['url']
+    response = entry['response']
+    content = response.get('content', {})
+    body_data = {
+        'url': url,
+        'method': entry['request']['method'],
+        'status': response['status'],
+        'mimeType': content.get('mimeType', ''),
+        'size': content.get('size', 0),
+        'body': None
+    }
+    # Extract body content if available
+    if 'text' in content:
+        body_text = content['text']
+        encoding = content.get('encoding', '')
+        if encoding == 'base64':
+            try:
+                body_data['body'] = base64.b64decode(body_text).decode('utf-8')
+            except Exception as e:
+                body_data['body'] = f"Error decoding base64: {e}"
+        else:
+            body_data['body'] = body_text
+        # Try to parse JSON if content type suggests it
+        if 'application/json' in body_data['mimeType'] and body_data['body']:
+            try:
+                body_data['json'] = json.loads(body_data['body'])
+            except json.JSONDecodeError as err:
+                # Entries are parsed once on capture, a bad body must not break the other entries
+                body_data['json_error'] = f"Error decoding: {err}"
+    return body_data
+
+
+def _has_response(entry):
+    """False for an entry BrowserMob Proxy recorded while its request was still in flight (status 0)."""
+    return bool(entry.get('response', {}).get('status'))
+
+
+def _parse_request(entry):
+    """Request metadata and payload of a HAR entry, JSON and form payloads parsed."""
+    request = entry['request']
+    url = request['url']
+    # Extract headers as dict
+    headers = {}
+    for header in request.get('headers', []):
+        headers[header['name']] = header['value']
+    # Extract query parameters
+    query_params = {}
+    for param in request.get('queryString', []):
+        query_params[param['name']] = param['value']
+    payload_data = {
+        'url': url,
+        'method': request['method'],
+        'headers': headers,
+        'query_params': query_params,
+        'content_type': headers.get('Content-Type', ''),
+        'payload': None,
+        'payload_size': request.get('bodySize', 0)
+    }
+    # Extract request payload if available
+    post_data = request.get('postData', {})
+    if post_data:
+        mime_type = post_data.get('mimeType', '')
+        payload_data['content_type'] = mime_type
+        # Handle different payload types
+        if 'text' in post_data:
+            payload_text = post_data['text']
+            payload_data['payload'] = payload_text
+            # Try to parse JSON
+            if 'application/json' in mime_type and payload_text:
+                try:
+                    payload_data['json'] = json.loads(payload_text)
+                except json.JSONDecodeError:
+                    pass
+            # Try to parse form data
+            elif 'application/x-www-form-urlencoded' in mime_type and payload_text:
+                try:
+                    payload_data['form_data'] = parse_qs(payload_text, keep_blank_values=True)
+                except Exception:
+                    pass
+        # Handle form parameters
+        elif 'params' in post_data:
+            form_params = {}
+            for param in post_data['params']:
+                form_params[param['name']] = param['value']
+            payload_data['form_data'] = form_params
+            payload_data['payload'] = '&'.join([f"{k}={v}" for k, v in form_params.items()])
+    return payload_data
+
+
+class CaptureStore:
+    """
+    Local store of the HAR entries captured so far.
+
+    Entries pulled from BrowserMob Proxy are parsed once, when they are added,
+    into their request payload and response body records; keywords then read
+    the parsed records instead of re-downloading and re-parsing the whole HAR.
+
+    Entries are also indexed when added: by full URL, host, normalized path,
+    method and status, plus path segment tries for prefix and suffix lookups.
+    Index lookups return store positions in capture order.
+
+    Entries added while their request was still in flight (response status 0)
+    are remembered in `in_flight`, and replaced when a later HAR holds their
+    response.
+    """
+    def __init__(self):
+        self.clear()
+
+    def clear(self):
+        self.entries = []
+        self.requests = []
+        self.responses = []
+        self.pages = []
+        self.creator = {'name': 'BrowserMob Proxy', 'version': ''}
+        # (url, host, normalized path, method, status) per position
+        self.keys = []
+        self.by_url = {}
+        self.by_host = {}
+        self.by_path = {}
+        self.by_method = {}
+        self.by_status = {}
+        self.prefixes = _PathTrie()
+        self.suffixes = _PathTrie()
+        # Positions of entries stored without their response
+        self.in_flight = []
+
+    def add_har(self, har, skip=0):
+        """
+        Add the entries of a HAR dict, ignoring its first `skip` entries (already stored).
+        Stored in-flight entries among those first `skip` are re-parsed if the HAR now has their response.
+        """
+        log = (har or {}).get('log', {})
+        self.creator = log.get('creator', self.creator)
+        known_pages = {page.get('id') for page in self.pages}
+        self.pages.extend(page for page in log.get('pages', []) if page.get('id') not in known_pages)
+        entries = log.get('entries', [])
+        if skip and self.in_flight:
+            in_flight = []
+            for position in self.in_flight:
+                entry = entries[position] if position < min(skip, len(entries)) else None
+                if entry is not None and _has_response(entry) and entry['request']['url'] == self.keys[position][0]:
+                    self.replace_entry(position, entry)
+                else:
+                    in_flight.append(position)
+            self.in_flight = in_flight
+        for entry in entries[skip:]:
+            self.add_entry(entry)
+
+    def add_entry(self, entry):
+        position = len(self.entries)
+        self.entries.append(entry)
+        self.requests.append(_parse_request(entry))
+        self.responses.append(_parse_response(entry))
+        if not _has_response(entry):
+            self.in_flight.append(position)
+        url = entry['request']['url']
+        parts = urlsplit(url)
+        host = (parts.hostname or '').lower()
+        path = _normalize_path(parts.path)
+        method = entry['request']['method'].upper()
+        status = entry['response'].get('status')
+        self.keys.append((url, host, path, method, status))
+        for index, key in ((self.by_url, url), (self.by_host, host), (self.by_path, path),
+                           (self.by_method, method), (self.by_status, status)):
+            index.setdefault(key, []).append(position)
+        segments = path.split('/')[1:] if path != '/' else []
+        self.prefixes.add(segments, position)
+        self.suffixes.add(segments[::-1], position)
+
+    def replace_entry(self, position, entry):
+        """Replace the stored entry at `position` by a later copy of it, e.g. once its response arrived."""
+        self.entries[position] = entry
+        self.requests[position] = _parse_request(entry)
+        self.responses[position] = _parse_response(entry)
+        url, host, path, method, old_status = self.keys[position]
+        status = entry['response'].get('status')
+        if status != old_status:
+            self.keys[position] = (url, host, path, method, status)
+            postings = self.by_status[old_status]
+            postings.remove(position)
+            if not postings:
+                del self.by_status[old_status]
+            bisect.insort(self.by_status.setdefault(status, []), position)
+
+    def combined(self, position):
+        """Request and response records of one entry, with its timings."""
+        entry, req = self.entries[position], self.requests[position]
+        return {
+            'url': req['url'],
+            'method': req['method'],
+            'request': req,
+            'response': self.responses[position],
+            'startedDateTime': entry.get('startedDateTime'),
+            'time': entry.get('time'),
+            'timings': entry.get('timings', {})
+        }
+
+    def select(self, url=None, host=None, path=None, path_prefix=None, path_suffix=None, method=None,
+               status=None, url_contains=None):
+        """
+        Positions of the entries matching every given filter, in capture order.
+        The most selective index gives the candidates, which are then checked
+        against the other filters.
+        """
+        host = host.lower() if host else None
+        path = _normalize_path(path) if path else None
+        path_prefix = _normalize_prefix(path_prefix) if path_prefix else None
+        path_suffix = _normalize_suffix(path_suffix) if path_suffix else None
+        method = method.upper() if method else None
+        status = int(status) if status not in (None, '') else None
+        postings = []
+        if url:
+            postings.append(self.by_url.get(url, []))
+        if host:
+            postings.append(self.by_host.get(host, []))
+        if path:
+            postings.append(self.by_path.get(path, []))
+        if method:
+            postings.append(self.by_method.get(method, []))
+        if status is not None:
+            postings.append(self.by_status.get(status, []))
+        if path_prefix:
+            # '/api/v1/us' -> below /api/v1, next segment starting with 'us'
+            parts = path_prefix.split('/')
+            postings.append(self.prefixes.find(parts[1:-1], parts[-1]))
+        if path_suffix:
+            # 'ser/login' -> above /login, previous segment ending with 'ser'
+            parts = path_suffix.split('/')
+            postings.append(self.suffixes.find([part for part in reversed(parts[1:]) if part], parts[0],
+                                               str.endswith))
+        candidates = min(postings, key=len) if postings else range(len(self.keys))
+        positions = []
+        for position in candidates:
+            key_url, key_host, key_path, key_method, key_status = self.keys[position]
+            if ((url and key_url != url) or (host and key_host != host) or (path and key_path != path)
+                    or (method and key_method != method) or (status is not None and key_status != status)
+                    or (path_prefix and not key_path.startswith(path_prefix))
+                    or (path_suffix and not key_path.endswith(path_suffix))
+                    or (url_contains and url_contains not in key_url)):
+                continue
+            positions.append(position)
+        return positions
+
+    def endpoint(self, endpoint_path):
+        """Positions of the entries whose URL ends with `endpoint_path`, query string included."""
+        if '/' not in endpoint_path or any(char in endpoint_path for char in '?#:'):
+            # Could end inside the host or the query string, not only the path
+            candidates = range(len(self.keys))
+        else:
+            # The part before the first '/' may belong to the host, so it only narrows via the check below
+            parts = endpoint_path.split('/')
+            candidates = self.suffixes.find([part for part in reversed(parts[1:]) if part])
+        return [position for position in candidates if self.keys[position][0].endswith(endpoint_path)]
+
+    def positions(self, url_pattern=None, exact_match=False, url_contains=None):
+        """Positions matching the extraction keywords' URL filter."""
+        if not url_contains and url_pattern and exact_match:
+            return self.by_url.get(url_pattern, [])
+        return [position for position, key in enumerate(self.keys)
+                if _url_matches(key[0], url_pattern, exact_match, url_contains)]
+
+    def har(self):
+        """The stored entries as a HAR dict."""
+        return {'log': {'version': '1.2', 'creator': self.creator, 'pages': self.pages, 'entries': self.entries}}
+
+
 class SeleniumHTTPInterceptor:
     """
     Robot Framework library to intercept HTTP requests in Selenium tests
@@ -31,6 +414,9 @@ class SeleniumHTTPInterceptor:
     - Support for both proxy-based capture and direct HTTP requests
     - Connect to a running BrowserMob Proxy service (no local JAR required)
     - Automatic content type detection and parsing
+    - Incremental capture: only entries recorded since the last keyword are
+      fetched from the proxy, and each entry is parsed once
+    - Indexed queries by host, path, path prefix/suffix, method, status and JSON fields
 
     Setup:
     1. Deploy BrowserMob Proxy as a service or use an existing running instance.
@@ -86,6 +472,9 @@ class SeleniumHTTPInterceptor:
     - Get Request And Response Data
     - Get Request And Response Data By Path Exact
 
+    Traffic Queries:
+    - Query Traffic
+
     Direct HTTP Requests:
     - Fetch Response Body Directly
 
@@ -113,6 +502,19 @@ class SeleniumHTTPInterceptor:
     ##### Clean up
     `Cleanup`
 
+    ### *Capture sync*:
+    Keywords first pull the entries recorded since the previous keyword into a
+    local store (`har_sync` library argument):
+    - `full` (default): the whole HAR is downloaded every time, but only
+      entries not yet stored are parsed. A request still in flight at a sync
+      is stored without its response and re-parsed at a later sync once the
+      proxy has recorded its response.
+    - `rotate`: the proxy's HAR is swapped for a new empty one and the old
+      one returned, so each sync only transfers new entries and the proxy's
+      memory stays small. A request still in flight at that moment keeps no
+      response: the proxy completes it in the HAR already handed over. Only
+      use it when traffic is read once the page has settled.
+
     ### *Troubleshooting*:
     - Ensure BROWSERMOB_PROXY_URL points to a reachable service (host:port)
     - If response bodies are empty, ensure capture_content=${True} is set
@@ -122,7 +524,7 @@ class SeleniumHTTPInterceptor:
     ##########################
     # INITIALIZATION
     ##########################
-    def __init__(self, log_directory=None):
+    def __init__(self, log_directory=None, har_sync='full'):
         """
         Initialize the SeleniumHTTPInterceptor library.
 
@@ -133,7 +535,14 @@ class SeleniumHTTPInterceptor:
         \n*Args*:
         \n`log_directory` (str, optional): Path for log storage. Defaults to
         `<cwd>/logs/browsermob` if not provided.
+        \n`har_sync` (str, optional): `full` (default) or `rotate`, see *Capture sync*.
         """
+        if har_sync not in HAR_SYNC_MODES:
+            raise ValueError(f"har_sync must be one of {HAR_SYNC_MODES}, got '{har_sync}'")
+        self.har_sync = har_sync
+        self.capture = CaptureStore()
+        self.capture_label = None
+        self.capture_options = {}
         # Get BrowserMob Proxy URL from environment
         self.bmp_url = os.getenv("BROWSERMOB_PROXY_URL", "http://localhost:9090")
         # Validate URL format
@@ -198,7 +607,30 @@ class SeleniumHTTPInterceptor:
     def clear_har_data(self, label="cleared"):
         """Clear captured HAR data to free memory."""
         if self.proxy:
-            self.proxy.new_har(label)
+            self.capture_label = label
+            self.proxy.new_har(label, self.capture_options)
+        self.capture.clear()
+
+    def sync_capture(self):
+        """
+        Pull the entries recorded since the last sync into the local capture store.
+
+        \n*Returns*:
+        CaptureStore: the local store.
+
+        \n*Raises*:
+        RuntimeError: If proxy client is not initialized.
+        """
+        if not self.proxy:
+            raise RuntimeError("Proxy not initialized. Call Start Browser With Proxy first.")
+        if self.har_sync == 'rotate':
+            # Returns the HAR recorded so far and starts an empty one
+            status, har = self.proxy.new_har(self.capture_label, self.capture_options)
+            if har:
+                self.capture.add_har(har)
+        else:
+            self.capture.add_har(self.proxy.har, skip=len(self.capture.entries))
+        return self.capture
 
     ##########################
     # BROWSER & PROXY CONTROL
@@ -297,6 +729,7 @@ class SeleniumHTTPInterceptor:
         if self.proxy:
             self.proxy.close()
             self.proxy = None
+        self.capture.clear()
 
     ##########################
     # TRAFFIC CAPTURE
@@ -325,7 +758,10 @@ class SeleniumHTTPInterceptor:
             options['captureHeaders'] = True
         if capture_binary_content:
             options['captureBinaryContent'] = True
+        self.capture_label = label
+        self.capture_options = options
         self.proxy.new_har(label, options)
+        self.capture.clear()
 
     @keyword
     def get_requests(self):
@@ -337,9 +773,7 @@ class SeleniumHTTPInterceptor:
         \n*Raises*:
         RuntimeError: If proxy client is not initialized.
         """
-        if not self.proxy:
-            raise RuntimeError("Proxy not initialized. Call Start Browser With Proxy first.")
-        return self.proxy.har
+        return self.sync_capture().har()
 
     ##########################
     # RESPONSE EXTRACTION
@@ -359,55 +793,9 @@ class SeleniumHTTPInterceptor:
         \n*Raises*:
         RuntimeError: If proxy client is not initialized.
         """
-        if not self.proxy:
-            raise RuntimeError("Proxy not initialized. Call Start Browser With Proxy first.")
-        har_data = self.proxy.har
-        response_bodies = []
-        for entry in har_data.get('log', {}).get('entries', []):
-            url = entry['request']['url']
-            # Filter by URL pattern/match if provided
-            should_include = True
-            if url_contains:
-                # Simple substring match
-                should_include = url_contains in url
-            elif url_pattern:
-                if exact_match:
-                    # Exact match
-                    should_include = url == url_pattern
-                else:
-                    # Regex pattern match (original behavior)
-                    should_include = bool(re.search(url_pattern, url))
-            if not should_include:
-                continue
-            response = entry['response']
-            content = response.get('content', {})
-            body_data = {
-                'url': url,
-                'method': entry['request']['method'],
-                'status': response['status'],
-                'mimeType': content.get('mimeType', ''),
-                'size': content.get('size', 0),
-                'body': None
-            }
-            # Extract body content if available
-            if 'text' in content:
-                body_text = content['text']
-                encoding = content.get('encoding', '')
-                if encoding == 'base64':
-                    try:
-                        body_data['body'] = base64.b64decode(body_text).decode('utf-8')
-                    except Exception as e:
-                        body_data['body'] = f"Error decoding base64: {e}"
-                else:
-                    body_data['body'] = body_text
-                # Try to parse JSON if content type suggests it
-                if 'application/json' in body_data['mimeType'] and body_data['body']:
-                    try:
-                        body_data['json'] = json.loads(body_data['body'])
-                    except json.JSONDecodeError as err:
-                        raise json.JSONDecodeError(f"Error decoding: {err}")
-            response_bodies.append(body_data)
-        return response_bodies
+        capture = self.sync_capture()
+        return [capture.responses[position]
+                for position in capture.positions(url_pattern, exact_match, url_contains)]
 
     @keyword
     def get_response_bodies_by_url_exact(self, exact_url):
@@ -425,7 +813,8 @@ class SeleniumHTTPInterceptor:
         
         For example: endpoint_path='/validatePassword' will match any URL ending with that path
         """
-        return self.get_response_bodies(url_pattern=f"{re.escape(endpoint_path)}$")
+        capture = self.sync_capture()
+        return [capture.responses[position] for position in capture.endpoint(endpoint_path)]
 
     ##########################
     # REQUEST EXTRACTION
@@ -445,74 +834,9 @@ class SeleniumHTTPInterceptor:
         \n*Raises*:
         - RuntimeError: If proxy client is not initialized.
         """
-        if not self.proxy:
-            raise RuntimeError("Proxy not initialized. Call Start Browser With Proxy first.")
-        har_data = self.proxy.har
-        request_payloads = []
-        for entry in har_data.get('log', {}).get('entries', []):
-            url = entry['request']['url']
-            # Filter by URL pattern/match if provided
-            should_include = True
-            if url_contains:
-                # Simple substring match
-                should_include = url_contains in url
-            elif url_pattern:
-                if exact_match:
-                    # Exact match
-                    should_include = url == url_pattern
-                else:
-                    # Regex pattern match
-                    should_include = bool(re.search(url_pattern, url))
-            if not should_include:
-                continue
-            request = entry['request']
-            # Extract headers as dict
-            headers = {}
-            for header in request.get('headers', []):
-                headers[header['name']] = header['value']
-            # Extract query parameters
-            query_params = {}
-            for param in request.get('queryString', []):
-                query_params[param['name']] = param['value']
-            payload_data = {
-                'url': url,
-                'method': request['method'],
-                'headers': headers,
-                'query_params': query_params,
-                'content_type': headers.get('Content-Type', ''),
-                'payload': None,
-                'payload_size': request.get('bodySize', 0)
-            }
-            # Extract request payload if available
-            post_data = request.get('postData', {})
-            if post_data:
-                mime_type = post_data.get('mimeType', '')
-                payload_data['content_type'] = mime_type
-                # Handle different payload types
-                if 'text' in post_data:
-                    payload_text = post_data['text']
-                    payload_data['payload'] = payload_text
-                    # Try to parse JSON
-                    if 'application/json' in mime_type and payload_text:
-                        try:
-                            payload_data['json'] = json.loads(payload_text)
-                        except json.JSONDecodeError:
-                            pass
-                    # Try to parse form data
-                    elif 'application/x-www-form-urlencoded' in mime_type and payload_text:
-                        try:
-                            payload_data['form_data'] = parse_qs(payload_text, keep_blank_values=True)
-                        except Exception:
-                            pass
-                # Handle form parameters
-                elif 'params' in post_data:
-                    form_params = {}
-                    for param in post_data['params']:
-                        form_params[param['name']] = param['value']
-                    payload_data['form_data'] = form_params
-                    payload_data['payload'] = '&'.join([f"{k}={v}" for k, v in form_params.items()])
-            request_payloads.append(payload_data)
-        return request_payloads
+        capture = self.sync_capture()
+        return [capture.requests[position]
+                for position in capture.positions(url_pattern, exact_match, url_contains)]
 
     @keyword
     def get_request_payloads_by_url_exact(self, exact_url):
@@ -527,7 +851,8 @@ class SeleniumHTTPInterceptor:
     @keyword
     def get_request_payloads_by_endpoint(self, endpoint_path):
         """Get request payloads for requests ending with the specified endpoint path."""
-        return self.get_request_payloads(url_pattern=f"{re.escape(endpoint_path)}$")
+        capture = self.sync_capture()
+        return [capture.requests[position] for position in capture.endpoint(endpoint_path)]
 
     ##########################
     # COMBINED DATA
@@ -541,7 +866,8 @@ class SeleniumHTTPInterceptor:
             \n-`exact_match`: If True with url_pattern, requires exact URL match
             \n-`url_contains`: Simple substring match for URLs (alternative to regex)
         \n*Returns*:
-            List of dictionaries with both request and response data
+            List of dictionaries with both request and response data, one per captured entry in
+            capture order, with the entry's `startedDateTime`, `time` (ms) and `timings`
         \n*Usage Examples*:
             \n#### Regex match (default) - matches URLs containing the pattern
             \n`${data}=    Get Request And Response Data    url_pattern=/registration`
@@ -550,25 +876,9 @@ class SeleniumHTTPInterceptor:
             \n#### Simple substring match  
             \n`${data}=    Get Request And Response Data    url_contains=/registration`
         """
-        request_payloads = self.get_request_payloads(url_pattern, exact_match, url_contains)
-        response_bodies = self.get_response_bodies(url_pattern, exact_match, url_contains)
-        # Merge request and response data by URL and timestamp
-        combined_data = []
-        for req in request_payloads:
-            # Find matching response
-            matching_response = None
-            for resp in response_bodies:
-                if resp['url'] == req['url'] and resp['method'] == req['method']:
-                    matching_response = resp
-                    break
-            combined_entry = {
-                'url': req['url'],
-                'method': req['method'],
-                'request': req,
-                'response': matching_response
-            }
-            combined_data.append(combined_entry)
-        return combined_data
+        capture = self.sync_capture()
+        # Each HAR entry holds both sides, so repeated calls to the same URL keep their own response
+        return [capture.combined(position) for position in capture.positions(url_pattern, exact_match, url_contains)]
     
     @keyword
     def get_request_and_response_data_by_path_exact(self, exact_path):
@@ -592,6 +902,49 @@ class SeleniumHTTPInterceptor:
         pattern = f"{escaped_path}(?:\\?.*)?$"  # Match path followed by optional query params and end of string
         return self.get_request_and_response_data(url_pattern=pattern)
 
+    ##########################
+    # TRAFFIC QUERIES
+    ##########################
+    @keyword
+    def query_traffic(self, host=None, path=None, path_prefix=None, path_suffix=None, method=None, status=None,
+                      url_contains=None, **json_fields):
+        """
+        Find captured requests by any combination of filters, using the capture indexes.
+        \n*Args*:
+            \n-`host`: Host name, case-insensitive, without port
+            \n-`path`: URL path, compared after removing repeated and trailing slashes
+            \n-`path_prefix`: Start of the path, e.g. `/api/v1/` (below /api/v1) or `/api/v` (/api/v1, /api/v2...),
+            normalized like the path (leading slash added, repeated slashes collapsed)
+            \n-`path_suffix`: End of the path, e.g. `/validatePassword`, normalized like the path
+            (repeated and trailing slashes removed)
+            \n-`method`: HTTP method
+            \n-`status`: Response status code
+            \n-`url_contains`: Substring of the full URL
+            \n-`request.<field>` / `response.<field>`: Value of a dotted field of the parsed JSON
+            request payload or response body (e.g. `request.user.id=42`, `response.items.0.status=OK`).
+            A string also matches the field's JSON text, so `request.amount=10` matches the number 10.
+        \n*Returns*:
+            List of dictionaries as returned by `Get Request And Response Data`, in capture order
+        \n*Usage Examples*:
+            \n`${deposits}=    Query Traffic    method=POST    path_prefix=/cashier/    status=200`
+            \n`${logins}=    Query Traffic    path_suffix=/login    request.username=testuser    response.success=true`
+        """
+        body_filters = []
+        for name, expected in json_fields.items():
+            side, _, field = name.partition('.')
+            if side not in ('request', 'response') or not field:
+                raise ValueError(f"Unknown filter '{name}', JSON filters are 'request.<field>' or 'response.<field>'")
+            body_filters.append((side, field, expected))
+        capture = self.sync_capture()
+        combined_data = []
+        for position in capture.select(host=host, path=path, path_prefix=path_prefix, path_suffix=path_suffix,
+                                       method=method, status=status, url_contains=url_contains):
+            combined = capture.combined(position)
+            if all(_field_matches(_json_field(combined[side].get('json', _MISSING), field), expected)
+                   for side, field, expected in body_filters):
+                combined_data.append(combined)
+        return combined_data
+
     ##########################
     # DIRECT HTTP REQUESTS
     ##########################
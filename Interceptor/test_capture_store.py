@@ -0,0 +1,161 @@
+import random
+from urllib.parse import urlsplit
+
+import pytest
+
+pytest.importorskip('robot')
+pytest.importorskip('browsermobproxy')
+pytest.importorskip('requests')
+
+from SeleniumHTTPInterceptor_final import CaptureStore, SeleniumHTTPInterceptor, _normalize_path
+
+SEGMENTS = ['api', 'v1', 'v2', 'users', 'login', 'validatePassword', 'cashier', 'deposit']
+
+
+def entry(url, method='GET', status=200, request_json=None, response_json=None, time=0):
+    request = {'url': url, 'method': method, 'headers': []}
+    if request_json is not None:
+        request['postData'] = {'mimeType': 'application/json', 'text': request_json}
+    response = {'status': status, 'content': {'mimeType': 'application/json', 'text': response_json or '{}'}}
+    return {'request': request, 'response': response, 'time': time, 'timings': {'wait': time}}
+
+
+@pytest.fixture(scope='module')
+def traffic():
+    rng = random.Random(7)
+    entries = []
+    for index in range(2000):
+        path = '/' + '/'.join(rng.choice(SEGMENTS) for _ in range(rng.randint(0, 4)))
+        if rng.random() < 0.2:
+            path += '/'
+        query = f'?n={index}' if rng.random() < 0.3 else ''
+        host = rng.choice(['a.com', 'B.com:8080', 'c.org'])
+        entries.append(entry(f'http://{host}{path}{query}', rng.choice(['GET', 'post']), rng.choice([200, 404])))
+    store = CaptureStore()
+    store.add_har({'log': {'entries': entries}})
+    return store, entries
+
+
+def brute_force(entries, host=None, path=None, prefix=None, suffix=None, method=None, status=None):
+    positions = []
+    for position, item in enumerate(entries):
+        parts = urlsplit(item['request']['url'])
+        normalized = _normalize_path(parts.path)
+        if ((host and parts.hostname != host) or (path and normalized != path)
+                or (prefix and not normalized.startswith(prefix)) or (suffix and not normalized.endswith(suffix))
+                or (method and item['request']['method'].upper() != method)
+                or (status and item['response']['status'] != status)):
+            continue
+        positions.append(position)
+    return positions
+
+
+@pytest.mark.parametrize('filters, expected', [
+    ({'host': 'B.COM'}, {'host': 'b.com'}),
+    ({'path': '/api//v1/'}, {'path': '/api/v1'}),
+    ({'path_prefix': '/api/'}, {'prefix': '/api/'}),
+    ({'path_prefix': '/api'}, {'prefix': '/api'}),
+    ({'path_prefix': 'api/v'}, {'prefix': '/api/v'}),
+    ({'path_prefix': '//api//v1/'}, {'prefix': '/api/v1/'}),
+    ({'path_prefix': '/'}, {}),
+    ({'path_suffix': '/login'}, {'suffix': '/login'}),
+    ({'path_suffix': '/login/'}, {'suffix': '/login'}),
+    ({'path_suffix': 'ogin'}, {'suffix': 'ogin'}),
+    ({'path_suffix': 'rs//login'}, {'suffix': 'rs/login'}),
+    ({'path_suffix': '/'}, {'suffix': '/', 'path': '/'}),
+    ({'path_prefix': '/users/', 'method': 'post', 'status': '404'}, {'prefix': '/users/', 'method': 'POST',
+                                                                     'status': 404}),
+])
+def test_select_matches_brute_force(traffic, filters, expected):
+    store, entries = traffic
+    result = store.select(**filters)
+    assert result == brute_force(entries, **expected)
+    assert result
+
+
+def test_endpoint_matches_url_suffix(traffic):
+    store, entries = traffic
+    for endpoint in ['/validatePassword', 'Password', '/api/', 'com:8080/api', '?n=5', '/']:
+        assert store.endpoint(endpoint) == [position for position, item in enumerate(entries)
+                                            if item['request']['url'].endswith(endpoint)]
+
+
+def test_exact_url_positions(traffic):
+    store, entries = traffic
+    url = entries[10]['request']['url']
+    assert store.positions(url, exact_match=True) == [position for position, item in enumerate(entries)
+                                                      if item['request']['url'] == url]
+
+
+def test_combined_keeps_each_entry_paired():
+    store = CaptureStore()
+    store.add_har({'log': {'entries': [entry('http://h/poll', response_json=f'{{"n": {index}}}', time=index)
+                                       for index in range(5)]}})
+    combined = [store.combined(position) for position in store.select(path='/poll')]
+    assert [(item['response']['json']['n'], item['time'], item['timings']) for item in combined] == \
+        [(index, index, {'wait': index}) for index in range(5)]
+
+
+def test_incremental_add_skips_known_entries():
+    store = CaptureStore()
+    har = {'log': {'entries': [entry('http://h/a'), entry('http://h/b')]}}
+    store.add_har(har)
+    har['log']['entries'].append(entry('http://h/c', status=500, response_json='{bad'))
+    store.add_har(har, skip=len(store.entries))
+    assert [item['url'] for item in store.requests] == ['http://h/a', 'http://h/b', 'http://h/c']
+    assert 'json_error' in store.responses[2]
+    assert store.select(status=500) == [2]
+
+
+def in_flight(url, method='GET'):
+    # How BrowserMob Proxy records a request whose response has not arrived yet
+    return {'request': {'url': url, 'method': method, 'headers': []}, 'response': {'status': 0, 'content': {}},
+            'time': 0, 'timings': {}}
+
+
+def test_in_flight_entries_are_reparsed_once_complete():
+    store = CaptureStore()
+    har = {'log': {'entries': [entry('http://h/a'), in_flight('http://h/slow', 'POST')]}}
+    store.add_har(har)
+    assert store.in_flight == [1] and store.select(status=0) == [1]
+    har['log']['entries'][1] = entry('http://h/slow', 'POST', 201, response_json='{"done": true}')
+    har['log']['entries'].append(in_flight('http://h/later'))
+    store.add_har(har, skip=len(store.entries))
+    assert store.in_flight == [2]
+    assert store.responses[1]['json'] == {'done': True}
+    assert store.select(status=201) == [1] and store.select(status=0) == [2]
+    assert store.select(path='/slow', method='POST') == [1]
+
+
+class FakeProxy:
+    """BrowserMob Proxy client whose HAR gets the response of an in-flight request after the first sync."""
+    def __init__(self):
+        self.har = {'log': {'entries': [in_flight('http://h/slow')]}}
+
+    def new_har(self, label=None, options=None):
+        old, self.har = self.har, {'log': {'entries': []}}
+        return 200, old
+
+    def respond(self):
+        self.har['log']['entries'] = [entry(item['request']['url'], response_json='{"ok": 1}')
+                                      for item in self.har['log']['entries']]
+
+
+def test_full_sync_captures_in_flight_requests_whole(tmp_path):
+    library = SeleniumHTTPInterceptor(log_directory=str(tmp_path))
+    assert library.har_sync == 'full'
+    library.proxy = proxy = FakeProxy()
+    assert library.sync_capture().in_flight == [0]
+    proxy.respond()
+    capture = library.sync_capture()
+    assert capture.in_flight == [] and capture.responses[0]['json'] == {'ok': 1}
+
+
+def test_rotate_sync_keeps_in_flight_requests_without_response(tmp_path):
+    # The documented limit of 'rotate': the response lands in the HAR already handed over
+    library = SeleniumHTTPInterceptor(log_directory=str(tmp_path), har_sync='rotate')
+    library.proxy = proxy = FakeProxy()
+    library.sync_capture()
+    proxy.respond()
+    capture = library.sync_capture()
+    assert capture.in_flight == [0] and capture.select(status=0) == [0]
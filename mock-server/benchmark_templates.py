@@ -0,0 +1,99 @@
+"""
+Benchmark: building the POST /paymenthub/v1/paymenthandles response body.
+
+'before' is the previous per-request path (nested dict, uuid.uuid4() x3,
+datetime.now().strftime, json serialisation of the whole dict).
+'after' is PAYMENT_HANDLE_TEMPLATE.render with pooled UUIDs and the cached
+timestamp. Prints response bodies built per second on one core.
+
+Only body building is timed: no HTTP parsing, routing, validation or socket
+I/O, so the speedup is an upper bound for the endpoint as a whole. Measure end
+to end throughput against a running server with test/concurrent_request.py or
+test/load_workers.py.
+
+Usage: python benchmark_templates.py [iterations]
+"""
+import datetime, importlib.util, json, os, random, sys, time, uuid
+from datetime import timezone
+
+from templates import utc_timestamp, uuid4_str
+
+PAYLOAD = {
+    "merchantRefNum": "65eb1f34-5728-4d8b-a315-618d05a2133c", "transactionType": "PAYMENT",
+    "paymentType": "NETELLER", "amount": 500, "currencyCode": "EUR", "customerIp": "10.0.0.1",
+    "billingDetails": {"street": "123 Street", "street2": "Avenue", "city": "Dublin", "zip": "D01", "country": "IE"},
+    "neteller": {"consumerId": "test_dsantana", "detail1Description": "Test", "detail1Text": "Test"},
+    "returnLinks": [],
+}
+RETURN_LINKS = [
+    {"rel": "on_completed", "href": "https://jenkins.3et.com/manageFunding/neteller/success"},
+    {"rel": "on_failed", "href": "https://jenkins.3et.com/manageFunding/neteller/error"},
+    {"rel": "default", "href": "https://jenkins.3et.com/manageFunding"}
+]
+
+
+def load_template():
+    """
+    PAYMENT_HANDLE_TEMPLATE lives in mock-server.py, which can't be imported by name.
+    Falls back to None when Flask isn't installed.
+    """
+    spec = importlib.util.spec_from_file_location('mock_server', os.path.join(os.path.dirname(__file__), 'mock-server.py'))
+    module = importlib.util.module_from_spec(spec)
+    try:
+        spec.loader.exec_module(module)
+    except ImportError as err:
+        print(f'Cannot load mock-server.py ({err}), skipping the template benchmark.')
+        return None
+    return module.PAYMENT_HANDLE_TEMPLATE
+
+
+def before(payload):
+    now_utc = datetime.datetime.now(timezone.utc)
+    formatted_time = now_utc.strftime('%Y-%m-%dT%H:%M:%SZ')
+    response = {
+        "id": str(uuid.uuid4()), "paymentType": "NETELLER", "paymentHandleToken": str(uuid.uuid4()),
+        "merchantRefNum": payload['merchantRefNum'], "currencyCode": payload['currencyCode'], "dupCheck": True,
+        "status": "INITIATED", "liveMode": True, "usage": "SINGLE_USE", "action": "REDIRECT",
+        "executionMode": "SYNCHRONOUS", "amount": payload['amount'],
+        "billingDetails": {key: payload['billingDetails'][key] for key in ('street', 'street2', 'city', 'zip', 'country')},
+        "customerIp": payload['customerIp'], "timeToLiveSeconds": random.randint(111, 999),
+        "gatewayResponse": {"orderId": f"ORD_{uuid.uuid4()}", "totalAmount": payload['amount'],
+                            "currency": payload['currencyCode'], "status": "pending", "lang": "en_US",
+                            "processor": "NETELLER"},
+        "neteller": {key: payload['neteller'][key] for key in ('consumerId', 'detail1Description', 'detail1Text')},
+        "returnLinks": RETURN_LINKS, "txnTime": formatted_time, "updatedTime": formatted_time,
+        "statusTime": formatted_time,
+        "links": [{"rel": "redirect_payment", "href": "https://jenkins.3et.com/manageFunding/neteller/success"}]
+    }
+    return json.dumps(response).encode()
+
+
+def after(template, payload):
+    return template.render({
+        "id": uuid4_str(), "paymentHandleToken": uuid4_str(), "merchantRefNum": payload['merchantRefNum'],
+        "currencyCode": payload['currencyCode'], "amount": payload['amount'],
+        "billingDetails": {key: payload['billingDetails'][key] for key in ('street', 'street2', 'city', 'zip', 'country')},
+        "customerIp": payload['customerIp'], "timeToLiveSeconds": random.randint(111, 999),
+        "orderId": f"ORD_{uuid4_str()}",
+        "neteller": {key: payload['neteller'][key] for key in ('consumerId', 'detail1Description', 'detail1Text')},
+        "time": utc_timestamp(),
+    })
+
+
+def measure(name, build, iterations):
+    started = time.perf_counter()
+    for _ in range(iterations):
+        build()
+    elapsed = time.perf_counter() - started
+    print(f'{name:>7}: {iterations / elapsed:>10,.0f} responses/sec ({elapsed * 1e6 / iterations:.1f} us each)')
+    return iterations / elapsed
+
+
+if __name__ == '__main__':
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    baseline = measure('before', lambda: before(PAYLOAD), iterations)
+    template = load_template()
+    if template is not None:
+        assert json.loads(after(template, PAYLOAD)).keys() == json.loads(before(PAYLOAD)).keys()
+        improved = measure('after', lambda: after(template, PAYLOAD), iterations)
+        print(f'speedup: {improved / baseline:.2f}x')
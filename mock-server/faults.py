@@ -0,0 +1,221 @@
+"""
+Latency, error and connection fault injection for the mock server.
+
+Profiles are configured per route, keyed by the Flask rule
+(e.g. '/cashier/neteller/deposit' or
+'/mercury/api2/cashier/neteller/paysafe/finishPayment/<string:payment_id>'),
+by the literal request path, or '*' for every route:
+
+    {
+        "/cashier/neteller/deposit": {
+            "latency": {"type": "normal", "mean_ms": 250, "stddev_ms": 80},
+            "error_rate": 0.02,
+            "error_status": 503
+        },
+        "/paymenthub/v1/paymenthandles": {
+            "latency": {"type": "percentiles", "p50": 120, "p90": 400, "p99": 1500, "p100": 3000},
+            "reset_rate": 0.001,
+            "bandwidth_bps": 64000
+        }
+    }
+
+Latency types:
+- fixed: {"ms"}
+- uniform: {"min_ms", "max_ms"}
+- normal: {"mean_ms", "stddev_ms"} (clamped at 0)
+- percentiles: {"p50", "p90", ...} recorded percentiles, replayed by
+  interpolating between them (inverse CDF).
+
+Delays are measured from the moment the request started being handled, so the
+handler's own processing time counts towards the simulated latency instead of
+adding to it.
+
+The request hooks only draw a FaultPlan and leave it in the WSGI environ
+('mock.fault'); the server applies it once the handler has returned (see
+serving.py). The 'asyncio' backend parks delayed and throttled responses on
+its event loop, so the handler's worker thread is free as soon as the body is
+built and tens of thousands of slow requests can be pending at once. The
+threaded backends (waitress, gunicorn gthread) apply the plan in
+FaultMiddleware, where a delayed request keeps its thread for the whole delay:
+at most `threads` (x `workers`) requests can be delayed at once there, and
+DelayGauge warns when they are all taken.
+
+A reset aborts the TCP connection (SO_LINGER 0, then close), so the client sees
+ECONNRESET instead of a response. Metrics record it with the status 'reset'.
+"""
+import bisect, random, threading, time
+
+
+class FaultError(ValueError):
+    """Raised when a fault profile is invalid."""
+
+
+class LatencyDistribution:
+    """
+    Draws simulated latencies (seconds) from a configured distribution.
+    """
+    TYPES = ('fixed', 'uniform', 'normal', 'percentiles')
+
+    def __init__(self, config):
+        self.type = config.get('type', 'fixed')
+        if self.type not in self.TYPES:
+            raise FaultError(f"Unknown latency type '{self.type}', expected one of {self.TYPES}")
+        self.config = config
+        if self.type == 'percentiles':
+            points = sorted((float(key[1:]) / 100, float(value))
+                            for key, value in config.items() if key.startswith('p'))
+            if not points:
+                raise FaultError("Percentile latency needs at least one 'pNN' value")
+            if points[0][0] > 0:
+                points.insert(0, (0.0, 0.0))
+            self._quantiles = [quantile for quantile, _ in points]
+            self._values = [value for _, value in points]
+
+    def sample(self, rng=random):
+        config = self.config
+        if self.type == 'fixed':
+            ms = config.get('ms', 0)
+        elif self.type == 'uniform':
+            ms = rng.uniform(config.get('min_ms', 0), config['max_ms'])
+        elif self.type == 'normal':
+            ms = max(0.0, rng.gauss(config['mean_ms'], config.get('stddev_ms', 0)))
+        else:
+            ms = self._replay(rng.random())
+        return ms / 1000
+
+    def _replay(self, u):
+        quantiles, values = self._quantiles, self._values
+        position = bisect.bisect_left(quantiles, u)
+        if position >= len(quantiles):
+            return values[-1]
+        if position == 0 or quantiles[position] == u:
+            return values[position]
+        low_q, high_q = quantiles[position - 1], quantiles[position]
+        low_v, high_v = values[position - 1], values[position]
+        return low_v + (high_v - low_v) * (u - low_q) / (high_q - low_q)
+
+
+class FaultProfile:
+    """
+    Faults applied to one route.
+    """
+    def __init__(self, config):
+        self.config = config
+        self.latency = LatencyDistribution(config['latency']) if config.get('latency') else None
+        self.error_rate = float(config.get('error_rate', 0))
+        self.error_status = int(config.get('error_status', 500))
+        self.reset_rate = float(config.get('reset_rate', 0))
+        self.bandwidth_bps = int(config.get('bandwidth_bps', 0))
+        for name in ('error_rate', 'reset_rate'):
+            if not 0 <= getattr(self, name) <= 1:
+                raise FaultError(f"'{name}' must be between 0 and 1")
+
+
+class FaultInjector:
+    """
+    Holds per-route fault profiles and decides which faults a request gets.
+    Profiles can be replaced at runtime; lookups read a single dict reference.
+    """
+    def __init__(self, profiles=None):
+        self.profiles = {}
+        self._lock = threading.Lock()
+        if profiles:
+            self.configure(profiles)
+
+    def configure(self, profiles):
+        """
+        Replace all profiles with `profiles` ({route: profile config}).
+        """
+        compiled = {route: FaultProfile(config) for route, config in profiles.items()}
+        with self._lock:
+            self.profiles = compiled
+
+    def clear(self):
+        with self._lock:
+            self.profiles = {}
+
+    def describe(self):
+        return {route: profile.config for route, profile in self.profiles.items()}
+
+    def profile_for(self, rule, path):
+        profiles = self.profiles
+        if not profiles:
+            return None
+        return profiles.get(rule) or profiles.get(path) or profiles.get('*')
+
+    def plan(self, profile, rng=random):
+        """
+        Draw the faults for one request.
+        Returns (delay seconds, error status or None, reset bool).
+        """
+        delay = profile.latency.sample(rng) if profile.latency else 0.0
+        roll = rng.random()
+        if roll < profile.reset_rate:
+            return delay, None, True
+        if roll < profile.reset_rate + profile.error_rate:
+            return delay, profile.error_status, False
+        return delay, None, False
+
+
+class FaultPlan:
+    """
+    Faults drawn for one request: hold the response until the monotonic
+    `deadline`, send it at `bandwidth_bps` bytes per second (0 = unthrottled),
+    or abort the connection instead of answering (`reset`).
+    """
+    __slots__ = ('deadline', 'bandwidth_bps', 'reset')
+
+    def __init__(self, deadline, bandwidth_bps=0, reset=False):
+        self.deadline = deadline
+        self.bandwidth_bps = bandwidth_bps
+        self.reset = reset
+
+
+class DelayGauge:
+    """
+    Counts requests currently held by an injected delay, against the number of
+    worker threads (`capacity`) that can hold them.
+    """
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.current = 0
+        self.peak = 0
+        self.warned = False
+        self._lock = threading.Lock()
+
+    def wait_until(self, deadline):
+        with self._lock:
+            self.current += 1
+            self.peak = max(self.peak, self.current)
+            saturated = self.current >= self.capacity and not self.warned
+            if saturated:
+                self.warned = True
+        if saturated:
+            print(f' * All {self.capacity} worker threads are held by injected delays; further requests queue '
+                  f'and get extra latency. Use --backend asyncio to simulate more concurrent slow requests.')
+        try:
+            wait_until(deadline)
+        finally:
+            with self._lock:
+                self.current -= 1
+
+
+def wait_until(deadline):
+    """
+    Sleep until the monotonic `deadline` without drifting when woken early.
+    """
+    remaining = deadline - time.monotonic()
+    while remaining > 0:
+        time.sleep(remaining)
+        remaining = deadline - time.monotonic()
+
+
+def throttle(data, bandwidth_bps, chunk_interval=0.05):
+    """
+    Yield `data` in chunks so it is delivered at roughly `bandwidth_bps` bytes per second.
+    """
+    chunk_size = max(1, int(bandwidth_bps * chunk_interval))
+    start = time.monotonic()
+    for offset in range(0, len(data), chunk_size):
+        wait_until(start + offset / bandwidth_bps)
+        yield data[offset:offset + chunk_size]
@@ -0,0 +1,204 @@
+"""
+Bounded journal of the requests received by the mock server, for verification
+("finishPayment was called exactly once with amount 10").
+
+Recording a request is a single deque append, so request threads never wait on
+a lock. Pending entries are moved into a fixed-size ring buffer in batches, by
+whichever request thread finds the lock free, or by the next query. The ring
+keeps the newest `capacity` entries; evicted entries are optionally appended
+to an NDJSON spill file.
+
+Entries are indexed by route, method and the configured top-level JSON body
+fields, so a query only scans the entries of its most selective indexed filter.
+Index postings are in journal order, so an evicted entry is always the first
+posting of each of its keys and is dropped in O(1).
+"""
+import bisect, collections, itertools, json, threading, time
+
+DRAIN_AT = 256
+DEFAULT_LIMIT = 100
+INDEXED_FIELDS = ('merchantRefNum', 'email', 'amount', 'internalId', 'paymentHandleToken')
+
+
+def index_value(value):
+    """
+    Normalised form of a JSON scalar, comparable with a query string value. None if not indexable.
+    """
+    if isinstance(value, bool):
+        return 'true' if value else 'false'
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    if isinstance(value, (str, int, float)):
+        return str(value)
+    return None
+
+
+def body_value(body, field):
+    """
+    Value of dotted `field` (e.g. 'billingDetails.city') in a JSON body, or None.
+    """
+    for part in field.split('.'):
+        if not isinstance(body, dict):
+            return None
+        body = body.get(part)
+    return body
+
+
+class JournalEntry:
+    __slots__ = ('sequence', 'time', 'namespace', 'method', 'route', 'path', 'query', 'status', 'body')
+
+    def __init__(self, time, namespace, method, route, path, query, status, body):
+        self.sequence = None
+        self.time = time
+        self.namespace = namespace
+        self.method = method
+        self.route = route
+        self.path = path
+        self.query = query
+        self.status = status
+        self.body = body
+
+    def as_json(self):
+        return {"sequence": self.sequence, "time": self.time, "namespace": self.namespace, "method": self.method,
+                "route": self.route, "path": self.path, "query": self.query, "status": self.status,
+                "body": self.body}
+
+
+class RequestJournal:
+    """
+    Ring buffer of the last `capacity` requests with secondary indexes.
+
+    Args:
+        capacity: number of entries kept in memory.
+        spill_path: NDJSON file evicted entries are appended to, None to drop them.
+        indexed_fields: top-level JSON body fields indexed for queries.
+    """
+    def __init__(self, capacity=100000, spill_path=None, indexed_fields=INDEXED_FIELDS):
+        self.capacity = capacity
+        self.indexed_fields = tuple(indexed_fields)
+        self._ring = [None] * capacity
+        self._pending = collections.deque()
+        self._sequence = itertools.count()
+        self._oldest = 0
+        self._next = 0
+        self._index = {}
+        self._lock = threading.Lock()
+        self._spill = open(spill_path, 'a') if spill_path else None
+        self.spilled = 0
+
+    def record(self, namespace, method, route, path, query, status, body):
+        """
+        Add a request to the journal. Never blocks on a running drain or query.
+        """
+        self._pending.append(JournalEntry(time.time(), namespace, method, route, path, query, status, body))
+        if len(self._pending) >= DRAIN_AT and self._lock.acquire(blocking=False):
+            try:
+                self._drain()
+            finally:
+                self._lock.release()
+
+    def _keys(self, entry):
+        keys = [('route', entry.route), ('method', entry.method)]
+        if isinstance(entry.body, dict):
+            for field in self.indexed_fields:
+                value = index_value(entry.body.get(field))
+                if value is not None:
+                    keys.append((field, value))
+        return keys
+
+    def _drain(self):
+        """
+        Move pending entries into the ring and indexes. Caller must hold the lock.
+        """
+        pending = self._pending
+        evicted = []
+        while pending:
+            entry = pending.popleft()
+            entry.sequence = next(self._sequence)
+            slot = entry.sequence % self.capacity
+            old = self._ring[slot]
+            if old is not None:
+                for key in self._keys(old):
+                    postings = self._index[key]
+                    postings.popleft()
+                    if not postings:
+                        del self._index[key]
+                self._oldest = old.sequence + 1
+                if self._spill:
+                    evicted.append(old)
+            self._ring[slot] = entry
+            for key in self._keys(entry):
+                postings = self._index.get(key)
+                if postings is None:
+                    postings = self._index[key] = collections.deque()
+                postings.append(entry.sequence)
+            self._next = entry.sequence + 1
+        if evicted:
+            self._spill.write(''.join(json.dumps(old.as_json(), separators=(',', ':')) + '\n' for old in evicted))
+            self._spill.flush()
+            self.spilled += len(evicted)
+
+    def __len__(self):
+        return self._next - self._oldest + len(self._pending)
+
+    def _entry(self, sequence):
+        return self._ring[sequence % self.capacity]
+
+    def query(self, route=None, method=None, namespace=None, status=None, since=None, until=None, fields=None,
+              limit=DEFAULT_LIMIT):
+        """
+        Entries matching every given filter, oldest first.
+
+        Args:
+            since/until: inclusive time window, in seconds since the epoch.
+            fields: {dotted body field: value}, values compared as strings.
+        Returns:
+            (number of matches, up to `limit` matching entries).
+        """
+        fields = fields or {}
+        with self._lock:
+            self._drain()
+            lookups = [('route', route), ('method', method.upper() if method else None)]
+            lookups += [(field, value) for field, value in fields.items() if field in self.indexed_fields]
+            postings = [self._index.get((key, value), ()) for key, value in lookups if value is not None]
+            if postings:
+                candidates = list(min(postings, key=len))
+            else:
+                candidates = range(self._oldest, self._next)
+            # Entries are in arrival order, so the time window is a slice
+            if since is not None:
+                candidates = candidates[bisect.bisect_left(candidates, since, key=lambda seq: self._entry(seq).time):]
+            if until is not None:
+                candidates = candidates[:bisect.bisect_right(candidates, until, key=lambda seq: self._entry(seq).time)]
+            count = 0
+            matches = []
+            for sequence in candidates:
+                entry = self._entry(sequence)
+                if ((route is not None and entry.route != route)
+                        or (method is not None and entry.method != method.upper())
+                        or (namespace is not None and entry.namespace != namespace)
+                        or (status is not None and entry.status != status)
+                        or any(index_value(body_value(entry.body, field)) != value
+                               for field, value in fields.items())):
+                    continue
+                count += 1
+                if len(matches) < limit:
+                    matches.append(entry.as_json())
+        return count, matches
+
+    def clear(self):
+        with self._lock:
+            self._pending.clear()
+            self._ring = [None] * self.capacity
+            self._index.clear()
+            self._oldest = self._next
+
+    def describe(self):
+        return {"capacity": self.capacity, "entries": len(self), "spilled": self.spilled,
+                "indexedFields": list(self.indexed_fields)}
+
+    def close(self):
+        if self._spill:
+            with self._lock:
+                self._spill.close()
+                self._spill = None
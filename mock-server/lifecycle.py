@@ -0,0 +1,264 @@
+"""
+Payment lifecycle for the Neteller mock: a transaction state machine advanced
+by a background scheduler, and a webhook dispatcher for the callbacks.
+
+    INITIATED -> PROCESSING -> COMPLETED | FAILED | EXPIRED
+
+A deposit enters PROCESSING straight away. From there it is completed by
+finishPayment, or by the scheduler after `complete_after` seconds (failing with
+`failure_rate`), and expires after `expire_after` seconds if nothing else
+happened. Each terminal transition posts an event to the matching returnLinks
+href (on_completed / on_failed, falling back to default).
+
+Scheduled transitions live in one min-heap; the scheduler thread sleeps until
+the earliest one is due and applies every due transition in a batch.
+Callbacks are queued to a pool of dispatcher threads sharing one pooled HTTP
+session; events for the same URL are sent together as a JSON array, and failed
+deliveries are retried with exponential backoff. On shutdown the lifecycle
+schedulers are stopped first, then the dispatcher sends what is still queued
+and its threads are joined.
+"""
+import heapq, itertools, queue, random, threading, time
+
+INITIATED = 'INITIATED'
+PROCESSING = 'PROCESSING'
+COMPLETED = 'COMPLETED'
+FAILED = 'FAILED'
+EXPIRED = 'EXPIRED'
+
+TRANSITIONS = {
+    INITIATED: {PROCESSING, FAILED, EXPIRED},
+    PROCESSING: {COMPLETED, FAILED, EXPIRED},
+    COMPLETED: set(),
+    FAILED: set(),
+    EXPIRED: set(),
+}
+CALLBACK_LINKS = {COMPLETED: 'on_completed', FAILED: 'on_failed', EXPIRED: 'on_failed'}
+
+
+class InvalidTransition(Exception):
+    """Raised when a transaction cannot move to the requested state."""
+
+
+class WebhookDispatcher:
+    """
+    Delivers callback events through a pooled session, batched per URL, with retries.
+    """
+    def __init__(self, workers=4, batch_size=100, max_retries=5, backoff=0.5, timeout=10):
+        self.batch_size = batch_size
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.timeout = timeout
+        self.delivered = 0
+        self.dropped = 0
+        # Counters are updated by every sender thread
+        self._count_lock = threading.Lock()
+        self._queue = queue.Queue()
+        self._retries = []
+        self._sequence = itertools.count()
+        self._retry_lock = threading.Lock()
+        self._stop = threading.Event()
+        # Only callbacks need requests, so the lifecycle itself runs without it
+        import requests
+        from requests.adapters import HTTPAdapter
+        self._request_error = requests.exceptions.RequestException
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=workers, pool_maxsize=workers)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        self._workers = [threading.Thread(target=self._run, name=f'webhook-{number}', daemon=True)
+                         for number in range(workers)]
+        for worker in self._workers:
+            worker.start()
+
+    def send(self, url, event):
+        self._queue.put((url, event, 0))
+
+    def stop(self, timeout=None):
+        """
+        Send the events still queued, then stop the sender threads, waiting at most
+        `timeout` seconds for them. Deliveries waiting for a retry are dropped.
+        Returns True if every thread has finished.
+        """
+        self._stop.set()
+        deadline = None if timeout is None else time.monotonic() + timeout
+        for worker in self._workers:
+            worker.join(None if deadline is None else max(0, deadline - time.monotonic()))
+        with self._retry_lock:
+            pending, self._retries = len(self._retries), []
+        if pending:
+            self._count(dropped=pending)
+            print(f'Webhook dispatcher stopped, dropped {pending} deliveries awaiting retry')
+        return not any(worker.is_alive() for worker in self._workers)
+
+    def _count(self, delivered=0, dropped=0):
+        with self._count_lock:
+            self.delivered += delivered
+            self.dropped += dropped
+
+    def _next_batch(self):
+        """
+        Block for one event, then take whatever else is queued (or due for retry) up to batch_size.
+        """
+        batch = self._due_retries() if not self._stop.is_set() else []
+        try:
+            batch.append(self._queue.get(timeout=0.1 if not batch else 0))
+        except queue.Empty:
+            return batch
+        while len(batch) < self.batch_size:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _due_retries(self):
+        now = time.monotonic()
+        due = []
+        with self._retry_lock:
+            while self._retries and self._retries[0][0] <= now and len(due) < self.batch_size:
+                due.append(heapq.heappop(self._retries)[2])
+        return due
+
+    def _run(self):
+        while True:
+            batch = self._next_batch()
+            if not batch and self._stop.is_set() and self._queue.empty():
+                return
+            by_url = {}
+            for url, event, attempt in batch:
+                by_url.setdefault(url, []).append((event, attempt))
+            for url, items in by_url.items():
+                try:
+                    response = self.session.post(url, json=[event for event, _ in items], timeout=self.timeout)
+                    response.raise_for_status()
+                    self._count(delivered=len(items))
+                except self._request_error as err:
+                    self._retry(url, items, err)
+
+    def _retry(self, url, items, err):
+        for event, attempt in items:
+            if attempt + 1 > self.max_retries:
+                self._count(dropped=1)
+                print(f'Webhook to {url} dropped after {attempt + 1} attempts: {err}')
+                continue
+            due = time.monotonic() + self.backoff * (2 ** attempt)
+            with self._retry_lock:
+                heapq.heappush(self._retries, (due, next(self._sequence), (url, event, attempt + 1)))
+
+
+class PaymentLifecycle:
+    """
+    Drives transactions held in a PaymentStore through their states.
+
+    Args:
+        store: PaymentStore holding the transaction records (dicts, keyed by internalId).
+        dispatcher: WebhookDispatcher for callbacks, or None to disable them.
+        complete_after: (min, max) seconds after which the scheduler settles a
+            PROCESSING transaction, or None to wait for finishPayment.
+        failure_rate: share of scheduler-settled transactions that end FAILED.
+        expire_after: seconds after which an unsettled transaction EXPIRES, or None.
+        batch_size: max transitions applied per scheduler wake-up.
+    """
+    def __init__(self, store, dispatcher=None, complete_after=None, failure_rate=0.0, expire_after=None,
+                 batch_size=1000):
+        self.store = store
+        self.dispatcher = dispatcher
+        self.complete_after = complete_after
+        self.failure_rate = failure_rate
+        self.expire_after = expire_after
+        self.batch_size = batch_size
+        self._lock = threading.Lock()
+        self._due = threading.Condition(self._lock)
+        self._schedule = []
+        self._sequence = itertools.count()
+        self._stop = False
+        # Started on the first scheduled transition, so idle lifecycles cost no thread
+        self._thread = None
+
+    def register(self, internal_id, record, return_links=None):
+        """
+        Store a new transaction, move it to PROCESSING and schedule its settlement.
+        Returns the stored record.
+        """
+        record['approval'] = INITIATED
+        record['returnLinks'] = return_links or []
+        self.store.put(internal_id, record)
+        self.transition(internal_id, PROCESSING)
+        now = time.monotonic()
+        with self._lock:
+            if self.complete_after:
+                target = FAILED if random.random() < self.failure_rate else COMPLETED
+                self._push(now + random.uniform(*self.complete_after), internal_id, target)
+            if self.expire_after:
+                self._push(now + self.expire_after, internal_id, EXPIRED)
+        return record
+
+    def transition(self, internal_id, state):
+        """
+        Move a transaction to `state` and queue its callback.
+        Returns the updated record. Raises KeyError if the transaction is unknown
+        and InvalidTransition if the move is not allowed.
+        """
+        record = self.store.get(internal_id)
+        if record is None:
+            raise KeyError(internal_id)
+        with self._lock:
+            current = record.setdefault('approval', PROCESSING)
+            if state == current:
+                return record
+            if state not in TRANSITIONS[current]:
+                raise InvalidTransition(f'{internal_id}: {current} -> {state}')
+            record['approval'] = state
+        self._notify(record, state)
+        return record
+
+    def stop(self, timeout=None):
+        """
+        Stop the scheduler; pending transitions are left as they are.
+        Waits at most `timeout` seconds for the scheduler thread to exit.
+        """
+        with self._lock:
+            self._stop = True
+            self._due.notify()
+            thread = self._thread
+        if thread is not None and thread is not threading.current_thread():
+            thread.join(timeout)
+
+    def _push(self, due, internal_id, state):
+        """
+        Schedule a transition. Caller must hold the lock.
+        """
+        heapq.heappush(self._schedule, (due, next(self._sequence), internal_id, state))
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name='payment-lifecycle', daemon=True)
+            self._thread.start()
+        self._due.notify()
+
+    def _notify(self, record, state):
+        link_name = CALLBACK_LINKS.get(state)
+        if self.dispatcher is None or link_name is None:
+            return
+        links = {link.get('rel'): link.get('href') for link in record.get('returnLinks', [])}
+        url = links.get(link_name) or links.get('default')
+        if url:
+            self.dispatcher.send(url, {'internalId': record['internalId'], 'id': record['id'],
+                                       'approval': state, 'amount': record['amount'], 'email': record['email']})
+
+    def _run(self):
+        while True:
+            with self._lock:
+                while not self._stop and (not self._schedule or self._schedule[0][0] > time.monotonic()):
+                    self._due.wait(max(0, self._schedule[0][0] - time.monotonic()) if self._schedule else None)
+                if self._stop:
+                    return
+                now = time.monotonic()
+                batch = []
+                while self._schedule and self._schedule[0][0] <= now and len(batch) < self.batch_size:
+                    batch.append(heapq.heappop(self._schedule))
+            for _, _, internal_id, state in batch:
+                try:
+                    self.transition(internal_id, state)
+                except (KeyError, InvalidTransition):
+                    # Already settled, or evicted from the store
+                    pass
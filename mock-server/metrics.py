@@ -0,0 +1,175 @@
+"""
+Per-route request metrics for the mock server.
+
+Every worker thread records into its own counters and histograms, so the hot
+path never takes a lock; /metrics merges the per-thread recorders when it is
+scraped. Latencies go into HDR-style log-linear histograms (32 sub-buckets
+per power of two, ~3% relative error) over microseconds. test/latency.py
+keeps a finer-grained copy of the same bucket layout for the load generator.
+"""
+import threading, time
+
+SUB_BUCKET_BITS = 5
+SUB_BUCKETS = 1 << SUB_BUCKET_BITS
+BUCKET_COUNT = 1024
+QUANTILES = {0.5: 'p50', 0.9: 'p90', 0.99: 'p99', 0.999: 'p999'}
+
+
+def bucket_index(value):
+    """
+    Histogram bucket for a non-negative integer `value` (microseconds).
+    """
+    if value < SUB_BUCKETS:
+        return value
+    shift = value.bit_length() - SUB_BUCKET_BITS - 1
+    index = (shift + 1) * SUB_BUCKETS + (value >> shift) - SUB_BUCKETS
+    return min(index, BUCKET_COUNT - 1)
+
+
+def bucket_bounds(index):
+    """
+    Inclusive (lowest, highest) value recorded into bucket `index`.
+    """
+    if index < SUB_BUCKETS:
+        return index, index
+    shift = index // SUB_BUCKETS - 1
+    top = index % SUB_BUCKETS + SUB_BUCKETS
+    return top << shift, ((top + 1) << shift) - 1
+
+
+class _RouteStats:
+    __slots__ = ('started', 'finished', 'statuses', 'buckets', 'total_us', 'max_us')
+
+    def __init__(self):
+        self.started = 0
+        self.finished = 0
+        self.statuses = {}
+        self.buckets = [0] * BUCKET_COUNT
+        self.total_us = 0
+        self.max_us = 0
+
+
+class RouteMetrics:
+    """
+    Lock-free (per-thread) request counters, in-flight gauges and latency histograms.
+    """
+    def __init__(self):
+        self._local = threading.local()
+        self._recorders = []
+        self._register_lock = threading.Lock()
+        self.started_at = time.time()
+
+    def _stats(self, route, method):
+        recorder = getattr(self._local, 'routes', None)
+        if recorder is None:
+            recorder = self._local.routes = {}
+            with self._register_lock:
+                self._recorders.append(recorder)
+        key = (route, method)
+        stats = recorder.get(key)
+        if stats is None:
+            stats = recorder[key] = _RouteStats()
+        return stats
+
+    def start(self, route, method):
+        """
+        Count a request as in flight. Returns the start timestamp for `finish`.
+        """
+        self._stats(route, method).started += 1
+        return time.perf_counter()
+
+    def finish(self, route, method, status, started):
+        """
+        Record the status and latency of a request begun with `start`.
+        """
+        stats = self._stats(route, method)
+        elapsed_us = int((time.perf_counter() - started) * 1000000)
+        stats.finished += 1
+        stats.statuses[status] = stats.statuses.get(status, 0) + 1
+        stats.buckets[bucket_index(elapsed_us)] += 1
+        stats.total_us += elapsed_us
+        if elapsed_us > stats.max_us:
+            stats.max_us = elapsed_us
+
+    def snapshot(self):
+        """
+        Merge all per-thread recorders into {(route, method): summary dict}.
+        """
+        with self._register_lock:
+            recorders = list(self._recorders)
+        merged = {}
+        for recorder in recorders:
+            for key, stats in list(recorder.items()):
+                total = merged.get(key)
+                if total is None:
+                    total = merged[key] = _RouteStats()
+                total.started += stats.started
+                total.finished += stats.finished
+                for status, count in list(stats.statuses.items()):
+                    total.statuses[status] = total.statuses.get(status, 0) + count
+                total.buckets = [a + b for a, b in zip(total.buckets, stats.buckets)]
+                total.total_us += stats.total_us
+                total.max_us = max(total.max_us, stats.max_us)
+        return {key: self._summarise(stats) for key, stats in merged.items()}
+
+    @staticmethod
+    def _summarise(stats):
+        count = sum(stats.buckets)
+        quantiles = {}
+        targets = list(QUANTILES)
+        seen = 0
+        for index, bucket in enumerate(stats.buckets):
+            if not bucket:
+                continue
+            seen += bucket
+            while targets and seen >= targets[0] * count:
+                low, high = bucket_bounds(index)
+                quantiles[targets.pop(0)] = min((low + high) / 2, stats.max_us) / 1000000
+            if not targets:
+                break
+        return {
+            'requests': stats.finished,
+            'in_flight': max(0, stats.started - stats.finished),
+            # Statuses are ints, plus 'reset' for injected connection resets
+            'statuses': {str(status): count for status, count in sorted(stats.statuses.items(), key=str)},
+            'count': count,
+            'sum': stats.total_us / 1000000,
+            'max': stats.max_us / 1000000,
+            'quantiles': quantiles,
+        }
+
+    def as_json(self):
+        routes = []
+        for (route, method), summary in sorted(self.snapshot().items()):
+            latency = {'count': summary['count'], 'sum': summary['sum'], 'max': summary['max']}
+            latency.update({QUANTILES[q]: value for q, value in summary['quantiles'].items()})
+            routes.append({'route': route, 'method': method, 'requests': summary['requests'],
+                           'in_flight': summary['in_flight'], 'statuses': summary['statuses'],
+                           'latency_seconds': latency})
+        return {'uptime_seconds': round(time.time() - self.started_at, 3), 'routes': routes}
+
+    def as_prometheus(self):
+        """
+        Render the metrics in the Prometheus text exposition format.
+        """
+        lines = [
+            '# HELP mock_requests_total Requests handled, by route, method and status.',
+            '# TYPE mock_requests_total counter',
+        ]
+        snapshot = sorted(self.snapshot().items())
+        for (route, method), summary in snapshot:
+            for status, count in summary['statuses'].items():
+                lines.append(f'mock_requests_total{{route="{route}",method="{method}",status="{status}"}} {count}')
+        lines += ['# HELP mock_requests_in_flight Requests currently being handled.',
+                  '# TYPE mock_requests_in_flight gauge']
+        for (route, method), summary in snapshot:
+            lines.append(f'mock_requests_in_flight{{route="{route}",method="{method}"}} {summary["in_flight"]}')
+        lines += ['# HELP mock_request_duration_seconds Request latency.',
+                  '# TYPE mock_request_duration_seconds summary']
+        for (route, method), summary in snapshot:
+            labels = f'route="{route}",method="{method}"'
+            for quantile, value in summary['quantiles'].items():
+                lines.append(f'mock_request_duration_seconds{{{labels},quantile="{quantile}"}} {value:.6f}')
+            lines.append(f'mock_request_duration_seconds_sum{{{labels}}} {summary["sum"]:.6f}')
+            lines.append(f'mock_request_duration_seconds_count{{{labels}}} {summary["count"]}')
+        return '\n'.join(lines) + '\n'
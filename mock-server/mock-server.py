@@ -1,18 +1,192 @@
-from flask import Flask, jsonify, request
-from datetime import timezone
-import os, signal, threading, random, decimal, uuid, datetime, random
+from flask import Flask, Response, g, jsonify, request
+from serving import (BACKENDS, FaultMiddleware, InFlightMiddleware, serve_asyncio, serve_gunicorn, serve_waitress,
+                     stop_process)
+from stubs import StubEngine
+from faults import FaultError, FaultPlan
+from metrics import RouteMetrics
+from recorder import RecordReplayProxy
+from lifecycle import COMPLETED, InvalidTransition, WebhookDispatcher
+from snapshot import SnapshotError, load_snapshot, save_snapshot
+from seeding import SeedError, iter_json_array, iter_ndjson, seed
+from templates import Field, ResponseTemplate, utc_timestamp, uuid4_str
+from schemas import RequestValidator
+from namespaces import DEFAULT, Namespace, NamespaceError, NamespaceMiddleware, NamespaceRegistry
+from journal import RequestJournal
+import argparse, json, os, threading, time, random, decimal
 
-payment_data={}
-payment_handles={}
+RETURN_LINKS = [
+    {"rel": "on_completed", "href": "https://jenkins.3et.com/manageFunding/neteller/success"},
+    {"rel": "on_failed", "href": "https://jenkins.3et.com/manageFunding/neteller/error"},
+    {"rel": "default", "href": "https://jenkins.3et.com/manageFunding"}
+]
+
+# Response bodies precompiled into byte fragments, only Field values are encoded per request
+PAYMENT_HANDLE_TEMPLATE = ResponseTemplate({
+    "id": Field("id"),
+    "paymentType":"NETELLER",
+    "paymentHandleToken": Field("paymentHandleToken"),
+    "merchantRefNum": Field("merchantRefNum"),
+    "currencyCode": Field("currencyCode"),
+    "dupCheck": True,
+    "status": "INITIATED",
+    "liveMode":True,
+    "usage":"SINGLE_USE",
+    "action":"REDIRECT",
+    "executionMode":"SYNCHRONOUS",
+    "amount": Field("amount"),
+    "billingDetails": Field("billingDetails"),
+    "customerIp": Field("customerIp"),
+    "timeToLiveSeconds": Field("timeToLiveSeconds"),
+    "gatewayResponse":{
+        "orderId": Field("orderId"),
+        "totalAmount": Field("amount"),
+        "currency": Field("currencyCode"),
+        "status":"pending",
+        "lang":"en_US",
+        "processor":"NETELLER"
+    },
+    "neteller": Field("neteller"),
+    "returnLinks":RETURN_LINKS,
+    "txnTime": Field("time"),
+    "updatedTime": Field("time"),
+    "statusTime": Field("time"),
+    "links":[
+        {
+            "rel":"redirect_payment",
+            "href":"https://jenkins.3et.com/manageFunding/neteller/success"
+        }
+    ]
+})
+DEPOSIT_TEMPLATE = ResponseTemplate({
+    "approval": Field("approval"),
+    "amount": Field("amount"),
+    "email": Field("email"),
+    "internalId": Field("internalId"),
+    "id": Field("id")
+})
 
 class MockServer:
-    def __init__(self, port=5000):
+    def __init__(self, port=5000, host='127.0.0.1', backend='waitress', workers=1, threads=16,
+                 keep_alive=5, connection_limit=1000, drain_timeout=30, store_shards=16, store_max_size=100000,
+                 stubs_dir=None, stubs_reload_interval=1.0, fault_profiles=None,
+                 proxy_mode=None, upstream=None, recording_path='recordings.ndjson', recording_ignore_fields=(),
+                 complete_after=None, failure_rate=0.0, expire_after=None, webhook_workers=4,
+                 snapshot_path=None, auto_create_namespaces=True, namespace_max_records=10000, max_namespaces=256,
+                 journal_size=100000, journal_spill_path=None):
+        """
+        Args:
+            port/host: address to bind.
+            backend: 'waitress' (threads, default), 'gunicorn' (processes x threads),
+                'asyncio' (event loop + threads, delays held without a thread)
+                or 'development' (Flask dev server, debug on).
+            workers: number of worker processes (gunicorn only).
+            threads: worker threads per process. Under waitress and gunicorn also the number of
+                requests that can be held by an injected delay at once (see faults.py).
+            keep_alive: seconds an idle keep-alive connection is kept open.
+            connection_limit: max simultaneous connections (waitress only).
+            drain_timeout: seconds /shutdown waits for in-flight requests.
+            store_shards/store_max_size: lock striping and size bound of the payment stores.
+            stubs_dir: directory of JSON/YAML stub definitions served next to the built-in routes.
+            stubs_reload_interval: seconds between checks for changed stub files. 0 disables hot reload.
+            fault_profiles: per-route latency/error/reset/bandwidth profiles, as a dict or a path
+                to a JSON file (see faults.py). Can be changed at runtime via /__admin/faults.
+            proxy_mode: None, 'record' (forward to `upstream` and append to `recording_path`)
+                or 'replay' (serve only from `recording_path`).
+            recording_ignore_fields: JSON body fields left out of the replay key (e.g. merchantRefNum).
+            complete_after: (min, max) seconds after which deposits settle on their own,
+                None to wait for finishPayment (see lifecycle.py).
+            failure_rate: share of self-settling deposits that end FAILED.
+            expire_after: seconds after which an unsettled deposit EXPIRES. None = never.
+            webhook_workers: threads delivering returnLinks callbacks. 0 disables callbacks.
+            snapshot_path: file the default namespace's stores are loaded from at startup (if it exists)
+                and saved to on /shutdown or POST /__admin/snapshot (see snapshot.py). Other namespaces
+                are not saved.
+            auto_create_namespaces: create a namespace on its first request (X-Mock-Namespace
+                header or /ns/<name>/ prefix) instead of answering 404 (see namespaces.py).
+            namespace_max_records: per-store size bound of auto-created namespaces.
+            max_namespaces: number of auto-created namespaces kept; past it the least recently used is dropped.
+            journal_size: number of requests kept in the request journal (GET /__admin/requests), 0 to disable.
+            journal_spill_path: NDJSON file requests evicted from the journal are appended to.
+        """
+        if backend not in BACKENDS:
+            raise ValueError(f"Unknown backend '{backend}', expected one of {BACKENDS}")
         self.app = Flask(__name__)
         self.app.name = 'Cashier Server'
         self.port = port
+        self.host = host
+        self.backend = backend
+        self.workers = workers
+        self.threads = threads
+        self.keep_alive = keep_alive
+        self.connection_limit = connection_limit
+        self.drain_timeout = drain_timeout
+        # JSON Schema validators, compiled once
+        self.validator = RequestValidator()
+        if isinstance(fault_profiles, str):
+            with open(fault_profiles) as file:
+                fault_profiles = json.load(file)
+        # In-memory stores, keyed by internalId / paymentHandleToken, one set per namespace
+        self.dispatcher = WebhookDispatcher(workers=webhook_workers) if webhook_workers else None
+        lifecycle = {"complete_after": complete_after, "failure_rate": failure_rate, "expire_after": expire_after}
+        default = Namespace(DEFAULT, self.dispatcher, max_records=store_max_size, faults=fault_profiles,
+                            shards=store_shards, lifecycle=lifecycle)
+        self.namespaces = NamespaceRegistry(default, self.dispatcher, auto_create=auto_create_namespaces,
+                                            defaults={"max_records": namespace_max_records, "lifecycle": lifecycle},
+                                            max_auto=max_namespaces)
+        self.payment_data = default.payment_data
+        self.payment_handles = default.payment_handles
+        self.snapshot_path = snapshot_path
+        if snapshot_path and os.path.exists(snapshot_path):
+            started = time.monotonic()
+            counts = load_snapshot(snapshot_path, self.snapshot_stores())
+            print(f' * Loaded snapshot {snapshot_path} {counts} in {time.monotonic() - started:.1f}s')
         self.setup_routes()
-        self.server_thread = None
-        self.app.debug = True
+        self.setup_snapshot_routes()
+        self.setup_seed_routes()
+        # Metrics hooks must be registered first: a namespace or fault response
+        # short-circuits later before_request hooks
+        self.metrics = RouteMetrics()
+        self.setup_metrics()
+        self.setup_namespaces()
+        self.journal = None
+        if journal_size:
+            self.journal = RequestJournal(journal_size, journal_spill_path)
+            self.setup_journal()
+        self.setup_fault_injection()
+        self.proxy = None
+        if proxy_mode:
+            self.proxy = RecordReplayProxy(proxy_mode, recording_path, upstream, recording_ignore_fields)
+            self.setup_proxy()
+        self.stubs = None
+        if stubs_dir:
+            self.stubs = StubEngine(stubs_dir)
+            self.setup_stub_routes()
+            if stubs_reload_interval:
+                self.stubs.watch(stubs_reload_interval)
+        self.app.debug = backend == 'development'
+        self.app.wsgi_app = NamespaceMiddleware(self.app.wsgi_app)
+        # Applies injected delays, bandwidth limits and resets on the threaded backends
+        self.app.wsgi_app = FaultMiddleware(self.app.wsgi_app, self.threads)
+        # Track in-flight requests so /shutdown can drain them
+        self.in_flight = InFlightMiddleware(self.app.wsgi_app)
+        self.app.wsgi_app = self.in_flight
+
+    def namespace(self):
+        """
+        Namespace of the current request (resolved by the namespace before_request hook).
+        """
+        return g.namespace
+
+    def invalid_payload(self, schema_name):
+        """
+        Validate the request's JSON body against `schema_name`.
+        Returns a 400 response describing the errors, or None if the payload is valid.
+        """
+        received_payload = request.get_json(silent=True)
+        errors = self.validator.validate(schema_name, received_payload)
+        if errors:
+            return jsonify({"success": False, "error": "Invalid payload", "details": errors}), 400
+        return None
 
     def setup_routes(self):
         """
@@ -41,6 +215,9 @@ class MockServer:
             Dummy POST example. Via postman, 'success' value must be bool: true/false
             """
             expected_payload = {"success": True, "message": "This was sent via POST call"}
+            invalid = self.invalid_payload('post')
+            if invalid:
+                return invalid
             received_payload = request.json
 
             if received_payload == expected_payload:
@@ -100,40 +277,40 @@ class MockServer:
             """
             Simulates a Neteller deposit transaction.
 
-            Expects a JSON payload with 'amount' and 'email' keys.
+            Expects a JSON payload with 'amount' and 'email' keys, and optionally 'returnLinks'
+            ([{"rel": "on_completed", "href": ...}, ...]) to receive settlement callbacks.
             Generates a unique ID and internal ID for the transaction.
-            Stores payment data in an in-memory dictionary.
-            Returns a JSON response indicating the status of the deposit transaction.
+            Registers the transaction with the payment lifecycle, which moves it to PROCESSING.
+            Returns a JSON response indicating the status of this deposit transaction only.
             """
-            required_keys = ['amount', 'email']
+            invalid = self.invalid_payload('deposit')
+            if invalid:
+                return invalid
             received_payload = request.json
-            if not received_payload or not all(key in received_payload for key in required_keys):
-                return jsonify({"success": False, "error": "Invalid payload"}), 400
 
             # Generate unique IDs for the transaction
             id = random.randint(1000, 9999)
-            payment_id = str(uuid.uuid4())
+            payment_id = uuid4_str()
 
-            # Store payment data in the in-memory dictionary
+            # Store payment data and start its lifecycle
             amount = received_payload['amount']
             email = received_payload['email']
-            payment_data[payment_id] = {
+            record = self.namespace().lifecycle.register(payment_id, {
                 "id": id,
                 "internalId": payment_id,
                 "amount": amount,
                 "email": email
-            }
+            }, received_payload.get('returnLinks'))
 
             # Construct and return the response
-            response = {
-                "approval": "PROCESSING",
+            body = DEPOSIT_TEMPLATE.render({
+                "approval": record['approval'],
                 "amount": amount,
                 "email": email,
                 "internalId": payment_id,
-                "id": id,
-                "payment_info": payment_data
-            }
-            return jsonify(response), 200
+                "id": id
+            })
+            return Response(body, 200, mimetype='application/json')
         
         # Necessary?
         @self.app.route('/manageFunding/neteller/success', methods=['GET'])
@@ -154,19 +331,34 @@ class MockServer:
             
             Expects the payment ID in the URL path.
             Retrieves payment information from the in-memory payment data store based on the payment ID.
-            If the payment information is found and complete, returns a successful response.
-            Otherwise, returns an error response indicating that the payment ID was not found.
+            If the payment information is found and complete, moves it to COMPLETED and returns a successful response.
+            Otherwise, returns an error response indicating that the payment ID was not found,
+            or 409 if the transaction already ended FAILED or EXPIRED.
             """
-            if payment_id not in payment_data:
+            # Retrieve payment information
+            namespace = self.namespace()
+            payment_info = namespace.payment_data.get(payment_id)
+            if payment_info is None:
                 return jsonify({
                     "success": False,
                     "error": "Internal ID not found",
-                    "paymentId": payment_id,
-                    "paymentData": payment_data
+                    "paymentId": payment_id
+                }), 404
+            try:
+                payment_info = namespace.lifecycle.transition(payment_id, COMPLETED)
+            except InvalidTransition:
+                return jsonify({
+                    "success": False,
+                    "error": f"Payment is {payment_info['approval']}",
+                    "paymentId": payment_id
+                }), 409
+            except KeyError:
+                # Evicted/expired in between
+                return jsonify({
+                    "success": False,
+                    "error": "Internal ID not found",
+                    "paymentId": payment_id
                 }), 404
-
-            # Retrieve payment information
-            payment_info = payment_data[payment_id]
             try:
                 amount = payment_info['amount']
                 email = payment_info['email']
@@ -181,7 +373,7 @@ class MockServer:
                 }), 500
 
             response = {
-                "approval": "COMPLETED",
+                "approval": payment_info['approval'],
                 "amount": amount,
                 "email": email,
                 "id": id,
@@ -200,91 +392,350 @@ class MockServer:
             Returns:
                 JSON: Response with a new payment handle token and payment details.
             """
-            # Constants
-            RETURN_LINKS = [
-                {"rel": "on_completed", "href": "https://jenkins.3et.com/manageFunding/neteller/success"},
-                {"rel": "on_failed", "href": "https://jenkins.3et.com/manageFunding/neteller/error"},
-                {"rel": "default", "href": "https://jenkins.3et.com/manageFunding"}
-            ]
+            # Validate payload, including nested billingDetails/neteller fields
+            invalid = self.invalid_payload('payment_handle')
+            if invalid:
+                return invalid
             received_payload = request.json
-            expected_keys = ['merchantRefNum', 'transactionType', 'neteller', 'paymentType', 'amount', 'currencyCode',
-                    'customerIp', 'billingDetails', 'returnLinks']
-            # Generate UUIDs
-            neteller_uuid = uuid.uuid4()
-            payment_handle_token = uuid.uuid4()
-            # Get current time (UTC)
-            now_utc = datetime.datetime.now(timezone.utc)
-            formatted_time = now_utc.strftime('%Y-%m-%dT%H:%M:%SZ')
-            
-            # Validate payload keys
-            if not received_payload or not all(key in received_payload for key in expected_keys):
-                return jsonify({"success": False, "error": "Invalid payload"}), 400
-            
-            # Create response
-            response={
-                "id": neteller_uuid,
-                "paymentType":"NETELLER",
+
+            payment_handle_token = uuid4_str()
+            formatted_time = utc_timestamp()
+            time_to_live = random.randint(111, 999)
+            billing_details = received_payload['billingDetails']
+            neteller = received_payload['neteller']
+            # Only the dynamic fields are encoded per request, see PAYMENT_HANDLE_TEMPLATE
+            body = PAYMENT_HANDLE_TEMPLATE.render({
+                "id": uuid4_str(),
                 "paymentHandleToken": payment_handle_token,
-                "merchantRefNum":"65eb1f34-5728-4d8b-a315-618d05a2133c",
+                "merchantRefNum": received_payload['merchantRefNum'],
                 "currencyCode": received_payload['currencyCode'],
-                "dupCheck": True,
-                "status": "INITIATED",
-                "liveMode":True,
-                "usage":"SINGLE_USE",
-                "action":"REDIRECT",
-                "executionMode":"SYNCHRONOUS",
                 "amount": received_payload['amount'],
-                "billingDetails":{
-                    "street":received_payload['billingDetails']['street'],
-                    "street2":received_payload['billingDetails']['street2'],
-                    "city":received_payload['billingDetails']['city'],
-                    "zip":received_payload['billingDetails']['zip'],
-                    "country":received_payload['billingDetails']['country']
-                },
-                "customerIp":received_payload['customerIp'],
-                "timeToLiveSeconds": random.randint(111, 999),
-                "gatewayResponse":{
-                    "orderId": f"ORD_{uuid.uuid4()}",
-                    "totalAmount":received_payload['amount'],
-                    "currency": received_payload['currencyCode'],
-                    "status":"pending",
-                    "lang":"en_US",
-                    "processor":"NETELLER"
+                "billingDetails": {
+                    "street": billing_details['street'],
+                    "street2": billing_details['street2'],
+                    "city": billing_details['city'],
+                    "zip": billing_details['zip'],
+                    "country": billing_details['country']
                 },
-                "neteller":{
-                    "consumerId": received_payload['neteller']['consumerId'],
-                    "detail1Description": received_payload['neteller']['detail1Description'],
-                    "detail1Text":received_payload['neteller']['detail1Text']
+                "customerIp": received_payload['customerIp'],
+                "timeToLiveSeconds": time_to_live,
+                "orderId": f"ORD_{uuid4_str()}",
+                "neteller": {
+                    "consumerId": neteller['consumerId'],
+                    "detail1Description": neteller['detail1Description'],
+                    "detail1Text": neteller['detail1Text']
                 },
-                "returnLinks":RETURN_LINKS,
-                "txnTime": formatted_time,
-                "updatedTime": formatted_time,
-                "statusTime": formatted_time,
-                "links":[
-                    {
-                        "rel":"redirect_payment",
-                        "href":"https://jenkins.3et.com/manageFunding/neteller/success"
-                    }
-                ]
-            }
-            # Save payment_handle_details
-            payment_handles[str(payment_handle_token)] = {
-                "internalId": str(payment_handle_token),
+                "time": formatted_time
+            })
+            # Save payment_handle_details, evicted once timeToLiveSeconds has passed
+            self.namespace().payment_handles.put(payment_handle_token, {
+                "internalId": payment_handle_token,
+                "merchantRefNum": received_payload['merchantRefNum'],
                 "amount": received_payload['amount'],
-                "email": received_payload['neteller']['consumerId'],
+                "email": neteller['consumerId'],
                 "txnTime": formatted_time
-            }
-            return jsonify(), 200
+            }, ttl=time_to_live)
+            return Response(body, 200, mimetype='application/json')
 
         # GET PAYMENT HANDLE
         @self.app.route('/paymenthub/v1/paymenthandles/<string:payment_handle_token>', methods=['GET'])
         def neteller_get_payment_handle(payment_handle_token):
-            for handle_id, handle_details in payment_handles.items():
-                if handle_details['internalId'] == payment_handle_token:
-                    return jsonify(handle_details), 200
-                else:
-                    return jsonify(handle_details), 200
-            return jsonify({"error": "Payment handle not found", "payment_handles": payment_handles}), 200
+            """
+            Look up a payment handle by its paymentHandleToken (O(1)).
+            Returns 404 if the handle does not exist or has expired.
+            """
+            handle_details = self.namespace().payment_handles.get(payment_handle_token)
+            if handle_details is None:
+                return jsonify({"error": "Payment handle not found", "paymentHandleToken": payment_handle_token}), 404
+            return jsonify(handle_details), 200
+
+        # QUERY PAYMENT HANDLES
+        @self.app.route('/paymenthub/v1/paymenthandles', methods=['GET'])
+        def neteller_query_payment_handles():
+            """
+            Query payment handles through a secondary index.
+
+            Examples:
+            - /paymenthub/v1/paymenthandles?merchantRefNum=65eb1f34-5728-4d8b-a315-618d05a2133c
+            - /paymenthub/v1/paymenthandles?email=test_dsantana
+            If several filters are given, handles must match all of them.
+            """
+            payment_handles = self.namespace().payment_handles
+            filters = {field: request.args[field] for field in payment_handles.indexed_fields
+                       if field in request.args}
+            if not filters:
+                return jsonify({"success": False,
+                                "error": f"Expected one of {list(payment_handles.indexed_fields)}"}), 400
+            # Use the most selective index, then check the remaining filters
+            candidates = min((payment_handles.find(field, value) for field, value in filters.items()), key=len)
+            handles = [handle for handle in candidates
+                       if all(handle.get(field) == value for field, value in filters.items())]
+            return jsonify({"paymentHandles": handles, "count": len(handles)}), 200
+
+    def snapshot_stores(self):
+        """
+        Stores included in snapshots, by name: those of the default namespace only.
+        """
+        return {'payment_data': self.payment_data, 'payment_handles': self.payment_handles}
+
+    def setup_snapshot_routes(self):
+        @self.app.route('/__admin/snapshot', methods=['POST'])
+        def admin_snapshot():
+            """
+            Save the stores to the snapshot file now.
+            Optional JSON body {"path": "..."} overrides the configured snapshot_path.
+            """
+            payload = request.get_json(silent=True) or {}
+            path = payload.get('path', self.snapshot_path)
+            if not path:
+                return jsonify({"success": False, "error": "No snapshot path configured"}), 400
+            started = time.monotonic()
+            try:
+                counts = save_snapshot(path, self.snapshot_stores())
+            except (OSError, SnapshotError) as err:
+                return jsonify({"success": False, "error": str(err)}), 500
+            return jsonify({"success": True, "path": path, "records": counts,
+                            "seconds": round(time.monotonic() - started, 3)}), 200
+
+    def setup_seed_routes(self):
+        @self.app.route('/__admin/seed', methods=['POST'])
+        def admin_seed():
+            """
+            Bulk insert deposits or payment handles in one request (see seeding.py).
+
+            Examples:
+            - POST /__admin/seed?kind=deposits, Content-Type: application/x-ndjson, one deposit per line
+            - POST /__admin/seed?kind=handles, Content-Type: application/json, a JSON array of handles
+            Returns the number of inserted/failed items and per-item errors by input index.
+            Seeded deposits keep their 'approval' and are not scheduled by the payment lifecycle.
+            """
+            kind = request.args.get('kind', 'deposits')
+            namespace = self.namespace()
+            store = namespace.payment_data if kind == 'deposits' else namespace.payment_handles
+            ndjson = request.mimetype in ('application/x-ndjson', 'application/jsonl', 'application/ndjson')
+            items = iter_ndjson(request.stream) if ndjson else iter_json_array(request.stream)
+            started = time.monotonic()
+            try:
+                report = seed(store, kind, items)
+            except SeedError as err:
+                return jsonify({"success": False, "error": str(err)}), 400
+            report['seconds'] = round(time.monotonic() - started, 3)
+            return jsonify({"success": not report['failed'], **report}), 200
+
+    def setup_metrics(self):
+        """
+        Record per-route request counts, statuses, in-flight requests and latencies,
+        exposed through /metrics (Prometheus text, or JSON with ?format=json).
+        """
+        @self.app.before_request
+        def start_timer():
+            route = request.url_rule.rule if request.url_rule else 'unmatched'
+            g.metrics_route = route
+            g.metrics_started = self.metrics.start(route, request.method)
+
+        @self.app.after_request
+        def record_request(response):
+            started = g.pop('metrics_started', None)
+            if started is not None:
+                # Finished once the server has sent the response, so injected delays are counted
+                route, method = g.metrics_route, request.method
+                status = 'reset' if g.get('fault_reset') else response.status_code
+                response.call_on_close(lambda: self.metrics.finish(route, method, status, started))
+            return response
+
+        @self.app.teardown_request
+        def record_failed_request(error):
+            # after_request is skipped when a view raises
+            started = g.pop('metrics_started', None)
+            if started is not None:
+                self.metrics.finish(g.metrics_route, request.method, 500, started)
+
+        @self.app.route('/metrics', methods=['GET'])
+        def metrics():
+            """
+            Per-route request counts, status counts, in-flight gauges and p50/p90/p99/p999 latencies.
+            Prometheus text format by default, JSON with '?format=json'.
+            """
+            if request.args.get('format') == 'json':
+                return jsonify(self.metrics.as_json()), 200
+            return Response(self.metrics.as_prometheus(), 200, mimetype='text/plain; version=0.0.4')
+
+    def setup_journal(self):
+        """
+        Record every request (admin and metrics endpoints excluded) into the request journal,
+        queryable through /__admin/requests.
+        """
+        def journal_request(status):
+            if g.pop('journaled', False) or request.path.startswith('/__admin/') or request.path == '/metrics':
+                return
+            g.journaled = True
+            namespace = g.namespace.name if 'namespace' in g else request.environ.get('mock.namespace', DEFAULT)
+            self.journal.record(namespace, request.method,
+                                request.url_rule.rule if request.url_rule else 'unmatched', request.path,
+                                request.args.to_dict(), status, request.get_json(silent=True))
+
+        @self.app.after_request
+        def journal_response(response):
+            journal_request('reset' if g.get('fault_reset') else response.status_code)
+            return response
+
+        @self.app.teardown_request
+        def journal_failed_request(error):
+            # after_request is skipped when a view raises
+            if error is not None:
+                journal_request(500)
+
+        @self.app.route('/__admin/requests', methods=['GET', 'DELETE'])
+        def admin_requests():
+            """
+            GET: journaled requests matching the query string filters, oldest first:
+            route (Flask rule, e.g. /finishPayment/<payment_id>), method, namespace, status (or 'reset'),
+            since/until (epoch seconds), body.<field>=value, limit (default 100).
+            Returns the total number of matches and up to `limit` requests.
+            DELETE: clear the journal.
+            """
+            if request.method == 'DELETE':
+                self.journal.clear()
+                return jsonify({"success": True}), 200
+            args = request.args
+            try:
+                status = args.get('status')
+                if status is not None and status != 'reset':
+                    status = int(status)
+                since = float(args['since']) if 'since' in args else None
+                until = float(args['until']) if 'until' in args else None
+                limit = int(args.get('limit', 100))
+            except ValueError as err:
+                return jsonify({"success": False, "error": f"Invalid filter: {err}"}), 400
+            fields = {name[len('body.'):]: value for name, value in args.items() if name.startswith('body.')}
+            count, requests = self.journal.query(route=args.get('route'), method=args.get('method'),
+                                                 namespace=args.get('namespace'), status=status, since=since,
+                                                 until=until, fields=fields, limit=limit)
+            return jsonify({"count": count, "requests": requests, "journal": self.journal.describe()}), 200
+
+    def setup_namespaces(self):
+        """
+        Resolve each request's namespace, enforce its rate limit, and expose
+        /__admin/namespaces to list, create and tear down namespaces.
+        """
+        @self.app.before_request
+        def resolve_namespace():
+            name = request.environ.get('mock.namespace', DEFAULT)
+            try:
+                namespace = self.namespaces.get(name)
+            except NamespaceError as err:
+                return jsonify({"success": False, "error": str(err)}), 400
+            if namespace is None:
+                return jsonify({"success": False, "error": f"Unknown namespace '{name}'"}), 404
+            g.namespace = namespace
+            if namespace.limiter and not request.path.startswith('/__admin/') and not namespace.limiter.allow():
+                return jsonify({"success": False, "error": f"Rate limit of namespace '{name}' exceeded"}), 429
+            return None
+
+        @self.app.route('/__admin/namespaces', methods=['GET'])
+        def admin_list_namespaces():
+            """
+            List namespaces with their record counts, quotas and fault profiles.
+            """
+            return jsonify({"namespaces": self.namespaces.describe()}), 200
+
+        @self.app.route('/__admin/namespaces/<string:name>', methods=['PUT', 'DELETE'])
+        def admin_namespace(name):
+            """
+            PUT: create namespace `name`, optional JSON body {"maxRecords", "rateLimit", "faults"}.
+            DELETE: tear it down and drop its data.
+            """
+            try:
+                if request.method == 'DELETE':
+                    if not self.namespaces.delete(name):
+                        return jsonify({"success": False, "error": f"Unknown namespace '{name}'"}), 404
+                    return jsonify({"success": True, "deleted": name}), 200
+                config = request.get_json(silent=True) or {}
+                options = {option: config[key] for key, option in
+                           (("maxRecords", "max_records"), ("rateLimit", "rate_limit"), ("faults", "faults"))
+                           if key in config}
+                namespace = self.namespaces.create(name, **options)
+            except (NamespaceError, FaultError) as err:
+                return jsonify({"success": False, "error": str(err)}), 400
+            return jsonify(namespace.describe()), 201
+
+    def setup_fault_injection(self):
+        """
+        Draw the faults of every non-admin request from the configured profiles,
+        and expose /__admin/faults to read or replace them at runtime.
+        The delay, bandwidth limit or reset is applied by the server (see serving.py).
+        """
+        @self.app.before_request
+        def inject_faults():
+            if request.path.startswith('/__admin/'):
+                return None
+            rule = request.url_rule.rule if request.url_rule else None
+            faults = self.namespace().faults
+            profile = faults.profile_for(rule, request.path)
+            if profile is None:
+                return None
+            delay, error_status, reset = faults.plan(profile)
+            request.environ['mock.fault'] = FaultPlan(time.monotonic() + delay, profile.bandwidth_bps, reset)
+            if reset:
+                # Never sent: the server aborts the connection instead
+                g.fault_reset = True
+                return Response(b'', 200)
+            if error_status:
+                return jsonify({"success": False, "error": "Injected fault", "status": error_status}), error_status
+            return None
+
+        @self.app.route('/__admin/faults', methods=['GET', 'PUT', 'DELETE'])
+        def admin_faults():
+            """
+            GET: current fault profiles. PUT: replace them with the JSON body ({route: profile}).
+            DELETE: remove all fault profiles. Applies to the request's namespace.
+            """
+            faults = self.namespace().faults
+            if request.method == 'PUT':
+                try:
+                    faults.configure(request.get_json(force=True) or {})
+                except (FaultError, KeyError, TypeError, AttributeError) as err:
+                    return jsonify({"success": False, "error": f"Invalid fault profile: {err}"}), 400
+            elif request.method == 'DELETE':
+                faults.clear()
+            return jsonify(faults.describe()), 200
+
+    def setup_proxy(self):
+        """
+        In record/replay mode, hand every request except the server's own
+        control endpoints to the record/replay proxy.
+        """
+        local_paths = ('/alive', '/shutdown', '/metrics')
+
+        @self.app.before_request
+        def proxy_request():
+            if request.path in local_paths or request.path.startswith('/__admin/'):
+                return None
+            result = self.proxy.handle(request.method, request.path, list(request.args.items(multi=True)),
+                                       list(request.headers.items()), request.get_data())
+            if result is None:
+                return jsonify({"success": False, "error": "No recording for request",
+                                "method": request.method, "path": request.path}), 404
+            status, headers, body = result
+            return Response(body, status, headers)
+
+    def setup_stub_routes(self):
+        """
+        Route every request not handled by a built-in endpoint to the stub engine.
+        """
+        @self.app.route('/<path:path>', methods=['GET', 'POST', 'PUT', 'PATCH', 'DELETE'])
+        def stub_route(path):
+            """
+            Serve a declarative stub. Returns 404 if no stub matches the request.
+            """
+            headers = {key.lower(): value for key, value in request.headers.items()}
+            result = self.stubs.dispatch(request.method, request.path, request.args.to_dict(),
+                                         headers, request.get_json(silent=True))
+            if result is None:
+                return jsonify({"success": False, "error": "No stub matches request",
+                                "method": request.method, "path": request.path}), 404
+            status, response_headers, body = result
+            return jsonify(body), status, response_headers
 
     # SHUTDOWN
     def send_shutdown_response(self):
@@ -297,17 +748,70 @@ class MockServer:
         """
         Method which contains the logic to shut down the server
         and is called in the shutdown_thread.
-        Based on 'os' getpid() and killing running process.
+        New requests are refused with 503 while in-flight ones are drained,
+        the lifecycle schedulers and webhook dispatcher are stopped (sending the
+        callbacks already queued), then the serving process is stopped.
         """
+        if not self.in_flight.drain(timeout=self.drain_timeout):
+            print(f'Drain timed out after {self.drain_timeout}s, stopping anyway.')
+        self.namespaces.stop(timeout=self.drain_timeout)
+        if self.dispatcher and not self.dispatcher.stop(timeout=self.drain_timeout):
+            print(f'Webhook dispatcher still sending after {self.drain_timeout}s, stopping anyway.')
+        if self.snapshot_path:
+            counts = save_snapshot(self.snapshot_path, self.snapshot_stores())
+            print(f'Saved snapshot {self.snapshot_path} {counts}')
+        if self.journal:
+            self.journal.close()
         print('Server has shutdown.')
-        os.kill(os.getpid(), signal.SIGINT)
+        stop_process(self.backend)
 
     # START  
     def start(self):
-        print(' * Server has started.')
-        self.server_thread = threading.Thread(target=self.app.run(), kwargs={})
-        self.server_thread.start()
+        """
+        Start serving with the configured backend. Blocks until shutdown.
+        """
+        print(f' * Server has started ({self.backend}, workers={self.workers}, threads={self.threads}).')
+        if self.backend == 'waitress':
+            serve_waitress(self.app, self.host, self.port, self.threads, self.keep_alive, self.connection_limit)
+        elif self.backend == 'gunicorn':
+            serve_gunicorn(self.app, self.host, self.port, self.workers, self.threads, self.keep_alive,
+                           self.drain_timeout)
+        elif self.backend == 'asyncio':
+            serve_asyncio(self.app, self.host, self.port, self.threads, self.keep_alive, self.connection_limit)
+        else:
+            self.app.run(host=self.host, port=self.port, threaded=True, use_reloader=False)
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Cashier mock server')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=5000)
+    parser.add_argument('--backend', choices=BACKENDS, default='waitress')
+    parser.add_argument('--workers', type=int, default=1)
+    parser.add_argument('--threads', type=int, default=16)
+    parser.add_argument('--keep-alive', type=int, default=5)
+    parser.add_argument('--stubs', help='directory of JSON/YAML stub definitions')
+    parser.add_argument('--faults', help='JSON file of per-route fault profiles')
+    parser.add_argument('--proxy-mode', choices=('record', 'replay'))
+    parser.add_argument('--upstream', help='upstream base URL for record mode')
+    parser.add_argument('--recording', default='recordings.ndjson', help='record/replay file')
+    parser.add_argument('--ignore-field', action='append', default=[],
+                        help='JSON body field left out of the replay key (repeatable)')
+    parser.add_argument('--complete-after', type=float, nargs=2, metavar=('MIN', 'MAX'),
+                        help='settle deposits on their own after MIN..MAX seconds')
+    parser.add_argument('--failure-rate', type=float, default=0.0)
+    parser.add_argument('--expire-after', type=float)
+    parser.add_argument('--snapshot', help='snapshot file loaded at startup and saved on shutdown')
+    parser.add_argument('--journal-size', type=int, default=100000, help='requests kept in the journal, 0 to disable')
+    parser.add_argument('--journal-spill', help='NDJSON file requests evicted from the journal are appended to')
+    return parser.parse_args()
 
 if __name__ == '__main__':
-    server = MockServer()
+    args = parse_args()
+    server = MockServer(port=args.port, host=args.host, backend=args.backend, workers=args.workers,
+                        threads=args.threads, keep_alive=args.keep_alive, stubs_dir=args.stubs,
+                        fault_profiles=args.faults, proxy_mode=args.proxy_mode, upstream=args.upstream,
+                        recording_path=args.recording, recording_ignore_fields=args.ignore_field,
+                        complete_after=args.complete_after, failure_rate=args.failure_rate,
+                        expire_after=args.expire_after, snapshot_path=args.snapshot,
+                        journal_size=args.journal_size, journal_spill_path=args.journal_spill)
     server.start()
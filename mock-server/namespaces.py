@@ -0,0 +1,199 @@
+"""
+Isolated namespaces for parallel test suites sharing one mock server.
+
+Each namespace has its own payment stores, payment lifecycle, fault profiles
+and quotas (max records per store, requests per second). A request selects its
+namespace with the X-Mock-Namespace header or a '/ns/<name>/...' path prefix;
+requests without either use the 'default' namespace.
+
+Namespaces are cheap: small stores, a lifecycle whose scheduler thread only
+starts once something is scheduled, and one webhook dispatcher shared by all.
+Auto-created namespaces are bounded: past `max_auto` the least recently used
+one is torn down to make room, so arbitrary header values cannot grow memory.
+"""
+import re, threading, time
+
+from faults import FaultInjector
+from lifecycle import PaymentLifecycle
+from payment_store import HandleRegistry, PaymentStore
+
+DEFAULT = 'default'
+HEADER = 'HTTP_X_MOCK_NAMESPACE'
+PREFIX = re.compile(r'^/ns/([A-Za-z0-9_.\-]{1,64})(/.*)$')
+NAME = re.compile(r'^[A-Za-z0-9_.\-]{1,64}$')
+
+
+class NamespaceError(ValueError):
+    """Raised for an invalid namespace name or configuration."""
+
+
+def check_quotas(config):
+    """
+    Raise NamespaceError unless the 'max_records' of the Namespace keyword arguments `config` is a positive
+    integer and its 'rate_limit' a positive number or None (unlimited). Missing keys are not checked.
+    """
+    max_records = config.get('max_records', 1)
+    if isinstance(max_records, bool) or not isinstance(max_records, int) or max_records <= 0:
+        raise NamespaceError(f"'maxRecords' must be a positive integer, got {max_records!r}")
+    rate_limit = config.get('rate_limit')
+    if rate_limit is not None and (isinstance(rate_limit, bool) or not isinstance(rate_limit, (int, float))
+                                   or not 0 < rate_limit < float('inf')):
+        raise NamespaceError(f"'rateLimit' must be a positive number, got {rate_limit!r}")
+
+
+class RateLimiter:
+    """
+    Token bucket allowing `rate` requests per second with bursts up to `rate`
+    (at least one request, so rates below 1/s still admit one every 1/rate seconds).
+    """
+    def __init__(self, rate):
+        self.rate = rate
+        self.capacity = max(1.0, rate)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def allow(self):
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            if self.tokens < 1:
+                return False
+            self.tokens -= 1
+            return True
+
+
+class Namespace:
+    """
+    Stores, lifecycle, fault profiles and quotas of one namespace.
+
+    Args:
+        max_records: size bound of each of the namespace's stores.
+        rate_limit: max requests per second, None for unlimited.
+        faults: fault profiles ({route: profile}, see faults.py).
+        lifecycle: keyword arguments for PaymentLifecycle (complete_after, failure_rate, expire_after).
+    """
+    def __init__(self, name, dispatcher=None, max_records=100000, rate_limit=None, faults=None, shards=4,
+                 lifecycle=None, payment_data=None, payment_handles=None):
+        check_quotas({'max_records': max_records, 'rate_limit': rate_limit})
+        self.name = name
+        self.max_records = max_records
+        # Stores define __len__, so an empty one passed in is falsy
+        self.payment_data = payment_data if payment_data is not None else PaymentStore(shards=shards,
+                                                                                       max_size=max_records)
+        self.payment_handles = payment_handles if payment_handles is not None else HandleRegistry(
+            shards=shards, max_size=max_records)
+        self.lifecycle = PaymentLifecycle(self.payment_data, dispatcher, **(lifecycle or {}))
+        self.faults = FaultInjector(faults)
+        self.rate_limit = rate_limit
+        self.limiter = RateLimiter(rate_limit) if rate_limit else None
+        self.created_at = time.time()
+        self.last_used = time.monotonic()
+
+    def describe(self):
+        return {"name": self.name, "payments": len(self.payment_data), "paymentHandles": len(self.payment_handles),
+                "maxRecords": self.max_records, "rateLimit": self.rate_limit, "faults": self.faults.describe()}
+
+    def close(self):
+        self.lifecycle.stop()
+        self.payment_data.clear()
+        self.payment_handles.clear()
+
+
+class NamespaceRegistry:
+    """
+    Namespaces by name. Unknown names are created on first use when `auto_create` is set;
+    at most `max_auto` of those are kept, least recently used first out. Namespaces
+    created explicitly (PUT /__admin/namespaces/<name>) are only removed by delete().
+    """
+    def __init__(self, default, dispatcher=None, auto_create=True, defaults=None, max_auto=256):
+        self.dispatcher = dispatcher
+        self.auto_create = auto_create
+        self.defaults = defaults or {}
+        self.max_auto = max_auto
+        self._lock = threading.Lock()
+        self._namespaces = {DEFAULT: default}
+        self._auto = set()
+
+    def get(self, name):
+        """
+        Namespace `name`, created with the registry defaults if allowed. None if unknown.
+        """
+        namespace = self._namespaces.get(name)
+        if namespace is None and self.auto_create:
+            namespace = self.create(name, exist_ok=True, auto=True)
+        if namespace is not None:
+            namespace.last_used = time.monotonic()
+        return namespace
+
+    def create(self, name, exist_ok=False, auto=False, **config):
+        if not NAME.match(name):
+            raise NamespaceError(f"Invalid namespace name '{name}'")
+        config = {**self.defaults, **config}
+        # Checked before anything is evicted or registered
+        check_quotas(config)
+        evicted = None
+        with self._lock:
+            namespace = self._namespaces.get(name)
+            if namespace is not None:
+                if exist_ok:
+                    return namespace
+                raise NamespaceError(f"Namespace '{name}' already exists")
+            if auto:
+                if len(self._auto) >= self.max_auto:
+                    if not self._auto:
+                        raise NamespaceError(f"Cannot create namespace '{name}': auto-creation limit is 0")
+                    oldest = min(self._auto, key=lambda auto_name: self._namespaces[auto_name].last_used)
+                    self._auto.discard(oldest)
+                    evicted = self._namespaces.pop(oldest)
+                self._auto.add(name)
+            namespace = Namespace(name, self.dispatcher, **config)
+            self._namespaces[name] = namespace
+        if evicted is not None:
+            print(f" * Namespace limit ({self.max_auto}) reached, dropped least recently used '{evicted.name}'")
+            evicted.close()
+        return namespace
+
+    def delete(self, name):
+        """
+        Tear down namespace `name`, dropping its data. Returns False if it didn't exist.
+        """
+        if name == DEFAULT:
+            raise NamespaceError("The default namespace cannot be deleted")
+        with self._lock:
+            namespace = self._namespaces.pop(name, None)
+            self._auto.discard(name)
+        if namespace is None:
+            return False
+        namespace.close()
+        return True
+
+    def describe(self):
+        return [namespace.describe() for namespace in list(self._namespaces.values())]
+
+    def stop(self, timeout=None):
+        """
+        Stop the lifecycle scheduler of every namespace (on shutdown), keeping their data.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        for namespace in list(self._namespaces.values()):
+            namespace.lifecycle.stop(None if deadline is None else max(0, deadline - time.monotonic()))
+
+
+class NamespaceMiddleware:
+    """
+    WSGI middleware resolving the namespace name from the '/ns/<name>' path prefix
+    (which is stripped) or the X-Mock-Namespace header into environ['mock.namespace'].
+    """
+    def __init__(self, app):
+        self.app = app
+
+    def __call__(self, environ, start_response):
+        match = PREFIX.match(environ.get('PATH_INFO', ''))
+        if match:
+            environ['mock.namespace'] = match.group(1)
+            environ['PATH_INFO'] = match.group(2)
+        else:
+            environ['mock.namespace'] = environ.get(HEADER) or DEFAULT
+        return self.app(environ, start_response)
@@ -0,0 +1,239 @@
+"""
+In-memory payment store for the mock server.
+
+Records are spread over lock-striped shards so concurrent worker threads only
+contend when they touch the same shard. Each shard is bounded (oldest records
+are evicted first) and records can carry a time to live, so long soak runs keep
+constant memory.
+"""
+import heapq, threading, time
+from collections import OrderedDict
+
+
+class _Shard:
+    def __init__(self):
+        self.lock = threading.Lock()
+        # key -> (expires_at or None, value), in insertion order
+        self.records = OrderedDict()
+        # (expires_at, key) min-heap, entries may be stale after overwrite/eviction
+        self.expiry = []
+
+
+class PaymentStore:
+    """
+    Thread-safe key/value store with lock-striped shards, a size bound and TTL eviction.
+
+    Args:
+        shards: number of shards (rounded up to a power of two).
+        max_size: maximum number of records kept across all shards.
+        default_ttl: seconds a record lives when `put` gets no ttl. None = forever.
+    """
+    def __init__(self, shards=16, max_size=100000, default_ttl=None):
+        count = 1
+        while count < shards:
+            count <<= 1
+        self._mask = count - 1
+        self._shards = [_Shard() for _ in range(count)]
+        self._shard_size = max(1, max_size // count)
+        self.default_ttl = default_ttl
+
+    def _shard(self, key):
+        return self._shards[hash(key) & self._mask]
+
+    def put(self, key, value, ttl=None):
+        """
+        Insert or replace `key`. `ttl` (seconds) overrides the store's default_ttl.
+        """
+        ttl = self.default_ttl if ttl is None else ttl
+        now = time.monotonic()
+        expires_at = now + ttl if ttl else None
+        shard = self._shard(key)
+        with shard.lock:
+            self._expire(shard, now)
+            if key in shard.records:
+                self._on_remove(key, shard.records.pop(key)[1])
+            shard.records[key] = (expires_at, value)
+            self._on_insert(key, value)
+            if expires_at is not None:
+                heapq.heappush(shard.expiry, (expires_at, key))
+            while len(shard.records) > self._shard_size:
+                evicted_key, (_, evicted) = shard.records.popitem(last=False)
+                self._on_remove(evicted_key, evicted)
+            if len(shard.expiry) > 2 * len(shard.records) + 64:
+                shard.expiry = [(exp, k) for k, (exp, _) in shard.records.items() if exp is not None]
+                heapq.heapify(shard.expiry)
+
+    def get(self, key, default=None):
+        """
+        Return the record for `key`, or `default` if missing or expired.
+        """
+        shard = self._shard(key)
+        with shard.lock:
+            record = shard.records.get(key)
+            if record is None:
+                return default
+            expires_at, value = record
+            if expires_at is not None and expires_at <= time.monotonic():
+                del shard.records[key]
+                self._on_remove(key, value)
+                return default
+            return value
+
+    def pop(self, key, default=None):
+        """
+        Remove and return the record for `key`, or `default` if missing.
+        """
+        shard = self._shard(key)
+        with shard.lock:
+            record = shard.records.pop(key, None)
+            if record is None:
+                return default
+            self._on_remove(key, record[1])
+        return record[1]
+
+    def __contains__(self, key):
+        return self.get(key) is not None
+
+    def __len__(self):
+        return sum(len(shard.records) for shard in self._shards)
+
+    def items(self):
+        """
+        Snapshot of all live (key, value) pairs. Costs O(n), meant for admin use only.
+        """
+        now = time.monotonic()
+        result = []
+        for shard in self._shards:
+            with shard.lock:
+                self._expire(shard, now)
+                result.extend((key, value) for key, (_, value) in shard.records.items())
+        return result
+
+    def put_many(self, items):
+        """
+        Bulk insert (key, value, ttl) tuples, taking each shard lock once per batch.
+        """
+        by_shard = {}
+        for key, value, ttl in items:
+            by_shard.setdefault(hash(key) & self._mask, []).append((key, value, ttl))
+        now = time.monotonic()
+        for index, records in by_shard.items():
+            shard = self._shards[index]
+            with shard.lock:
+                for key, value, ttl in records:
+                    ttl = self.default_ttl if ttl is None else ttl
+                    expires_at = now + ttl if ttl else None
+                    if key in shard.records:
+                        self._on_remove(key, shard.records.pop(key)[1])
+                    shard.records[key] = (expires_at, value)
+                    self._on_insert(key, value)
+                    if expires_at is not None:
+                        heapq.heappush(shard.expiry, (expires_at, key))
+                while len(shard.records) > self._shard_size:
+                    evicted_key, (_, evicted) = shard.records.popitem(last=False)
+                    self._on_remove(evicted_key, evicted)
+
+    def dump(self):
+        """
+        Snapshot of all live records as (key, value, remaining ttl or None) tuples.
+        """
+        now = time.monotonic()
+        result = []
+        for shard in self._shards:
+            with shard.lock:
+                self._expire(shard, now)
+                result.extend((key, value, None if expires_at is None else expires_at - now)
+                              for key, (expires_at, value) in shard.records.items())
+        return result
+
+    def clear(self):
+        for shard in self._shards:
+            with shard.lock:
+                for key, (_, value) in shard.records.items():
+                    self._on_remove(key, value)
+                shard.records.clear()
+                shard.expiry = []
+
+    def _on_insert(self, key, value):
+        """
+        Hook called (under the shard lock) after a record is stored.
+        """
+
+    def _on_remove(self, key, value):
+        """
+        Hook called (under the shard lock) after a record is removed,
+        whether replaced, evicted, expired, popped or cleared.
+        """
+
+    def _expire(self, shard, now):
+        """
+        Drop expired records from `shard`. Caller must hold the shard lock.
+        """
+        expiry = shard.expiry
+        while expiry and expiry[0][0] <= now:
+            expires_at, key = heapq.heappop(expiry)
+            record = shard.records.get(key)
+            if record is not None and record[0] == expires_at:
+                del shard.records[key]
+                self._on_remove(key, record[1])
+
+
+class HandleRegistry(PaymentStore):
+    """
+    PaymentStore for payment handles, keyed by paymentHandleToken with secondary
+    indexes on other record fields (merchantRefNum, consumer email by default).
+
+    Secondary indexes map a field value to the set of tokens holding it, so
+    `find` costs O(matches) instead of a scan over every handle. Each index is
+    lock-striped by value hash like the records are by key, so inserts into
+    different shards do not serialise on one index lock. An index stripe lock
+    is only ever taken on its own, innermost, so stripes cannot deadlock.
+    """
+    def __init__(self, indexed_fields=('merchantRefNum', 'email'), **kwargs):
+        super().__init__(**kwargs)
+        stripes = len(self._shards)
+        self._indexes = {field: [(threading.Lock(), {}) for _ in range(stripes)] for field in indexed_fields}
+
+    @property
+    def indexed_fields(self):
+        return tuple(self._indexes)
+
+    def _stripe(self, field, field_value):
+        return self._indexes[field][hash(field_value) & self._mask]
+
+    def find(self, field, value):
+        """
+        Return all live handles whose `field` equals `value`.
+        Raises KeyError if `field` is not indexed.
+        """
+        lock, index = self._stripe(field, value)
+        with lock:
+            tokens = list(index.get(value, ()))
+        handles = []
+        for token in tokens:
+            handle = self.get(token)
+            if handle is not None:
+                handles.append(handle)
+        return handles
+
+    def _on_insert(self, key, value):
+        for field in self._indexes:
+            field_value = value.get(field)
+            if field_value is None:
+                continue
+            lock, index = self._stripe(field, field_value)
+            with lock:
+                index.setdefault(field_value, set()).add(key)
+
+    def _on_remove(self, key, value):
+        for field in self._indexes:
+            field_value = value.get(field)
+            if field_value is None:
+                continue
+            lock, index = self._stripe(field, field_value)
+            with lock:
+                tokens = index.get(field_value)
+                if tokens is not None:
+                    tokens.discard(key)
+                    if not tokens:
+                        del index[field_value]
@@ -0,0 +1,188 @@
+"""
+Record-and-replay proxy mode for the mock server.
+
+In 'record' mode every request is forwarded to a real upstream and the
+request/response pair is appended to an NDJSON recording file. In 'replay' mode
+the file is indexed once at startup by request key (method + path + sorted
+query + hash of the normalised body) and responses are served straight from it,
+with no upstream involved. Records keep the whole request, and keys are
+computed when the file is loaded, so a recording can be replayed with a
+different set of ignored fields than it was recorded with.
+
+Only byte offsets are kept in memory; records are read back with pread when
+replayed, so recordings much larger than RAM can be served. When the same
+request was recorded several times, replay cycles through the recorded
+responses in their original order.
+"""
+import base64, hashlib, itertools, json, os, threading
+
+MODES = ('record', 'replay')
+# Headers that describe the connection, not the message, and must not be forwarded or replayed
+HOP_BY_HOP = {'connection', 'keep-alive', 'proxy-authenticate', 'proxy-authorization', 'te', 'trailers',
+              'transfer-encoding', 'upgrade', 'host', 'content-length', 'content-encoding'}
+
+
+def _strip_fields(value, ignore_fields):
+    if isinstance(value, dict):
+        return {key: _strip_fields(item, ignore_fields) for key, item in value.items() if key not in ignore_fields}
+    if isinstance(value, list):
+        return [_strip_fields(item, ignore_fields) for item in value]
+    return value
+
+
+def request_key(method, path, query, body, ignore_fields=()):
+    """
+    Key identifying a request for replay.
+    JSON bodies are normalised (sorted keys, `ignore_fields` dropped at any depth)
+    so that key order and volatile fields such as merchantRefNum don't break matching.
+    """
+    if body:
+        try:
+            normalised = json.dumps(_strip_fields(json.loads(body), set(ignore_fields)),
+                                    sort_keys=True, separators=(',', ':')).encode()
+        except ValueError:
+            normalised = body
+    else:
+        normalised = b''
+    query_string = '&'.join(f'{key}={value}' for key, value in sorted(query))
+    return f'{method.upper()} {path}?{query_string} {hashlib.sha1(normalised).hexdigest()}'
+
+
+def _encode_body(record, prefix, body):
+    try:
+        record[f'{prefix}text'] = body.decode('utf-8')
+    except UnicodeDecodeError:
+        record[f'{prefix}base64'] = base64.b64encode(body).decode('ascii')
+
+
+def _decode_body(record, prefix):
+    if f'{prefix}text' in record:
+        return record[f'{prefix}text'].encode()
+    return base64.b64decode(record.get(f'{prefix}base64', ''))
+
+
+class RecordingStore:
+    """
+    Append-only NDJSON store of request/response pairs with an in-memory offset index.
+    Opened read-only unless `writable`; keys ignore the JSON body fields in `ignore_fields`.
+    """
+    def __init__(self, path, ignore_fields=(), writable=True):
+        self.path = path
+        self.ignore_fields = tuple(ignore_fields)
+        self._lock = threading.Lock()
+        self._index = {}
+        self._cursors = {}
+        self._file = open(path, 'ab+' if writable else 'rb')
+        self._load_index(writable)
+
+    def key(self, method, path, query, body):
+        return request_key(method, path, query, body, self.ignore_fields)
+
+    def _load_index(self, writable):
+        self._file.seek(0)
+        offset = 0
+        for line in self._file:
+            if not line.endswith(b'\n'):
+                # Partial last record of a recorder that was killed mid-write
+                print(f' * Ignoring truncated last record of {self.path} at byte {offset}')
+                if writable:
+                    self._file.truncate(offset)
+                break
+            if line.strip():
+                try:
+                    record = json.loads(line)
+                    if 'path' in record:
+                        key = self.key(record['method'], record['path'], record['query'],
+                                       _decode_body(record, 'request_'))
+                    else:
+                        # Recorded before requests were kept: only its original key is known
+                        key = record['key']
+                except (ValueError, KeyError) as err:
+                    print(f' * Skipping invalid record of {self.path} at byte {offset}: {err}')
+                else:
+                    self._index.setdefault(key, []).append((offset, len(line)))
+            offset += len(line)
+
+    def __len__(self):
+        return sum(len(offsets) for offsets in self._index.values())
+
+    def append(self, method, path, query, request_body, url, status, headers, body):
+        """
+        Record a request (`query` as (name, value) pairs, raw body bytes) and its response.
+        """
+        key = self.key(method, path, query, request_body)
+        record = {'method': method, 'path': path, 'query': [list(pair) for pair in query], 'url': url,
+                  'status': status, 'headers': headers}
+        _encode_body(record, 'request_', request_body or b'')
+        _encode_body(record, '', body)
+        line = (json.dumps(record, separators=(',', ':')) + '\n').encode()
+        with self._lock:
+            self._file.seek(0, os.SEEK_END)
+            offset = self._file.tell()
+            self._file.write(line)
+            self._file.flush()
+            self._index.setdefault(key, []).append((offset, len(line)))
+
+    def lookup(self, key):
+        """
+        Return (status, headers, body bytes) recorded for `key`, or None.
+        """
+        offsets = self._index.get(key)
+        if not offsets:
+            return None
+        cursor = self._cursors.get(key)
+        if cursor is None:
+            cursor = self._cursors.setdefault(key, itertools.count())
+        offset, length = offsets[next(cursor) % len(offsets)]
+        record = json.loads(os.pread(self._file.fileno(), length, offset))
+        return record['status'], record['headers'], _decode_body(record, '')
+
+    def close(self):
+        self._file.close()
+
+
+class RecordReplayProxy:
+    """
+    Forwards requests to `upstream` and records them ('record' mode),
+    or serves them from the recording only ('replay' mode).
+    """
+    def __init__(self, mode, recording_path, upstream=None, ignore_fields=(), pool_size=64, timeout=30):
+        if mode not in MODES:
+            raise ValueError(f"Unknown proxy mode '{mode}', expected one of {MODES}")
+        if mode == 'record' and not upstream:
+            raise ValueError("Record mode needs an upstream URL")
+        self.mode = mode
+        self.upstream = upstream.rstrip('/') if upstream else None
+        self.ignore_fields = tuple(ignore_fields)
+        self.timeout = timeout
+        self.store = RecordingStore(recording_path, ignore_fields, writable=mode == 'record')
+        self.session = None
+        if mode == 'record':
+            # Only recording talks to the upstream
+            import requests
+            from requests.adapters import HTTPAdapter
+            self.session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+            self.session.mount('http://', adapter)
+            self.session.mount('https://', adapter)
+
+    def handle(self, method, path, query, headers, body):
+        """
+        Args:
+            query: list of (name, value) pairs.
+            headers: list of (name, value) pairs.
+            body: raw request body bytes.
+        Returns:
+            (status, headers dict, body bytes), or None on a replay miss.
+        """
+        if self.mode == 'replay':
+            return self.store.lookup(self.store.key(method, path, query, body))
+        response = self.session.request(
+            method, self.upstream + path, params=query, data=body or None, timeout=self.timeout,
+            headers={name: value for name, value in headers if name.lower() not in HOP_BY_HOP},
+            allow_redirects=False)
+        response_headers = {name: value for name, value in response.headers.items()
+                            if name.lower() not in HOP_BY_HOP}
+        self.store.append(method, path, query, body, response.url, response.status_code, response_headers,
+                          response.content)
+        return response.status_code, response_headers, response.content
@@ -0,0 +1,139 @@
+"""
+JSON Schema validation of request payloads, per route.
+
+Validators are compiled once at startup. For schemas that only constrain the
+structure of a payload (keys, nesting and JSON types), validity depends on that
+structure alone, so the result is cached per structural shape: a payload whose
+shape has already passed skips full validation. Schemas with value constraints
+(enum, const, minimum, pattern, 'integer'...) always get full validation.
+"""
+import threading
+
+from jsonschema import Draft7Validator
+
+# Keywords whose outcome depends only on keys and JSON types
+STRUCTURAL_KEYWORDS = {'type', 'properties', 'required', 'items', 'additionalProperties',
+                       '$schema', 'title', 'description'}
+STRUCTURAL_TYPES = {'object', 'array', 'string', 'number', 'boolean', 'null'}
+MAX_CACHED_SHAPES = 10000
+
+_STRING = {"type": "string"}
+_RETURN_LINKS = {
+    "type": "array",
+    "items": {"type": "object", "required": ["rel", "href"],
+              "properties": {"rel": _STRING, "href": _STRING}}
+}
+
+SCHEMAS = {
+    'post': {
+        "type": "object",
+        "required": ["success", "message"],
+        "properties": {"success": {"type": "boolean"}, "message": _STRING}
+    },
+    'deposit': {
+        "type": "object",
+        "required": ["amount", "email"],
+        "properties": {"amount": {"type": "number"}, "email": _STRING, "returnLinks": _RETURN_LINKS}
+    },
+    'payment_handle': {
+        "type": "object",
+        "required": ["merchantRefNum", "transactionType", "neteller", "paymentType", "amount", "currencyCode",
+                     "customerIp", "billingDetails", "returnLinks"],
+        "properties": {
+            "merchantRefNum": _STRING,
+            "transactionType": _STRING,
+            "paymentType": _STRING,
+            "amount": {"type": "number"},
+            "currencyCode": _STRING,
+            "customerIp": _STRING,
+            "billingDetails": {
+                "type": "object",
+                "required": ["street", "street2", "city", "zip", "country"],
+                "properties": {"street": _STRING, "street2": _STRING, "city": _STRING, "zip": _STRING,
+                               "country": _STRING}
+            },
+            "neteller": {
+                "type": "object",
+                "required": ["consumerId", "detail1Description", "detail1Text"],
+                "properties": {"consumerId": _STRING, "detail1Description": _STRING, "detail1Text": _STRING}
+            },
+            "returnLinks": _RETURN_LINKS
+        }
+    },
+}
+
+
+def is_structural(schema):
+    """
+    True if `schema` only uses keywords whose result is decided by the payload's shape.
+    """
+    if not isinstance(schema, dict):
+        return False
+    for keyword, value in schema.items():
+        if keyword not in STRUCTURAL_KEYWORDS:
+            return False
+        if keyword == 'type':
+            types = value if isinstance(value, list) else [value]
+            if not set(types) <= STRUCTURAL_TYPES:
+                return False
+        elif keyword == 'properties':
+            if not all(is_structural(subschema) for subschema in value.values()):
+                return False
+        elif keyword == 'items':
+            if not is_structural(value):
+                return False
+        elif keyword == 'additionalProperties' and not isinstance(value, bool):
+            return False
+    return True
+
+
+def shape(value):
+    """
+    Hashable description of a JSON value's structure: keys, nesting and types, not values.
+    """
+    if isinstance(value, dict):
+        return ('object', tuple(sorted((key, shape(item)) for key, item in value.items())))
+    if isinstance(value, list):
+        return ('array', tuple(shape(item) for item in value))
+    if isinstance(value, bool):
+        return 'boolean'
+    if isinstance(value, (int, float)):
+        return 'number'
+    if isinstance(value, str):
+        return 'string'
+    return 'null'
+
+
+class RequestValidator:
+    """
+    Compiled validators for `schemas` ({name: JSON schema}), with a shape cache
+    for the structural ones.
+    """
+    def __init__(self, schemas=SCHEMAS):
+        self.validators = {}
+        self.structural = {}
+        for name, schema in schemas.items():
+            Draft7Validator.check_schema(schema)
+            self.validators[name] = Draft7Validator(schema)
+            self.structural[name] = is_structural(schema)
+        self._valid_shapes = {name: set() for name in schemas}
+        self._lock = threading.Lock()
+
+    def validate(self, name, payload):
+        """
+        Validate `payload` against schema `name`.
+        Returns a list of error messages, empty if the payload is valid.
+        """
+        if self.structural[name]:
+            payload_shape = shape(payload)
+            if payload_shape in self._valid_shapes[name]:
+                return []
+        errors = [f"{'.'.join(str(part) for part in error.absolute_path) or '<root>'}: {error.message}"
+                  for error in self.validators[name].iter_errors(payload)]
+        if not errors and self.structural[name]:
+            with self._lock:
+                valid_shapes = self._valid_shapes[name]
+                if len(valid_shapes) >= MAX_CACHED_SHAPES:
+                    valid_shapes.clear()
+                valid_shapes.add(payload_shape)
+        return errors
@@ -0,0 +1,204 @@
+"""
+Bulk seeding of the mock server's stores.
+
+Accepts a request body of deposits or payment handles, either as NDJSON (one
+object per line) or as one JSON array, and parses it incrementally from the
+request stream so the whole body never has to be held in memory. Valid items
+are inserted in batches with PaymentStore.put_many; invalid ones are reported
+by their position in the input.
+
+Deposit item:        {"amount": 10, "email": "a@b.c", "internalId"?, "id"?, "approval"?}
+Payment handle item: {"merchantRefNum": "...", "amount": 10, "email": "consumer",
+                      "paymentHandleToken"?, "timeToLiveSeconds"?, "txnTime"?}
+"""
+import codecs, datetime, json, random, re, uuid
+from datetime import timezone
+
+try:
+    from orjson import loads as _loads
+except ImportError:
+    _loads = json.loads
+
+BATCH_SIZE = 5000
+READ_SIZE = 65536
+# Longest JSON array element buffered while waiting for its end
+MAX_ITEM_SIZE = 1024 * 1024
+MAX_REPORTED_ERRORS = 1000
+KINDS = ('deposits', 'handles')
+APPROVALS = ('INITIATED', 'PROCESSING', 'COMPLETED', 'FAILED', 'EXPIRED')
+_STRUCTURE = re.compile(r'["\[\]{},]')
+# Rest of a string after its opening quote
+_STRING_END = re.compile(r'(?:[^"\\]|\\.)*"', re.S)
+
+
+class SeedError(ValueError):
+    """Raised for an item that cannot be seeded."""
+
+
+def iter_ndjson(stream):
+    """
+    Yield one parsed object (or the SeedError raised parsing it) per non-empty line.
+    """
+    for line in stream:
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            yield _loads(line)
+        except ValueError as err:
+            yield SeedError(f'Invalid JSON: {err}')
+
+
+def _element_end(buffer, position):
+    """
+    End of the array element starting at `position`: the index of the top-level
+    ',' or ']' after it, or None if the buffer ends first. Strings and nested
+    brackets are skipped; a stray or mismatched closing bracket ends the element
+    just after it, so that the element fails to parse instead of swallowing the rest.
+    """
+    stack = []
+    while True:
+        match = _STRUCTURE.search(buffer, position)
+        if match is None:
+            return None
+        char = match.group()
+        position = match.end()
+        if char == '"':
+            string = _STRING_END.match(buffer, position)
+            if string is None:
+                return None
+            position = string.end()
+        elif char in '[{':
+            stack.append(']' if char == '[' else '}')
+        elif char == ']' and not stack:
+            return match.start()
+        elif char in ']}':
+            if not stack or stack.pop() != char:
+                return position
+        elif not stack:
+            return match.start()
+
+
+def iter_json_array(stream):
+    """
+    Incrementally yield the elements of a JSON array read from `stream` in chunks.
+    A malformed element is yielded as a SeedError and parsing resumes after it;
+    an element longer than MAX_ITEM_SIZE or a truncated array ends the stream with one.
+    """
+    # Incremental, so multi-byte characters split across chunks decode correctly
+    text = codecs.getincrementaldecoder('utf-8')()
+    buffer = ''
+    position = 0
+    started = False
+    eof = False
+    while not eof:
+        chunk = stream.read(READ_SIZE)
+        eof = not chunk
+        buffer = buffer[position:] + text.decode(chunk, final=eof)
+        position = 0
+        while True:
+            while position < len(buffer) and buffer[position] in ' \t\r\n,':
+                position += 1
+            if position >= len(buffer):
+                break
+            if not started:
+                if buffer[position] != '[':
+                    raise SeedError('Expected a JSON array')
+                started = True
+                position += 1
+                continue
+            if buffer[position] == ']':
+                return
+            # Delimit the element first, so a scalar split across chunks is never parsed early
+            end = _element_end(buffer, position)
+            if end is None:
+                if not eof and len(buffer) - position <= MAX_ITEM_SIZE:
+                    # Element continues in the next chunk
+                    break
+                yield SeedError('Truncated JSON array' if eof else
+                                f'Item longer than {MAX_ITEM_SIZE} characters, rest of the body ignored')
+                return
+            try:
+                yield _loads(buffer[position:end])
+            except ValueError as err:
+                yield SeedError(f'Invalid JSON: {err}')
+            position = end
+    if started:
+        yield SeedError('Truncated JSON array')
+
+
+def _number(item, field):
+    value = item.get(field)
+    if isinstance(value, bool) or not isinstance(value, (int, float)):
+        raise SeedError(f"'{field}' must be a number")
+    return value
+
+
+def _string(item, field):
+    value = item.get(field)
+    if not isinstance(value, str) or not value:
+        raise SeedError(f"'{field}' must be a non-empty string")
+    return value
+
+
+def build_deposit(item):
+    """
+    Validate a deposit item. Returns (key, record, ttl).
+    """
+    amount = _number(item, 'amount')
+    email = _string(item, 'email')
+    internal_id = _string(item, 'internalId') if 'internalId' in item else str(uuid.uuid4())
+    approval = item.get('approval', 'PROCESSING')
+    if approval not in APPROVALS:
+        raise SeedError(f"'approval' must be one of {APPROVALS}")
+    record = {"id": item.get('id', random.randint(1000, 9999)), "internalId": internal_id,
+              "amount": amount, "email": email, "approval": approval,
+              "returnLinks": item.get('returnLinks', [])}
+    return internal_id, record, None
+
+
+def build_handle(item, now):
+    """
+    Validate a payment handle item. Returns (key, record, ttl).
+    """
+    token = _string(item, 'paymentHandleToken') if 'paymentHandleToken' in item else str(uuid.uuid4())
+    ttl = item.get('timeToLiveSeconds')
+    if ttl is not None and (isinstance(ttl, bool) or not isinstance(ttl, int) or ttl <= 0):
+        raise SeedError("'timeToLiveSeconds' must be a positive integer")
+    record = {"internalId": token, "merchantRefNum": _string(item, 'merchantRefNum'),
+              "amount": _number(item, 'amount'), "email": _string(item, 'email'),
+              "txnTime": item.get('txnTime', now)}
+    return token, record, ttl
+
+
+def seed(store, kind, items):
+    """
+    Insert `items` (an iterable of dicts, or SeedError for unparsable ones) into `store`.
+    Returns a report {"inserted", "failed", "errors": [{"index", "error"}]}.
+    """
+    if kind not in KINDS:
+        raise SeedError(f"Unknown kind '{kind}', expected one of {KINDS}")
+    now = datetime.datetime.now(timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ')
+    inserted = 0
+    failed = 0
+    errors = []
+    batch = []
+    for index, item in enumerate(items):
+        try:
+            if isinstance(item, SeedError):
+                raise item
+            if not isinstance(item, dict):
+                raise SeedError('Item must be a JSON object')
+            batch.append(build_deposit(item) if kind == 'deposits' else build_handle(item, now))
+        except SeedError as err:
+            failed += 1
+            if len(errors) < MAX_REPORTED_ERRORS:
+                errors.append({"index": index, "error": str(err)})
+            continue
+        if len(batch) >= BATCH_SIZE:
+            store.put_many(batch)
+            inserted += len(batch)
+            batch = []
+    store.put_many(batch)
+    inserted += len(batch)
+    return {"inserted": inserted, "failed": failed, "errors": errors}
@@ -0,0 +1,513 @@
+"""
+Serving backends for the mock server.
+
+Flask's development server handles one request at a time on one core, which
+makes the mock the bottleneck of any load run. This module wraps the Flask app
+in a production WSGI server instead:
+
+- 'waitress': one process, a pool of worker threads (default backend).
+- 'gunicorn': N worker processes, each with its own thread pool.
+- 'asyncio': one process, an asyncio HTTP/1.1 front end handing requests to a
+  pool of worker threads. Injected delays and bandwidth limits are applied on
+  the event loop, so slow responses do not hold a thread (see faults.py).
+- 'development': Flask's built-in server, kept for debugging.
+
+Note: with the 'gunicorn' backend every worker process holds its own copy of the
+in-memory stores, so stateful flows (deposit -> finishPayment) should either use
+a single worker with more threads, or 'waitress'.
+"""
+import asyncio, errno, io, json, os, signal, socket, struct, sys, threading, time, traceback
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import unquote, urlsplit
+
+from faults import DelayGauge, throttle
+
+BACKENDS = ('waitress', 'gunicorn', 'asyncio', 'development')
+# Longest request or header line the asyncio backend accepts
+MAX_LINE = 65536
+MAX_HEADERS = 100
+MAX_BODY = 64 * 1024 * 1024
+THROTTLE_INTERVAL = 0.05
+
+
+def reset_socket(sock):
+    """
+    Make closing `sock` send a TCP RST instead of a FIN (SO_LINGER with a zero timeout).
+    """
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_LINGER, struct.pack('ii', 1, 0))
+
+
+class InFlightMiddleware:
+    """
+    WSGI middleware counting requests in flight, so a shutdown can wait for
+    them to finish (graceful drain) before the process is stopped.
+    A request counts as in flight until its response iterable has been closed.
+    """
+    def __init__(self, app):
+        self.app = app
+        self.lock = threading.Lock()
+        self.idle = threading.Condition(self.lock)
+        self.in_flight = 0
+        self.draining = False
+
+    def __call__(self, environ, start_response):
+        with self.lock:
+            if self.draining:
+                start_response('503 Service Unavailable', [
+                    ('Content-Type', 'application/json'), ('Connection', 'close')])
+                return [b'{"success": false, "error": "Server is shutting down"}']
+            self.in_flight += 1
+        try:
+            response = self.app(environ, start_response)
+        except Exception:
+            self._done()
+            raise
+        return _ClosingIterator(response, self._done)
+
+    def _done(self):
+        with self.lock:
+            self.in_flight -= 1
+            # drain() may be waiting for a count above zero (it excludes /shutdown itself)
+            if self.draining or self.in_flight == 0:
+                self.idle.notify_all()
+
+    def drain(self, timeout=30, exclude=1):
+        """
+        Stop accepting new requests and wait for in-flight ones to finish.
+        `exclude` is the number of requests that are allowed to remain (the
+        /shutdown call itself). Returns True if drained before `timeout`.
+        """
+        deadline = time.monotonic() + timeout
+        with self.lock:
+            self.draining = True
+            while self.in_flight > exclude:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                self.idle.wait(remaining)
+        return True
+
+
+class _ClosingIterator:
+    """Wraps a WSGI response iterable and runs `callback` once on close()."""
+    def __init__(self, iterable, callback):
+        self.iterable = iterable
+        self.callback = callback
+        self.closed = False
+
+    def __iter__(self):
+        return iter(self.iterable)
+
+    def close(self):
+        if self.closed:
+            return
+        self.closed = True
+        try:
+            if hasattr(self.iterable, 'close'):
+                self.iterable.close()
+        finally:
+            self.callback()
+
+
+def _close(iterable):
+    if hasattr(iterable, 'close'):
+        iterable.close()
+
+
+class FaultMiddleware:
+    """
+    WSGI middleware applying the FaultPlan left in environ['mock.fault'] by the
+    fault hooks, for the threaded backends: the worker thread sleeps until the
+    plan's deadline, then sends the body throttled, or aborts the connection.
+
+    Connections are reset through the server's socket hook: environ['mock.abort']
+    (waitress, see serve_waitress), or by closing the raw 'gunicorn.socket' with a
+    zero linger. The development server's socket is shut down instead; without
+    any hook the response is cut short after its headers.
+    Under the 'asyncio' backend (environ['mock.async']) the server applies the plan itself.
+    """
+    def __init__(self, app, threads):
+        self.app = app
+        self.delays = DelayGauge(threads)
+
+    def __call__(self, environ, start_response):
+        if environ.get('mock.async'):
+            return self.app(environ, start_response)
+        started = []
+
+        def capture(status, headers, exc_info=None):
+            started[:] = [status, headers, exc_info]
+            return lambda data: None
+
+        body = self.app(environ, capture)
+        plan = environ.get('mock.fault')
+        if plan is None:
+            start_response(*started)
+            return body
+        try:
+            self.delays.wait_until(plan.deadline)
+            data = b''.join(body)
+        except BaseException:
+            _close(body)
+            raise
+        status, headers, exc_info = started
+        if plan.reset:
+            abort = environ.get('mock.abort')
+            if abort is not None:
+                abort()
+                return _ClosingIterator([], lambda: _close(body))
+            sock = environ.get('gunicorn.socket')
+            if sock is not None:
+                reset_socket(sock)
+                sock.close()
+                # gunicorn treats an ECONNRESET from the body as a dropped client, without logging it
+                return _ClosingIterator(_reset_body(), lambda: _close(body))
+            sock = environ.get('werkzeug.socket')
+            if sock is not None:
+                # The development server still holds file objects on the socket, so close() would not
+                # release it: shut it down instead (the client sees the connection closed, not a reset)
+                reset_socket(sock)
+                sock.shutdown(socket.SHUT_RDWR)
+            data = b''
+            headers = [(name, value) for name, value in headers if name.lower() != 'connection']
+            headers.append(('Connection', 'close'))
+        start_response(status, headers, exc_info)
+        if plan.bandwidth_bps and data:
+            return _ClosingIterator(throttle(data, plan.bandwidth_bps), lambda: _close(body))
+        return _ClosingIterator([data], lambda: _close(body))
+
+
+def _reset_body():
+    raise ConnectionResetError(errno.ECONNRESET, 'Injected connection reset')
+    yield b''
+
+
+def serve_waitress(app, host, port, threads, keep_alive, connection_limit):
+    """
+    Serve `app` with waitress: one process, `threads` worker threads.
+    `keep_alive` is the number of seconds an idle keep-alive connection is kept open.
+    Requests get an environ['mock.abort'] hook that resets their connection.
+    """
+    from waitress.channel import HTTPChannel
+    from waitress.server import BaseWSGIServer, create_server
+    from waitress.task import WSGITask
+
+    class _AbortableTask(WSGITask):
+        aborted = False
+
+        def get_environment(self):
+            environ = super().get_environment()
+            environ['mock.abort'] = self.abort
+            return environ
+
+        def abort(self):
+            """
+            Send nothing for this request and reset the connection once the task is done.
+            """
+            reset_socket(self.channel.socket)
+            self.aborted = True
+
+        def finish(self):
+            if self.aborted:
+                # The channel then closes the socket, which the zero linger turns into a reset
+                self.close_on_finish = True
+                return
+            super().finish()
+
+    class _Channel(HTTPChannel):
+        task_class = _AbortableTask
+
+    socket_map = {}
+    server = create_server(app, map=socket_map, host=host, port=port, threads=threads, channel_timeout=keep_alive,
+                           connection_limit=connection_limit, ident='Cashier Server')
+    for dispatcher in list(socket_map.values()):
+        if isinstance(dispatcher, BaseWSGIServer):
+            dispatcher.channel_class = _Channel
+    server.print_listen('Serving on http://{}:{}')
+    server.run()
+
+
+def serve_gunicorn(app, host, port, workers, threads, keep_alive, graceful_timeout):
+    """
+    Serve `app` with gunicorn: `workers` processes with `threads` threads each.
+    SIGTERM to the master drains the workers for up to `graceful_timeout` seconds.
+    """
+    from gunicorn.app.base import BaseApplication
+
+    class _Application(BaseApplication):
+        def load_config(self):
+            self.cfg.set('bind', f'{host}:{port}')
+            self.cfg.set('workers', workers)
+            self.cfg.set('threads', threads)
+            self.cfg.set('worker_class', 'gthread')
+            self.cfg.set('keepalive', keep_alive)
+            self.cfg.set('graceful_timeout', graceful_timeout)
+
+        def load(self):
+            return app
+
+    _Application().run()
+
+
+class AsyncioServer:
+    """
+    HTTP/1.1 server on asyncio streams running a WSGI app on a pool of `threads`
+    worker threads. Requests are read and responses written by the event loop;
+    a worker is only busy while the app builds the response. The FaultPlan in
+    environ['mock.fault'] is applied after the app returns: the response is
+    parked with asyncio.sleep until its deadline, written at the plan's
+    bandwidth, or the connection is reset.
+
+    Supports keep-alive, Content-Length and chunked request bodies and
+    'Expect: 100-continue'. Responses are buffered whole, which suits the
+    mock's small JSON bodies.
+    """
+    def __init__(self, app, host='127.0.0.1', port=5000, threads=16, keep_alive=5, connection_limit=1000):
+        self.app = app
+        self.host = host
+        self.port = port
+        self.keep_alive = keep_alive
+        self.connection_limit = connection_limit
+        self.connections = 0
+        self.executor = ThreadPoolExecutor(max_workers=threads, thread_name_prefix='mock-worker')
+        self.server = None
+
+    async def start(self):
+        self.server = await asyncio.start_server(self._serve_connection, self.host, self.port, limit=MAX_LINE,
+                                                 backlog=1024)
+        self.port = self.server.sockets[0].getsockname()[1]
+        return self.server
+
+    async def serve_forever(self):
+        if self.server is None:
+            await self.start()
+        print(f'Serving on http://{self.host}:{self.port}')
+        async with self.server:
+            await self.server.serve_forever()
+
+    def close(self):
+        if self.server is not None:
+            self.server.close()
+        self.executor.shutdown(wait=False)
+
+    async def _serve_connection(self, reader, writer):
+        if self.connections >= self.connection_limit:
+            writer.close()
+            return
+        self.connections += 1
+        try:
+            keep_alive = True
+            while keep_alive:
+                try:
+                    head = await asyncio.wait_for(self._read_head(reader), self.keep_alive)
+                except (asyncio.TimeoutError, asyncio.IncompleteReadError, ConnectionError):
+                    break
+                except (ValueError, asyncio.LimitOverrunError) as err:
+                    await self._send_error(writer, '400 Bad Request', str(err))
+                    break
+                if head is None:
+                    break
+                method, target, version, headers = head
+                keep_alive = _keep_alive(version, headers)
+                try:
+                    body = await self._read_body(reader, writer, headers)
+                except ValueError as err:
+                    await self._send_error(writer, '400 Bad Request', str(err))
+                    break
+                environ = self._environ(method, target, version, headers, body, writer)
+                try:
+                    status, response_headers, data, app_iter = await asyncio.get_running_loop().run_in_executor(
+                        self.executor, _run_app, self.app, environ)
+                except Exception:
+                    traceback.print_exc()
+                    await self._send_error(writer, '500 Internal Server Error', 'Internal server error')
+                    break
+                try:
+                    plan = environ.get('mock.fault')
+                    if plan is not None:
+                        await asyncio.sleep(max(0.0, plan.deadline - time.monotonic()))
+                        if plan.reset:
+                            sock = writer.get_extra_info('socket')
+                            if sock is not None:
+                                reset_socket(sock)
+                            writer.transport.abort()
+                            return
+                    await self._send(writer, method, status, response_headers, data, keep_alive,
+                                     plan.bandwidth_bps if plan is not None else 0)
+                finally:
+                    _close(app_iter)
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            self.connections -= 1
+            if not writer.transport.is_closing():
+                writer.close()
+
+    async def _read_head(self, reader):
+        """
+        (method, target, version, [(name, value)]) of the next request, None at end of stream.
+        """
+        line = await reader.readline()
+        while line in (b'\r\n', b'\n'):
+            line = await reader.readline()
+        if not line:
+            return None
+        parts = line.decode('latin-1').split()
+        if len(parts) != 3 or not parts[2].startswith('HTTP/1.'):
+            raise ValueError(f'Malformed request line {line[:100]!r}')
+        headers = []
+        while True:
+            line = await reader.readline()
+            if not line:
+                raise asyncio.IncompleteReadError(b'', None)
+            if line in (b'\r\n', b'\n'):
+                break
+            if len(headers) >= MAX_HEADERS:
+                raise ValueError('Too many headers')
+            name, separator, value = line.decode('latin-1').partition(':')
+            if not separator or not name.strip():
+                raise ValueError(f'Malformed header {line[:100]!r}')
+            headers.append((name.strip(), value.strip()))
+        return parts[0], parts[1], parts[2], headers
+
+    async def _read_body(self, reader, writer, headers):
+        fields = {name.lower(): value for name, value in headers}
+        if fields.get('expect', '').lower() == '100-continue':
+            writer.write(b'HTTP/1.1 100 Continue\r\n\r\n')
+        if 'chunked' in fields.get('transfer-encoding', '').lower():
+            chunks = []
+            size = 0
+            while True:
+                line = await reader.readline()
+                chunk_size = int(line.split(b';', 1)[0].strip() or b'x', 16)
+                if chunk_size == 0:
+                    break
+                size += chunk_size
+                if size > MAX_BODY:
+                    raise ValueError('Request body too large')
+                chunks.append(await reader.readexactly(chunk_size))
+                await reader.readexactly(2)
+            # Trailers
+            while (await reader.readline()) not in (b'\r\n', b'\n', b''):
+                pass
+            return b''.join(chunks)
+        length = int(fields.get('content-length') or 0)
+        if length < 0 or length > MAX_BODY:
+            raise ValueError(f'Invalid Content-Length {length}')
+        return await reader.readexactly(length) if length else b''
+
+    def _environ(self, method, target, version, headers, body, writer):
+        if not target.startswith('/'):
+            # Absolute form (http://host/path)
+            parts = urlsplit(target)
+            target = (parts.path or '/') + ('?' + parts.query if parts.query else '')
+        path, _, query = target.partition('?')
+        peer = writer.get_extra_info('peername') or ('', 0)
+        environ = {
+            'REQUEST_METHOD': method,
+            'SCRIPT_NAME': '',
+            'PATH_INFO': unquote(path, 'latin-1'),
+            'QUERY_STRING': query,
+            'SERVER_NAME': self.host,
+            'SERVER_PORT': str(self.port),
+            'SERVER_PROTOCOL': version,
+            'REMOTE_ADDR': peer[0],
+            'REMOTE_PORT': str(peer[1]),
+            'CONTENT_LENGTH': str(len(body)),
+            'wsgi.version': (1, 0),
+            'wsgi.url_scheme': 'http',
+            'wsgi.input': io.BytesIO(body),
+            'wsgi.errors': sys.stderr,
+            'wsgi.multithread': True,
+            'wsgi.multiprocess': False,
+            'wsgi.run_once': False,
+            'mock.async': True,
+        }
+        for name, value in headers:
+            key = name.upper().replace('-', '_')
+            if key == 'CONTENT_TYPE':
+                environ[key] = value
+            elif key not in ('CONTENT_LENGTH', 'TRANSFER_ENCODING'):
+                key = 'HTTP_' + key
+                environ[key] = environ[key] + ',' + value if key in environ else value
+        return environ
+
+    async def _send(self, writer, method, status, headers, data, keep_alive, bandwidth_bps=0):
+        names = {name.lower() for name, _ in headers}
+        head = [f'HTTP/1.1 {status}']
+        head += [f'{name}: {value}' for name, value in headers if name.lower() != 'connection']
+        if 'content-length' not in names:
+            head.append(f'Content-Length: {len(data)}')
+        if 'server' not in names:
+            head.append('Server: Cashier Server')
+        head.append('Connection: keep-alive' if keep_alive else 'Connection: close')
+        writer.write(('\r\n'.join(head) + '\r\n\r\n').encode('latin-1'))
+        if method == 'HEAD' or not data:
+            await writer.drain()
+            return
+        if not bandwidth_bps:
+            writer.write(data)
+            await writer.drain()
+            return
+        chunk_size = max(1, int(bandwidth_bps * THROTTLE_INTERVAL))
+        start = time.monotonic()
+        for offset in range(0, len(data), chunk_size):
+            await asyncio.sleep(max(0.0, start + offset / bandwidth_bps - time.monotonic()))
+            writer.write(data[offset:offset + chunk_size])
+            await writer.drain()
+
+    async def _send_error(self, writer, status, message):
+        body = json.dumps({"success": False, "error": message}).encode()
+        await self._send(writer, 'GET', status, [('Content-Type', 'application/json')], body, False)
+
+
+def _keep_alive(version, headers):
+    connection = ','.join(value for name, value in headers if name.lower() == 'connection').lower()
+    if version == 'HTTP/1.0':
+        return 'keep-alive' in connection
+    return 'close' not in connection
+
+
+def _run_app(app, environ):
+    """
+    Call the WSGI `app` on a worker thread. Returns (status, headers, body bytes, app iterable);
+    the iterable is closed by the caller once the response has been sent.
+    """
+    started = []
+
+    def start_response(status, headers, exc_info=None):
+        started[:] = [status, headers]
+        return lambda data: None
+
+    app_iter = app(environ, start_response)
+    try:
+        data = b''.join(app_iter)
+    except BaseException:
+        _close(app_iter)
+        raise
+    return started[0], started[1], data, app_iter
+
+
+def serve_asyncio(app, host, port, threads, keep_alive, connection_limit):
+    """
+    Serve `app` with AsyncioServer: one process, one event loop, `threads` worker threads.
+    """
+    server = AsyncioServer(app, host, port, threads, keep_alive, connection_limit)
+    try:
+        asyncio.run(server.serve_forever())
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.close()
+
+
+def stop_process(backend):
+    """
+    Stop the serving process once requests have drained.
+    Under gunicorn the request runs inside a worker, so the master is asked to
+    shut down gracefully (SIGTERM); otherwise the current process is interrupted.
+    """
+    if backend == 'gunicorn':
+        os.kill(os.getppid(), signal.SIGTERM)
+    else:
+        os.kill(os.getpid(), signal.SIGINT)
@@ -0,0 +1,110 @@
+"""
+Binary snapshots of the mock server's stores, for warm starts.
+
+Layout (little-endian), no pickle involved:
+
+    b'MOCKSNAP' | version u16 | store count u16
+    per store:   name length u16 | name | record count u64 | chunk count u32
+    per chunk:   length u32 | JSON array of [key, value, remaining ttl or null]
+
+Records are framed in chunks of CHUNK_SIZE so each chunk is encoded/decoded by
+one C-level JSON call instead of one call per record; orjson is used when
+installed. Loading maps the file into memory and inserts each chunk in bulk
+with PaymentStore.put_many. Remaining TTLs are saved, so records still expire
+on schedule after a restart.
+
+Only the default namespace's stores are snapshotted (see namespaces.py): other
+namespaces belong to one test suite's run and start empty after a restart.
+"""
+import json, mmap, os, struct
+
+try:
+    import orjson
+    _dumps = orjson.dumps
+    _loads = orjson.loads
+except ImportError:
+    _encoder = json.JSONEncoder(separators=(',', ':'))
+    _dumps = lambda value: _encoder.encode(value).encode()
+    _loads = lambda data: json.loads(bytes(data))
+
+MAGIC = b'MOCKSNAP'
+VERSION = 1
+CHUNK_SIZE = 10000
+_HEADER = struct.Struct('<8sHH')
+_STORE = struct.Struct('<H')
+_STORE_COUNTS = struct.Struct('<QI')
+_LENGTH = struct.Struct('<I')
+
+
+class SnapshotError(ValueError):
+    """Raised when a snapshot file is missing, truncated or of an unknown format."""
+
+
+def save_snapshot(path, stores):
+    """
+    Write `stores` ({name: PaymentStore}) to `path` atomically.
+    Returns {name: records written}.
+    """
+    counts = {}
+    temp_path = f'{path}.tmp'
+    with open(temp_path, 'wb') as file:
+        file.write(_HEADER.pack(MAGIC, VERSION, len(stores)))
+        for name, store in stores.items():
+            records = store.dump()
+            chunks = range(0, len(records), CHUNK_SIZE)
+            name_bytes = name.encode()
+            file.write(_STORE.pack(len(name_bytes)) + name_bytes + _STORE_COUNTS.pack(len(records), len(chunks)))
+            for start in chunks:
+                data = _dumps(records[start:start + CHUNK_SIZE])
+                file.write(_LENGTH.pack(len(data)))
+                file.write(data)
+            counts[name] = len(records)
+    os.replace(temp_path, path)
+    return counts
+
+
+def load_snapshot(path, stores):
+    """
+    Bulk load a snapshot into `stores` ({name: PaymentStore}).
+    Stores present in the file but not in `stores` are skipped.
+    Returns {name: records loaded}.
+    """
+    counts = {}
+    with open(path, 'rb') as file:
+        if os.fstat(file.fileno()).st_size == 0:
+            raise SnapshotError(f'{path} is empty')
+        with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            view = memoryview(data)
+            try:
+                magic, version, store_count = _HEADER.unpack_from(data, 0)
+                if magic != MAGIC or version != VERSION:
+                    raise SnapshotError(f'{path} is not a version {VERSION} mock snapshot')
+                offset = _HEADER.size
+                for _ in range(store_count):
+                    (name_length,) = _STORE.unpack_from(data, offset)
+                    offset += _STORE.size
+                    name = bytes(view[offset:offset + name_length]).decode()
+                    offset += name_length
+                    record_count, chunk_count = _STORE_COUNTS.unpack_from(data, offset)
+                    offset += _STORE_COUNTS.size
+                    store = stores.get(name)
+                    for _ in range(chunk_count):
+                        (length,) = _LENGTH.unpack_from(data, offset)
+                        offset += _LENGTH.size
+                        if offset + length > len(data):
+                            raise SnapshotError(f'{path} is truncated: {name} chunk ends past the end of the file')
+                        if store is not None:
+                            store.put_many(_loads(view[offset:offset + length]))
+                        offset += length
+                    if store is not None:
+                        counts[name] = record_count
+            except struct.error as err:
+                raise SnapshotError(f'{path} is truncated: {err}')
+            except SnapshotError:
+                raise
+            except (ValueError, TypeError) as err:
+                # Undecodable names or chunks, or records that are not [key, value, ttl]
+                raise SnapshotError(f'{path} is corrupt: {err}')
+            finally:
+                view.release()
+    return counts
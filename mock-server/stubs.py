@@ -0,0 +1,305 @@
+"""
+Declarative stub engine for the mock server.
+
+Stubs are loaded from JSON or YAML files in a directory instead of being written
+as Flask closures. A stub file holds a list of stubs (or {"stubs": [...]}):
+
+    - method: POST
+      path: /cashier/skrill/deposit/{userId}
+      match:                         # optional, all given matchers must hold
+        query: {currency: EUR}
+        headers: {X-Brand: euro}
+        body: {paymentType: SKRILL}  # subset of the JSON body, dotted keys allowed
+      response:
+        status: 200
+        headers: {X-Mock: stub}
+        body:
+          userId: "{{path.userId}}"
+          amount: "{{body.amount}}"  # a lone placeholder keeps the value's type
+          id: "{{uuid}}"
+          txnTime: "{{now}}"
+          message: "Deposit for {{path.userId}}"
+
+Stubs are compiled once into a dispatch table per method: a dict for static
+paths and a segment trie for templated ones, so matching costs O(path segments)
+regardless of how many stubs are loaded. Stubs whose matchers reject a request
+fall through to the next candidates: stubs on the same path in file order, then
+less specific paths (static before templated, literal segments before
+parameters). `watch` polls the directory and swaps
+in a freshly compiled table on change; requests already being handled keep the
+table they started with.
+"""
+import datetime, glob, json, os, re, threading, time, uuid
+from datetime import timezone
+
+PLACEHOLDER = re.compile(r'\{\{\s*([\w.\-]+)\s*\}\}')
+PATH_PARAM = re.compile(r'^\{(\w+)\}$')
+STUB_EXTENSIONS = ('*.json', '*.yaml', '*.yml')
+
+
+class StubError(ValueError):
+    """Raised when a stub file or definition is invalid."""
+
+
+def _lookup(data, dotted_key):
+    """
+    Resolve 'a.b.0.c' in nested dicts/lists. Raises KeyError if missing.
+    """
+    value = data
+    for part in dotted_key.split('.'):
+        if isinstance(value, list) and part.isdigit() and int(part) < len(value):
+            value = value[int(part)]
+        elif isinstance(value, dict) and part in value:
+            value = value[part]
+        else:
+            raise KeyError(dotted_key)
+    return value
+
+
+def _placeholder_value(name, context):
+    if name == 'uuid':
+        return str(uuid.uuid4())
+    if name == 'now':
+        return datetime.datetime.now(timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ')
+    try:
+        return _lookup(context, name)
+    except KeyError:
+        return None
+
+
+def compile_template(template):
+    """
+    Compile a response body template into a function of the request context.
+    Static parts are resolved once here; only placeholders are evaluated per request.
+    """
+    if isinstance(template, dict):
+        parts = [(key, compile_template(value)) for key, value in template.items()]
+        return lambda context: {key: render(context) for key, render in parts}
+    if isinstance(template, list):
+        items = [compile_template(value) for value in template]
+        return lambda context: [render(context) for render in items]
+    if isinstance(template, str) and PLACEHOLDER.search(template):
+        whole = PLACEHOLDER.fullmatch(template)
+        if whole:
+            name = whole.group(1)
+            return lambda context: _placeholder_value(name, context)
+        # Alternating literal text / placeholder names
+        pieces = PLACEHOLDER.split(template)
+
+        def render(context):
+            out = []
+            for position, piece in enumerate(pieces):
+                if position % 2:
+                    value = _placeholder_value(piece, context)
+                    out.append('' if value is None else str(value))
+                else:
+                    out.append(piece)
+            return ''.join(out)
+        return render
+    return lambda context: template
+
+
+class Stub:
+    """
+    One compiled stub: request matchers plus a response renderer.
+    """
+    def __init__(self, definition, source=''):
+        try:
+            self.method = definition.get('method', 'GET').upper()
+            self.path = definition['path']
+            response = definition.get('response', {})
+        except (AttributeError, KeyError) as err:
+            raise StubError(f"Invalid stub in {source}: missing {err}")
+        if not isinstance(self.path, str):
+            raise StubError(f"Invalid stub in {source}: path must be a string, got {self.path!r}")
+        if not self.path.startswith('/'):
+            raise StubError(f"Invalid stub in {source}: path must start with '/', got '{self.path}'")
+        self.name = definition.get('name', f'{self.method} {self.path}')
+        self.source = source
+        try:
+            match = definition.get('match') or {}
+            self.match_query = dict(match.get('query') or {})
+            self.match_headers = {str(key).lower(): value for key, value in (match.get('headers') or {}).items()}
+            self.match_body = dict(match.get('body') or {})
+            self.status = int(response.get('status', 200))
+            self.headers = dict(response.get('headers') or {})
+        except (AttributeError, TypeError, ValueError) as err:
+            raise StubError(f"Invalid stub '{self.name}' in {source}: {err}")
+        self.render_body = compile_template(response.get('body', {}))
+
+    def matches(self, query, headers, body):
+        for key, value in self.match_query.items():
+            if query.get(key) != str(value):
+                return False
+        for key, value in self.match_headers.items():
+            if headers.get(key) != str(value):
+                return False
+        for key, value in self.match_body.items():
+            try:
+                if _lookup(body, key) != value:
+                    return False
+            except KeyError:
+                return False
+        return True
+
+
+class _TrieNode:
+    __slots__ = ('children', 'param', 'param_name', 'stubs')
+
+    def __init__(self):
+        self.children = {}
+        self.param = None
+        self.param_name = None
+        self.stubs = []
+
+
+class StubTable:
+    """
+    Immutable dispatch table compiled from a list of stubs.
+    """
+    def __init__(self, stubs):
+        self.count = len(stubs)
+        self.static = {}
+        self.tries = {}
+        for stub in stubs:
+            segments = stub.path.strip('/').split('/')
+            if not any(PATH_PARAM.match(segment) for segment in segments):
+                self.static.setdefault((stub.method, '/' + '/'.join(segments)), []).append(stub)
+                continue
+            node = self.tries.setdefault(stub.method, _TrieNode())
+            for segment in segments:
+                param = PATH_PARAM.match(segment)
+                if param:
+                    if node.param is None:
+                        node.param = _TrieNode()
+                        node.param_name = param.group(1)
+                    elif node.param_name != param.group(1):
+                        raise StubError(f"Conflicting path parameter '{param.group(1)}' "
+                                        f"vs '{node.param_name}' in {stub.source}")
+                    node = node.param
+                else:
+                    node = node.children.setdefault(segment, _TrieNode())
+            node.stubs.append(stub)
+
+    def lookup(self, method, path):
+        """
+        Yield (candidate stubs, path params) for a request, most specific first:
+        the static path, then templated paths with literal segments before parameters.
+        """
+        segments = path.strip('/').split('/')
+        stubs = self.static.get((method, '/' + '/'.join(segments)))
+        if stubs:
+            yield stubs, {}
+        node = self.tries.get(method)
+        if node is not None:
+            yield from self._walk(node, segments, 0, {})
+
+    def _walk(self, node, segments, position, params):
+        if position == len(segments):
+            if node.stubs:
+                yield node.stubs, params
+            return
+        child = node.children.get(segments[position])
+        if child is not None:
+            yield from self._walk(child, segments, position + 1, params)
+        if node.param is not None:
+            yield from self._walk(node.param, segments, position + 1,
+                                  {**params, node.param_name: segments[position]})
+
+
+def load_stub_file(path):
+    """
+    Load a list of Stub objects from a JSON or YAML file.
+    """
+    with open(path) as file:
+        if path.endswith(('.yaml', '.yml')):
+            try:
+                import yaml
+            except ImportError:
+                raise StubError(f"PyYAML is required to load {path} (pip install pyyaml)")
+            try:
+                data = yaml.safe_load(file)
+            except yaml.YAMLError as err:
+                raise StubError(f"Invalid YAML in {path}: {err}")
+        else:
+            try:
+                data = json.load(file)
+            except ValueError as err:
+                raise StubError(f"Invalid JSON in {path}: {err}")
+    if isinstance(data, dict):
+        data = data.get('stubs', [])
+    if not isinstance(data, list):
+        raise StubError(f"{path} must contain a list of stubs or {{'stubs': [...]}}")
+    return [Stub(definition, source=path) for definition in data]
+
+
+class StubEngine:
+    """
+    Loads stub files from `directory`, compiles them and dispatches requests.
+    """
+    def __init__(self, directory):
+        self.directory = directory
+        self.table = StubTable([])
+        self._mtimes = {}
+        self._watcher = None
+        self._stop = threading.Event()
+        self.reload()
+
+    def _files(self):
+        files = []
+        for pattern in STUB_EXTENSIONS:
+            files.extend(glob.glob(os.path.join(self.directory, '**', pattern), recursive=True))
+        return sorted(files)
+
+    def _scan(self):
+        return {path: os.path.getmtime(path) for path in self._files()}
+
+    def reload(self):
+        """
+        Recompile every stub file and atomically swap in the new table.
+        On error the previous table is kept and the error is raised.
+        """
+        mtimes = self._scan()
+        stubs = []
+        for path in mtimes:
+            stubs.extend(load_stub_file(path))
+        self.table = StubTable(stubs)
+        self._mtimes = mtimes
+        print(f' * Loaded {len(stubs)} stubs from {self.directory}')
+
+    def watch(self, interval=1.0):
+        """
+        Start a daemon thread reloading the stubs whenever a file is added, changed or removed.
+        """
+        def poll():
+            while not self._stop.wait(interval):
+                try:
+                    if self._scan() != self._mtimes:
+                        self.reload()
+                except Exception as err:
+                    # Files are often half-written while edited; the watcher must outlive any bad file
+                    print(f' * Stub reload failed, keeping previous stubs: {err}')
+        self._watcher = threading.Thread(target=poll, name='stub-watcher', daemon=True)
+        self._watcher.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def dispatch(self, method, path, query, headers, body):
+        """
+        Find the stub matching a request and render its response.
+
+        Args:
+            query: dict of query string values.
+            headers: dict of header values, lower-cased names.
+            body: parsed JSON body or None.
+        Returns:
+            (status, headers, body) or None if no stub matches.
+        """
+        table = self.table
+        for stubs, params in table.lookup(method, path):
+            for stub in stubs:
+                if stub.matches(query, headers, body if body is not None else {}):
+                    context = {'path': params, 'query': query, 'headers': headers, 'body': body}
+                    return stub.status, stub.headers, stub.render_body(context)
+        return None
@@ -0,0 +1,105 @@
+"""
+Precompiled JSON response templates for the mock server's hot endpoints.
+
+A template is written once as a dict in which dynamic values are marked with
+Field('name'). It is serialised once at startup and split into static byte
+fragments around the fields, so rendering a response is a join of those
+fragments with the JSON-encoded dynamic values, instead of building and
+serialising a large nested dict per request.
+
+Also provides the per-request value sources the handlers need:
+- uuid4_str(): UUID4 strings cut from a per-thread pool of random bytes.
+- utc_timestamp(): '%Y-%m-%dT%H:%M:%SZ' formatted once per second, not per call.
+"""
+import datetime, json, os, threading, time
+from datetime import timezone
+
+try:
+    import orjson
+    _encode = orjson.dumps
+except ImportError:
+    _encoder = json.JSONEncoder(separators=(',', ':'))
+    _encode = lambda value: _encoder.encode(value).encode()
+
+_MARKER = '\x00field:{}\x00'
+
+
+class Field:
+    """Placeholder for a dynamic value in a ResponseTemplate."""
+    def __init__(self, name):
+        self.name = name
+
+
+class ResponseTemplate:
+    """
+    JSON document with static parts pre-encoded and Field placeholders filled per render.
+    """
+    def __init__(self, template):
+        fields = []
+
+        def mark(value):
+            if isinstance(value, Field):
+                fields.append(value.name)
+                return _MARKER.format(len(fields) - 1)
+            if isinstance(value, dict):
+                return {key: mark(item) for key, item in value.items()}
+            if isinstance(value, list):
+                return [mark(item) for item in value]
+            return value
+
+        encoded = json.dumps(mark(template), separators=(',', ':'))
+        self.fields = tuple(fields)
+        self.fragments = []
+        for position, _ in enumerate(fields):
+            marker = json.dumps(_MARKER.format(position))
+            before, encoded = encoded.split(marker, 1)
+            self.fragments.append(before.encode())
+        self.fragments.append(encoded.encode())
+
+    def render(self, values):
+        """
+        Render the template with `values` ({field name: JSON-serialisable value}) to bytes.
+        """
+        fragments = self.fragments
+        parts = [fragments[0]]
+        for position, name in enumerate(self.fields):
+            parts.append(_encode(values[name]))
+            parts.append(fragments[position + 1])
+        return b''.join(parts)
+
+
+_local = threading.local()
+_UUID_POOL_SIZE = 256
+
+
+def uuid4_str():
+    """
+    Random (version 4) UUID string, from a per-thread pool of os.urandom bytes
+    refilled 256 UUIDs at a time instead of one syscall per UUID.
+    """
+    pool = getattr(_local, 'pool', None)
+    if not pool:
+        raw = os.urandom(16 * _UUID_POOL_SIZE)
+        pool = _local.pool = [raw[offset:offset + 16] for offset in range(0, len(raw), 16)]
+    value = bytearray(pool.pop())
+    value[6] = (value[6] & 0x0F) | 0x40
+    value[8] = (value[8] & 0x3F) | 0x80
+    hex_value = value.hex()
+    return f'{hex_value[:8]}-{hex_value[8:12]}-{hex_value[12:16]}-{hex_value[16:20]}-{hex_value[20:]}'
+
+
+_cached_time = (None, '')
+
+
+def utc_timestamp():
+    """
+    Current UTC time as '%Y-%m-%dT%H:%M:%SZ', formatted at most once per second.
+    """
+    global _cached_time
+    second = int(time.time())
+    cached = _cached_time
+    if cached[0] != second:
+        # (second, text) is swapped as one tuple, so readers never see a mismatched pair
+        cached = _cached_time = (second, datetime.datetime.fromtimestamp(second, timezone.utc)
+                                 .strftime('%Y-%m-%dT%H:%M:%SZ'))
+    return cached[1]
@@ -0,0 +1,75 @@
+import json
+
+import journal
+from journal import RequestJournal
+
+
+def record(journal, number, route='/deposit', method='POST', status=200, namespace='default', **body):
+    journal.record(namespace, method, route, route, '', status, dict({'merchantRefNum': f'r{number}'}, **body))
+
+
+def test_ring_evicts_oldest_entries_and_spills_them(tmp_path):
+    spill = tmp_path / 'spill.ndjson'
+    requests = RequestJournal(capacity=4, spill_path=str(spill))
+    for number in range(10):
+        record(requests, number)
+    count, entries = requests.query()
+    assert count == len(requests) == 4
+    assert [entry['body']['merchantRefNum'] for entry in entries] == ['r6', 'r7', 'r8', 'r9']
+    # Evicted entries are gone from the indexes too
+    assert requests.query(fields={'merchantRefNum': 'r1'}) == (0, [])
+    requests.close()
+    spilled = [json.loads(line) for line in spill.read_text().splitlines()]
+    assert [entry['sequence'] for entry in spilled] == list(range(6)) and requests.spilled == 6
+
+
+def test_recording_drains_in_batches(monkeypatch):
+    monkeypatch.setattr(journal, 'DRAIN_AT', 3)
+    requests = RequestJournal(capacity=2)
+    for number in range(5):
+        record(requests, number)
+    # The third record drained the first three; the last two wait for the next drain or query
+    assert requests._next == 3 and len(requests._pending) == 2
+    assert [entry['sequence'] for entry in requests.query()[1]] == [3, 4]
+
+
+def test_query_filters():
+    requests = RequestJournal(capacity=100)
+    record(requests, 1, amount=10)
+    record(requests, 2, amount=10.0, billingDetails={'city': 'Sofia'})
+    record(requests, 3, route='/finish', method='GET', status=404)
+    record(requests, 4, namespace='suite-a', amount=25.5)
+
+    def sequences(**filters):
+        return [entry['sequence'] for entry in requests.query(**filters)[1]]
+
+    assert sequences(route='/deposit') == [0, 1, 3]
+    assert sequences(method='get') == [2]
+    assert sequences(status=404) == [2]
+    assert sequences(namespace='suite-a') == [3]
+    # Indexed and dotted non-indexed body fields, compared as strings
+    assert sequences(fields={'amount': '10'}) == [0, 1]
+    assert sequences(fields={'amount': '25.5'}, route='/deposit') == [3]
+    assert sequences(fields={'billingDetails.city': 'Sofia'}) == [1]
+    assert sequences(route='/deposit', method='GET') == []
+
+
+def test_query_time_window_and_limit(monkeypatch):
+    requests = RequestJournal(capacity=100)
+    for number in range(10):
+        monkeypatch.setattr(journal.time, 'time', lambda: 1000.0 + number)
+        record(requests, number)
+    count, entries = requests.query(since=1003, until=1007, limit=2)
+    assert count == 5 and [entry['sequence'] for entry in entries] == [3, 4]
+    assert requests.query(route='/deposit', since=1009)[0] == 1
+
+
+def test_clear():
+    requests = RequestJournal(capacity=3)
+    for number in range(5):
+        record(requests, number)
+    requests.query()
+    requests.clear()
+    assert len(requests) == 0 and requests.query(route='/deposit') == (0, [])
+    record(requests, 5)
+    assert [entry['sequence'] for entry in requests.query()[1]] == [5]
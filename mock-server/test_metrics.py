@@ -0,0 +1,58 @@
+import threading
+
+import metrics
+from metrics import BUCKET_COUNT, SUB_BUCKETS, RouteMetrics, bucket_bounds, bucket_index
+
+
+def test_buckets_are_exact_below_sub_bucket_count():
+    assert [bucket_index(value) for value in range(SUB_BUCKETS)] == list(range(SUB_BUCKETS))
+    assert bucket_index(SUB_BUCKETS) == SUB_BUCKETS
+
+
+def test_buckets_cover_values_contiguously():
+    previous_high = -1
+    for index in range(BUCKET_COUNT - 1):
+        low, high = bucket_bounds(index)
+        assert low == previous_high + 1
+        assert bucket_index(low) == index and bucket_index(high) == index
+        # Log-linear: every bucket is within ~3% of its lower bound
+        assert (high - low) <= max(1, low) / SUB_BUCKETS
+        previous_high = high
+    assert bucket_index(1 << 60) == BUCKET_COUNT - 1
+
+
+def finish_at(recorder, route, status, seconds, monkeypatch):
+    monkeypatch.setattr(metrics.time, 'perf_counter', lambda: 100.0)
+    started = recorder.start(route, 'GET')
+    monkeypatch.setattr(metrics.time, 'perf_counter', lambda: 100.0 + seconds)
+    recorder.finish(route, 'GET', status, started)
+
+
+def test_quantiles_and_statuses(monkeypatch):
+    recorder = RouteMetrics()
+    for millis in range(1, 101):
+        finish_at(recorder, '/a', 200 if millis <= 90 else 503, millis / 1000, monkeypatch)
+    finish_at(recorder, '/a', 'reset', 0.001, monkeypatch)
+    summary = recorder.snapshot()[('/a', 'GET')]
+    assert summary['requests'] == summary['count'] == 101
+    assert summary['statuses'] == {'200': 90, '503': 10, 'reset': 1}
+    assert abs(summary['quantiles'][0.5] - 0.050) < 0.050 * 0.04
+    assert abs(summary['quantiles'][0.99] - 0.099) < 0.099 * 0.04
+    assert abs(summary['max'] - 0.1) < 2e-6
+
+
+def test_in_flight_counts_requests_finished_on_other_threads():
+    recorder = RouteMetrics()
+    started = [recorder.start('/slow', 'GET') for _ in range(5)]
+    assert recorder.snapshot()[('/slow', 'GET')]['in_flight'] == 5
+    # Responses can be closed by another thread than the one that started them
+    threads = [threading.Thread(target=recorder.finish, args=('/slow', 'GET', 200, begun)) for begun in started[:3]]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    summary = recorder.snapshot()[('/slow', 'GET')]
+    assert (summary['in_flight'], summary['requests']) == (2, 3)
+    prometheus = recorder.as_prometheus()
+    assert 'mock_requests_in_flight{route="/slow",method="GET"} 2' in prometheus
+    assert 'mock_requests_total{route="/slow",method="GET",status="200"} 3' in prometheus
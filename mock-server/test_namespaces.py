@@ -0,0 +1,39 @@
+import pytest
+
+from namespaces import Namespace, NamespaceError, NamespaceRegistry
+
+
+@pytest.fixture()
+def registry():
+    registry = NamespaceRegistry(Namespace('default', max_records=100), defaults={'max_records': 50}, max_auto=2)
+    yield registry
+    registry.stop()
+
+
+@pytest.mark.parametrize('config', [
+    {'rate_limit': 'abc'}, {'rate_limit': 0}, {'rate_limit': -1}, {'rate_limit': float('nan')}, {'rate_limit': True},
+    {'max_records': 'x'}, {'max_records': 0}, {'max_records': 2.5}, {'max_records': None},
+])
+def test_create_rejects_bad_quotas(registry, config):
+    with pytest.raises(NamespaceError):
+        registry.create('bar', **config)
+    assert registry.get('bar').max_records == 50
+
+
+def test_create_applies_quotas(registry):
+    namespace = registry.create('bar', max_records=10, rate_limit=0.5)
+    assert (namespace.max_records, namespace.rate_limit) == (10, 0.5)
+    assert namespace.limiter.allow() and not namespace.limiter.allow()
+
+
+def test_bad_auto_create_defaults_do_not_evict():
+    registry = NamespaceRegistry(Namespace('default'), defaults={'max_records': -1}, max_auto=1)
+    with pytest.raises(NamespaceError):
+        registry.get('a')
+    assert registry._auto == set()
+
+
+def test_auto_created_namespaces_are_bounded(registry):
+    for name in ('a', 'b', 'c'):
+        registry.get(name)
+    assert sorted(namespace['name'] for namespace in registry.describe()) == ['b', 'c', 'default']
@@ -0,0 +1,57 @@
+import threading
+
+from payment_store import HandleRegistry, PaymentStore
+
+
+def handle(token, ref, email='a@b.c'):
+    return {'paymentHandleToken': token, 'merchantRefNum': ref, 'email': email}
+
+
+def test_find_follows_replace_and_pop():
+    registry = HandleRegistry(shards=4)
+    registry.put('t1', handle('t1', 'r1'))
+    registry.put('t2', handle('t2', 'r1', 'x@y.z'))
+    assert {h['paymentHandleToken'] for h in registry.find('merchantRefNum', 'r1')} == {'t1', 't2'}
+    registry.put('t1', handle('t1', 'r2'))
+    registry.pop('t2')
+    assert registry.find('merchantRefNum', 'r1') == []
+    assert [h['paymentHandleToken'] for h in registry.find('merchantRefNum', 'r2')] == ['t1']
+    assert [h['paymentHandleToken'] for h in registry.find('email', 'a@b.c')] == ['t1']
+
+
+def test_eviction_updates_indexes():
+    registry = HandleRegistry(shards=1, max_size=2)
+    for number in range(3):
+        registry.put(f't{number}', handle(f't{number}', 'same'))
+    assert len(registry) == 2
+    assert sorted(h['paymentHandleToken'] for h in registry.find('merchantRefNum', 'same')) == ['t1', 't2']
+
+
+def test_concurrent_writers_keep_indexes_consistent():
+    registry = HandleRegistry(shards=8, max_size=100000)
+
+    def write(worker):
+        for number in range(2000):
+            token = f'{worker}-{number}'
+            registry.put(token, handle(token, f'ref-{number % 50}', f'{worker}@b.c'))
+            if number % 3 == 0:
+                registry.pop(token)
+
+    threads = [threading.Thread(target=write, args=(worker,)) for worker in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    live = dict(registry.items())
+    for worker in range(8):
+        assert {h['paymentHandleToken'] for h in registry.find('email', f'{worker}@b.c')} == \
+            {token for token, record in live.items() if record['email'] == f'{worker}@b.c'}
+    indexed = sum(len(tokens) for _, index in registry._indexes['merchantRefNum'] for tokens in index.values())
+    assert indexed == len(live)
+
+
+def test_store_ttl_and_bulk_insert():
+    store = PaymentStore(shards=2, max_size=10)
+    store.put_many([(f'k{number}', number, None) for number in range(4)] + [('gone', 0, -1)])
+    store.put('short', 1, ttl=1e-9)
+    assert len(store.items()) == 4 and store.get('short') is None and store.get('k3') == 3
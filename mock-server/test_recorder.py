@@ -0,0 +1,81 @@
+import json
+
+import pytest
+
+from recorder import RecordReplayProxy, RecordingStore, request_key
+
+
+def test_key_ignores_json_key_order_and_whitespace():
+    assert request_key('post', '/pay', [], b'{"a": 1, "b": [1, 2]}') == \
+        request_key('POST', '/pay', [], b'{"b":[1,2],"a":1}')
+
+
+def test_key_sorts_query():
+    assert request_key('GET', '/p', [('b', '2'), ('a', '1')], b'') == request_key('GET', '/p', [('a', '1'), ('b', '2')], b'')
+    assert request_key('GET', '/p', [('a', '1')], b'') != request_key('GET', '/p', [('a', '2')], b'')
+
+
+def test_key_drops_ignored_fields_at_any_depth():
+    first = b'{"merchantRefNum": "1", "order": {"merchantRefNum": "x", "amount": 5}}'
+    second = b'{"merchantRefNum": "2", "order": {"merchantRefNum": "y", "amount": 5}}'
+    assert request_key('POST', '/p', [], first) != request_key('POST', '/p', [], second)
+    assert request_key('POST', '/p', [], first, ['merchantRefNum']) == \
+        request_key('POST', '/p', [], second, ['merchantRefNum'])
+
+
+def test_key_of_non_json_body_is_raw():
+    assert request_key('POST', '/p', [], b'a=1') != request_key('POST', '/p', [], b'a=2')
+    assert request_key('POST', '/p', [], b'') == request_key('POST', '/p', [], None)
+
+
+def record(path, *requests):
+    store = RecordingStore(str(path))
+    for index, body in enumerate(requests):
+        store.append('POST', '/pay', [('brand', 'euro')], body, 'http://upstream/pay', 200,
+                     {'X-Index': str(index)}, json.dumps({"index": index}).encode())
+    store.close()
+
+
+def test_replay_with_other_ignored_fields(tmp_path):
+    path = tmp_path / 'recording.ndjson'
+    record(path, b'{"amount": 5, "merchantRefNum": "a"}')
+    strict = RecordReplayProxy('replay', str(path))
+    assert strict.handle('POST', '/pay', [('brand', 'euro')], [], b'{"amount": 5, "merchantRefNum": "b"}') is None
+    lenient = RecordReplayProxy('replay', str(path), ignore_fields=['merchantRefNum'])
+    status, headers, body = lenient.handle('POST', '/pay', [('brand', 'euro')], [],
+                                           b'{"merchantRefNum": "b", "amount": 5}')
+    assert (status, headers, json.loads(body)) == (200, {'X-Index': '0'}, {"index": 0})
+
+
+def test_repeated_requests_cycle(tmp_path):
+    path = tmp_path / 'recording.ndjson'
+    record(path, b'{}', b'{}')
+    proxy = RecordReplayProxy('replay', str(path))
+    assert [proxy.handle('POST', '/pay', [('brand', 'euro')], [], b'{}')[1]['X-Index'] for _ in range(3)] == \
+        ['0', '1', '0']
+
+
+def test_replay_opens_read_only_and_skips_partial_record(tmp_path):
+    path = tmp_path / 'recording.ndjson'
+    record(path, b'{}')
+    with open(path, 'ab') as file:
+        file.write(b'{"method": "POST", "path": "/pa')
+    size = path.stat().st_size
+    store = RecordingStore(str(path), writable=False)
+    assert len(store) == 1
+    with pytest.raises(OSError):
+        store._file.write(b'x')
+    assert path.stat().st_size == size
+
+
+def test_record_mode_truncates_partial_record(tmp_path):
+    path = tmp_path / 'recording.ndjson'
+    record(path, b'{}')
+    complete = path.stat().st_size
+    with open(path, 'ab') as file:
+        file.write(b'{"method": "POST"')
+    store = RecordingStore(str(path))
+    assert len(store) == 1 and path.stat().st_size == complete
+    store.append('GET', '/next', [], b'', 'http://upstream/next', 204, {}, b'')
+    store.close()
+    assert len(RecordingStore(str(path), writable=False)) == 2
@@ -0,0 +1,45 @@
+from schemas import SCHEMAS, RequestValidator, is_structural, shape
+
+
+def deposit(amount=10.5, email='a@b.c'):
+    return {'amount': amount, 'email': email, 'returnLinks': [{'rel': 'default', 'href': 'http://x'}]}
+
+
+def test_shape_ignores_values_but_not_types():
+    assert shape(deposit()) == shape(deposit(99, 'other@b.c'))
+    assert shape(deposit()) != shape(deposit('10.5'))
+    assert shape({'a': True}) != shape({'a': 1})
+
+
+def test_built_in_schemas_are_structural():
+    assert all(is_structural(schema) for schema in SCHEMAS.values())
+    assert not is_structural({'type': 'integer'})
+    assert not is_structural({'type': 'string', 'pattern': '^a'})
+
+
+def test_valid_shapes_are_cached():
+    validator = RequestValidator()
+    assert validator.validate('deposit', deposit()) == []
+    assert len(validator._valid_shapes['deposit']) == 1
+    calls = []
+    real = validator.validators['deposit']
+    validator.validators['deposit'] = type('Spy', (), {'iter_errors': lambda self, payload: calls.append(payload)
+                                                       or real.iter_errors(payload)})()
+    assert validator.validate('deposit', deposit(20, 'x@y.z')) == []
+    assert calls == []
+
+
+def test_string_amount_is_rejected():
+    validator = RequestValidator()
+    assert validator.validate('deposit', deposit()) == []
+    errors = validator.validate('deposit', deposit('10.5'))
+    assert errors == ["amount: '10.5' is not of type 'number'"]
+    # Invalid shapes are never cached
+    assert validator.validate('deposit', deposit('10.5')) == errors
+
+
+def test_value_constrained_schemas_are_always_validated():
+    validator = RequestValidator({'limited': {'type': 'object', 'properties': {'n': {'type': 'number', 'minimum': 0}}}})
+    assert validator.validate('limited', {'n': 1}) == []
+    assert validator.validate('limited', {'n': -1}) == ['n: -1 is less than the minimum of 0']
+    assert validator._valid_shapes['limited'] == set()
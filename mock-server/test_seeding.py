@@ -0,0 +1,87 @@
+import io
+import json
+import time
+
+import pytest
+
+import seeding
+from seeding import SeedError, iter_json_array, iter_ndjson, seed
+
+
+class ListStore:
+    def __init__(self):
+        self.records = {}
+
+    def put_many(self, batch):
+        for key, record, _ in batch:
+            self.records[key] = record
+
+
+def parse(body):
+    return [item if not isinstance(item, SeedError) else 'error'
+            for item in iter_json_array(io.BytesIO(body.encode()))]
+
+
+@pytest.fixture(autouse=True)
+def small_reads(monkeypatch):
+    monkeypatch.setattr(seeding, 'READ_SIZE', 8)
+
+
+@pytest.mark.parametrize('body, expected', [
+    ('[]', []),
+    ('  [ 1 , 2 ]  ', [1, 2]),
+    ('[1,   123456789]', [1, 123456789]),
+    ('[1.5e10, -0.25, true, null]', [1.5e10, -0.25, True, None]),
+    ('[{"a": "x,]}\\"y", "b": [1, {"c": 2}]}, "é€"]', [{"a": 'x,]}"y', "b": [1, {"c": 2}]}, "é€"]),
+])
+def test_elements_split_across_chunks(body, expected):
+    assert parse(body) == expected
+
+
+@pytest.mark.parametrize('body, expected', [
+    ('[1, {"a": }, 2]', [1, 'error', 2]),
+    ('[1, 2x, 3]', [1, 'error', 3]),
+    ('[{"a": 1}}, 4]', ['error', 4]),
+    ('[[1}, 5]', ['error', 5]),
+    ('[1, 2', [1, 'error']),
+    ('[1, {"a": "open', [1, 'error']),
+])
+def test_malformed_elements_are_reported(body, expected):
+    assert parse(body) == expected
+
+
+def test_not_an_array():
+    with pytest.raises(SeedError):
+        parse('{"a": 1}')
+
+
+def test_empty_body():
+    assert parse('') == []
+
+
+def test_oversized_element_stops_parsing(monkeypatch):
+    monkeypatch.setattr(seeding, 'MAX_ITEM_SIZE', 64)
+    assert parse('[1, "' + 'x' * 200 + '", 2]') == [1, 'error']
+
+
+def test_malformed_element_does_not_buffer_the_body(monkeypatch):
+    monkeypatch.setattr(seeding, 'READ_SIZE', 65536)
+    body = '[{"amount": }, ' + ', '.join(['{"amount": 1, "email": "a@b.c"}'] * 100000) + ']'
+    started = time.perf_counter()
+    items = list(iter_json_array(io.BytesIO(body.encode())))
+    assert time.perf_counter() - started < 5
+    assert isinstance(items[0], SeedError) and len(items) == 100001
+
+
+def test_seed_reports_per_item():
+    body = json.dumps([{"amount": 10, "email": "a@b.c", "internalId": "one"}, {"amount": "x", "email": "a"}])
+    store = ListStore()
+    report = seed(store, 'deposits', iter_json_array(io.BytesIO((body[:-1] + ', {"amount": }').encode())))
+    assert report["inserted"] == 1 and report["failed"] == 2
+    assert [error["index"] for error in report["errors"]] == [1, 2]
+    assert set(store.records) == {'one'}
+
+
+def test_ndjson_invalid_line():
+    items = list(iter_ndjson(io.StringIO('{"a": 1}\n\n{"a":\n')))
+    assert items[0] == {"a": 1} and isinstance(items[1], SeedError)
@@ -0,0 +1,163 @@
+import asyncio
+import http.client
+import io
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from faults import FaultPlan
+from serving import AsyncioServer, FaultMiddleware, InFlightMiddleware
+
+
+class Body:
+    def __init__(self):
+        self.closed = False
+
+    def __iter__(self):
+        return iter([b'ok'])
+
+    def close(self):
+        self.closed = True
+
+
+def call(middleware):
+    statuses = []
+    response = middleware({}, lambda status, headers: statuses.append(status))
+    return response, statuses
+
+
+def test_request_is_in_flight_until_closed():
+    body = Body()
+    middleware = InFlightMiddleware(lambda environ, start_response: body)
+    response, _ = call(middleware)
+    assert middleware.in_flight == 1 and list(response) == [b'ok']
+    response.close()
+    response.close()
+    assert middleware.in_flight == 0 and body.closed
+
+
+def test_drain_waits_then_refuses_new_requests():
+    middleware = InFlightMiddleware(lambda environ, start_response: [b'ok'])
+    shutdown, _ = call(middleware)
+    pending, _ = call(middleware)
+    threading.Timer(0.05, pending.close).start()
+    started = time.monotonic()
+    assert middleware.drain(timeout=5) and time.monotonic() - started < 1
+    refused, statuses = call(middleware)
+    assert statuses == ['503 Service Unavailable'] and middleware.in_flight == 1
+
+
+def test_drain_times_out():
+    middleware = InFlightMiddleware(lambda environ, start_response: [b'ok'])
+    call(middleware)
+    call(middleware)
+    assert not middleware.drain(timeout=0.05)
+
+
+def fault_app(plans):
+    """
+    WSGI app answering 'ok:<path>' (or the request body on POST) with the FaultPlan of its path.
+    """
+    def app(environ, start_response):
+        plan = plans.get(environ['PATH_INFO'])
+        if plan is not None:
+            environ['mock.fault'] = FaultPlan(time.monotonic() + plan[0], plan[1], plan[2])
+        body = environ['wsgi.input'].read() if environ['REQUEST_METHOD'] == 'POST' else \
+            f'ok:{environ["PATH_INFO"]}'.encode()
+        start_response('200 OK', [('Content-Type', 'text/plain'), ('Content-Length', str(len(body)))])
+        return [body]
+    return app
+
+
+@pytest.fixture()
+def asyncio_server():
+    servers = []
+
+    def start(app, threads=2):
+        server = AsyncioServer(app, port=0, threads=threads)
+        loop = asyncio.new_event_loop()
+        loop.run_until_complete(server.start())
+        thread = threading.Thread(target=loop.run_forever, daemon=True)
+        thread.start()
+        servers.append((server, loop, thread))
+        return server.port
+
+    yield start
+    for server, loop, thread in servers:
+        loop.call_soon_threadsafe(server.close)
+        loop.call_soon_threadsafe(loop.stop)
+        thread.join(5)
+
+
+def fetch(port, path, method='GET', body=None, headers=None):
+    connection = http.client.HTTPConnection('127.0.0.1', port, timeout=10)
+    try:
+        connection.request(method, path, body=body, headers=headers or {})
+        response = connection.getresponse()
+        return response.status, response.read()
+    finally:
+        connection.close()
+
+
+def test_asyncio_delays_do_not_hold_worker_threads(asyncio_server):
+    port = asyncio_server(fault_app({'/slow': (0.5, 0, False)}), threads=2)
+    started = time.monotonic()
+    with ThreadPoolExecutor(100) as pool:
+        results = list(pool.map(lambda _: fetch(port, '/slow'), range(100)))
+    elapsed = time.monotonic() - started
+    assert results == [(200, b'ok:/slow')] * 100
+    # 2 threads holding 0.5 s each would need 25 s
+    assert 0.5 <= elapsed < 3
+
+
+def test_asyncio_reset_aborts_the_connection(asyncio_server):
+    port = asyncio_server(fault_app({'/reset': (0, 0, True)}))
+    with pytest.raises(ConnectionResetError):
+        fetch(port, '/reset')
+    assert fetch(port, '/fine') == (200, b'ok:/fine')
+
+
+def test_asyncio_keep_alive_and_chunked_body(asyncio_server):
+    port = asyncio_server(fault_app({}))
+    connection = http.client.HTTPConnection('127.0.0.1', port, timeout=10)
+    connection.request('POST', '/echo', body=iter([b'{"a": ', b'1}']), encode_chunked=True)
+    response = connection.getresponse()
+    assert response.read() == b'{"a": 1}'
+    connection.request('GET', '/again?x=1')
+    assert connection.getresponse().read() == b'ok:/again'
+    connection.close()
+
+
+def test_asyncio_bandwidth_limit(asyncio_server):
+    port = asyncio_server(fault_app({'/echo': (0, 2000, False)}))
+    started = time.monotonic()
+    assert fetch(port, '/echo', 'POST', b'x' * 1000) == (200, b'x' * 1000)
+    assert time.monotonic() - started >= 0.4
+
+
+def run_threaded(app, environ=None):
+    environ = dict(environ or {}, PATH_INFO='/reset', REQUEST_METHOD='GET')
+    environ['wsgi.input'] = io.BytesIO()
+    statuses = []
+    response = app(environ, lambda status, headers, exc_info=None: statuses.append((status, dict(headers))))
+    try:
+        return statuses, b''.join(response)
+    finally:
+        response.close()
+
+
+def test_fault_middleware_uses_the_servers_abort_hook():
+    aborted = []
+    app = FaultMiddleware(fault_app({'/reset': (0, 0, True)}), threads=4)
+    assert run_threaded(app, {'mock.abort': lambda: aborted.append(True)}) == ([], b'')
+    assert aborted == [True]
+
+
+def test_fault_middleware_cuts_the_response_without_a_hook():
+    app = FaultMiddleware(fault_app({'/reset': (0.05, 0, True)}), threads=4)
+    started = time.monotonic()
+    statuses, body = run_threaded(app)
+    assert time.monotonic() - started >= 0.05
+    assert body == b'' and statuses[0][1]['Connection'] == 'close'
@@ -0,0 +1,59 @@
+import pytest
+
+import snapshot
+from payment_store import HandleRegistry, PaymentStore
+from snapshot import SnapshotError, load_snapshot, save_snapshot
+
+
+def filled_stores(count):
+    data, handles = PaymentStore(shards=4), HandleRegistry(shards=4)
+    for number in range(count):
+        data.put(f'p{number}', {'id': f'p{number}', 'amount': number}, ttl=3600 if number % 2 else None)
+        handles.put(f't{number}', {'paymentHandleToken': f't{number}', 'merchantRefNum': f'r{number % 7}'})
+    return {'payment_data': data, 'payment_handles': handles}
+
+
+def test_round_trip(tmp_path, monkeypatch):
+    # Several chunks per store
+    monkeypatch.setattr(snapshot, 'CHUNK_SIZE', 64)
+    path = str(tmp_path / 'mock.snap')
+    stores = filled_stores(500)
+    assert save_snapshot(path, stores) == {'payment_data': 500, 'payment_handles': 500}
+    restored = {'payment_data': PaymentStore(shards=4), 'payment_handles': HandleRegistry(shards=4)}
+    assert load_snapshot(path, restored) == {'payment_data': 500, 'payment_handles': 500}
+    assert dict(restored['payment_data'].items()) == dict(stores['payment_data'].items())
+    ttls = {key: ttl for key, _, ttl in restored['payment_data'].dump()}
+    assert ttls['p0'] is None and 3590 < ttls['p1'] <= 3600
+    assert len(restored['payment_handles'].find('merchantRefNum', 'r3')) == len(range(3, 500, 7))
+
+
+def test_unknown_stores_are_skipped(tmp_path):
+    path = str(tmp_path / 'mock.snap')
+    save_snapshot(path, filled_stores(10))
+    data = PaymentStore()
+    assert load_snapshot(path, {'payment_data': data}) == {'payment_data': 10}
+    assert len(data) == 10
+
+
+@pytest.mark.parametrize('cut', [4, 20, -1, -200])
+def test_truncated_file(tmp_path, cut):
+    path = tmp_path / 'mock.snap'
+    save_snapshot(str(path), filled_stores(100))
+    path.write_bytes(path.read_bytes()[:cut])
+    with pytest.raises(SnapshotError, match='truncated'):
+        load_snapshot(str(path), filled_stores(0))
+
+
+def test_corrupt_chunk(tmp_path):
+    path = tmp_path / 'mock.snap'
+    save_snapshot(str(path), filled_stores(100))
+    path.write_bytes(path.read_bytes().replace(b'"amount"', b'"amount\xff'))
+    with pytest.raises(SnapshotError, match='corrupt'):
+        load_snapshot(str(path), filled_stores(0))
+
+
+def test_not_a_snapshot(tmp_path):
+    path = tmp_path / 'mock.snap'
+    path.write_bytes(b'{"not": "a snapshot"}')
+    with pytest.raises(SnapshotError):
+        load_snapshot(str(path), filled_stores(0))
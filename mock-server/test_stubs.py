@@ -0,0 +1,106 @@
+import os
+import time
+
+import pytest
+
+from stubs import StubEngine, StubError, StubTable, Stub, load_stub_file
+
+STUB_DIRECTORY = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'stubs')
+
+
+def stub(path, method='GET', name=None, match=None, status=200):
+    return Stub({'name': name or path, 'method': method, 'path': path, 'match': match or {},
+                 'response': {'status': status}})
+
+
+@pytest.fixture()
+def table():
+    return StubTable([
+        stub('/users/me', name='static me'),
+        stub('/users/{id}', name='user'),
+        stub('/users/{id}/orders', name='orders'),
+        stub('/users/{id}/orders/latest', name='latest'),
+        stub('/users/{id}', method='POST', name='create'),
+    ])
+
+
+def first(table, method, path):
+    for stubs, params in table.lookup(method, path):
+        return [candidate.name for candidate in stubs], params
+    return [], {}
+
+
+def test_static_path_wins_over_template(table):
+    assert first(table, 'GET', '/users/me') == (['static me'], {})
+
+
+def test_path_params_are_captured(table):
+    assert first(table, 'GET', '/users/42/orders') == (['orders'], {'id': '42'})
+    assert first(table, 'GET', '/users/42/orders/latest/') == (['latest'], {'id': '42'})
+
+
+def test_no_match(table):
+    assert first(table, 'GET', '/users/42/basket') == ([], {})
+    assert first(table, 'DELETE', '/users/42') == ([], {})
+
+
+def test_methods_are_separate(table):
+    assert first(table, 'POST', '/users/42') == (['create'], {'id': '42'})
+
+
+def test_lookup_falls_back_to_less_specific_routes():
+    table = StubTable([stub('/users/me', match={'query': {'v': '2'}}, name='me v2'), stub('/users/{id}', name='user')])
+    assert [[candidate.name for candidate in stubs] for stubs, _ in table.lookup('GET', '/users/me')] == \
+        [['me v2'], ['user']]
+
+
+def test_dispatch_falls_back_when_matchers_reject(tmp_path):
+    (tmp_path / 'stubs.json').write_text('''[
+        {"path": "/users/me", "match": {"headers": {"X-Brand": "euro"}}, "response": {"status": 201}},
+        {"path": "/users/{id}", "response": {"body": {"id": "{{path.id}}"}}}
+    ]''')
+    engine = StubEngine(str(tmp_path))
+    assert engine.dispatch('GET', '/users/me', {}, {'x-brand': 'euro'}, None)[0] == 201
+    assert engine.dispatch('GET', '/users/me', {}, {}, None) == (200, {}, {'id': 'me'})
+
+
+def test_skrill_unsupported_currency_is_reachable():
+    engine = StubEngine(STUB_DIRECTORY)
+    body = {'paymentType': 'SKRILL', 'amount': 10}
+    status, _, rejected = engine.dispatch('POST', '/cashier/skrill/deposit/7', {'currency': 'XXX'}, {}, body)
+    assert status == 400 and rejected['error'] == 'Unsupported currency for 7'
+    status, _, approved = engine.dispatch('POST', '/cashier/skrill/deposit/7', {'currency': 'EUR'}, {}, body)
+    assert status == 200 and approved['amount'] == 10 and approved['userId'] == '7'
+
+
+@pytest.mark.parametrize('name, content', [
+    ('broken.yaml', '- path: /a\n  response: {status: 200\n'),
+    ('broken.json', '[{"path": "/a",'),
+    ('match.yaml', '- path: /a\n  match: [query]\n'),
+    ('status.json', '[{"path": "/a", "response": {"status": "OK"}}]'),
+])
+def test_invalid_files_raise_stub_error(tmp_path, name, content):
+    (tmp_path / name).write_text(content)
+    with pytest.raises(StubError):
+        load_stub_file(str(tmp_path / name))
+
+
+def test_watcher_survives_a_broken_file(tmp_path):
+    stub_file = tmp_path / 'stubs.yaml'
+    stub_file.write_text('- path: /a\n')
+    engine = StubEngine(str(tmp_path))
+    engine.watch(interval=0.01)
+    try:
+        stub_file.write_text('- path: /a\n  response: {status: 200\n')
+        os.utime(stub_file, (time.time() + 1, time.time() + 1))
+        time.sleep(0.1)
+        assert engine._watcher.is_alive()
+        assert engine.table.count == 1
+        stub_file.write_text('- path: /a\n- path: /b\n')
+        os.utime(stub_file, (time.time() + 2, time.time() + 2))
+        deadline = time.time() + 2
+        while engine.table.count != 2 and time.time() < deadline:
+            time.sleep(0.01)
+        assert engine.table.count == 2
+    finally:
+        engine.stop()
@@ -0,0 +1,54 @@
+import json
+import re
+import time
+
+import templates
+from templates import Field, ResponseTemplate, utc_timestamp, uuid4_str
+
+TEMPLATE = {
+    "id": Field("id"), "status": "INITIATED", "dupCheck": True, "amount": Field("amount"), "note": None,
+    "billingDetails": Field("billing"), "links": [{"rel": "self", "href": Field("href")}, "é\"\\"],
+    "gatewayResponse": {"orderId": Field("orderId"), "lang": "en_US"},
+}
+
+
+def expected(values):
+    resolved = json.loads(json.dumps(TEMPLATE, default=lambda field: values[field.name]))
+    return json.dumps(resolved, separators=(',', ':')).encode()
+
+
+def test_render_decodes_to_the_filled_template():
+    template = ResponseTemplate(TEMPLATE)
+    for values in (
+        {"id": "a", "amount": 500, "billing": {"city": "Dublin", "zip": None}, "href": "http://x/ü", "orderId": "o"},
+        {"id": "quote\"and\\slash", "amount": 10.25, "billing": [], "href": "", "orderId": "\n"},
+        {"id": "", "amount": -1, "billing": {"nested": [1, 2.5, True, {"a": "b"}]}, "href": "x", "orderId": "y"},
+    ):
+        # orjson, when installed, writes non-ASCII values as UTF-8 where json.dumps escapes them
+        assert json.loads(template.render(values)) == json.loads(expected(values))
+
+
+def test_render_matches_json_dumps_bytes(monkeypatch):
+    encoder = json.JSONEncoder(separators=(',', ':'))
+    monkeypatch.setattr(templates, '_encode', lambda value: encoder.encode(value).encode())
+    values = {"id": "é", "amount": 1.5, "billing": {"street": "1 \"Main\" St"}, "href": "h", "orderId": "o"}
+    assert ResponseTemplate(TEMPLATE).render(values) == expected(values)
+
+
+def test_template_without_fields():
+    assert ResponseTemplate({"a": [1, "b"]}).render({}) == b'{"a":[1,"b"]}'
+
+
+def test_uuid4_str_is_a_random_v4_uuid():
+    values = {uuid4_str() for _ in range(1000)}
+    assert len(values) == 1000
+    assert all(re.fullmatch(r'[0-9a-f]{8}-[0-9a-f]{4}-4[0-9a-f]{3}-[89ab][0-9a-f]{3}-[0-9a-f]{12}', value)
+               for value in values)
+
+
+def test_utc_timestamp_follows_the_clock(monkeypatch):
+    monkeypatch.setattr(templates.time, 'time', lambda: 0.5)
+    assert utc_timestamp() == '1970-01-01T00:00:00Z'
+    monkeypatch.setattr(templates.time, 'time', lambda: 86401.9)
+    assert utc_timestamp() == '1970-01-02T00:00:01Z'
+    assert utc_timestamp() == time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime(86401))
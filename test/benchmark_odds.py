@@ -0,0 +1,54 @@
+"""
+Benchmark: adjusted multiples of 1M accumulators.
+
+'scalar' calls odds_adjustment_calculation once per bet (list comprehension +
+math.prod). 'padded' and 'offsets' are batch_odds_adjustment over a bets x legs
+array with a mask, and over all legs back to back with offsets. Batch results
+are checked against the scalar ones (relative error <= 1e-12).
+
+Usage: python benchmark_odds.py [bets]
+"""
+import sys, time
+
+import numpy as np
+
+from payload_generator import batch_odds_adjustment, odds_adjustment_calculation
+
+MAX_LEGS = 12
+
+
+def make_bets(count, seed=7):
+    rng = np.random.default_rng(seed)
+    legs = rng.integers(2, MAX_LEGS + 1, count)
+    odds = np.round(rng.uniform(1.01, 6.0, (count, MAX_LEGS)), 3)
+    mask = np.arange(MAX_LEGS) < legs[:, None]
+    adjustments = rng.integers(0, 60, count).astype(np.float64)
+    return odds, mask, legs, adjustments
+
+
+def measure(name, compute):
+    started = time.perf_counter()
+    result = compute()
+    elapsed = time.perf_counter() - started
+    print(f'{name:>8}: {elapsed:8.3f}s')
+    return result, elapsed
+
+
+if __name__ == '__main__':
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 1000000
+    odds, mask, legs, adjustments = make_bets(count)
+    odds_lists = [row[:length].tolist() for row, length in zip(odds, legs)]
+    adjustment_list = adjustments.tolist()
+    flat = odds[mask]
+    offsets = np.concatenate(([0], np.cumsum(legs)))
+    print(f'{count:,} bets, 2-{MAX_LEGS} legs')
+
+    scalar, baseline = measure('scalar', lambda: [odds_adjustment_calculation(bet, adjustment)
+                                                   for bet, adjustment in zip(odds_lists, adjustment_list)])
+    scalar = np.array(scalar)
+    for name, compute in (('padded', lambda: batch_odds_adjustment(odds, adjustments, mask=mask)),
+                          ('offsets', lambda: batch_odds_adjustment(flat, adjustments, offsets=offsets))):
+        result, elapsed = measure(name, compute)
+        error = np.max(np.abs(result - scalar) / scalar)
+        assert error <= 1e-12, f'{name} differs from the scalar function by {error}'
+        print(f'{"":>8}  speedup {baseline / elapsed:.1f}x, max relative error {error:.1e}')
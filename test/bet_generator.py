@@ -0,0 +1,242 @@
+"""
+Streaming generator of synthetic MULTIPLIER bet payloads, in the shape built
+by payload_generator.build_payload_for_multiple_bets.
+
+Bets are generated in chunks with NumPy: leg counts, leg odds, runnerIds,
+stakes and adjustments are drawn per chunk and the multiple odds come from
+batch_odds_adjustment. Each chunk is encoded and written straight to the
+output, so memory use is bounded by the chunk size, not the bet count.
+
+Chunk i is drawn from its own generator seeded with (seed, i), so a given
+seed and chunk size produce the same bets whatever the number of processes; with
+--processes > 1 chunks are generated in a process pool and written in order.
+
+Output formats:
+- ndjson: one payload per line.
+- binary: per chunk, a header (b'BETS', bet count u32, leg count u32) followed
+  by little-endian arrays: legs per bet u8, stake f8, adjustment f8, odds f8,
+  then leg odds f8 and leg runnerIds i8 for all legs back to back.
+  read_binary() streams payloads back from it.
+
+    python bet_generator.py 5000000 --out bets.ndjson --seed 42 --processes 8
+"""
+import argparse, collections, json, multiprocessing, struct, sys
+
+import numpy as np
+
+from payload_generator import batch_odds_adjustment
+
+FORMATS = ('ndjson', 'binary')
+ODDS_DISTRIBUTIONS = ('uniform', 'lognormal')
+CHUNK_SIZE = 50000
+_CHUNK_HEADER = struct.Struct('<4sII')
+_LEGS = np.dtype('<u1')
+_FLOATS = np.dtype('<f8')
+_IDS = np.dtype('<i8')
+
+
+class BetOptions:
+    """
+    What the generated bets look like.
+
+    Args:
+        legs: (min, max) legs per bet, inclusive.
+        odds: ('uniform', low, high) or ('lognormal', mu, sigma) for odds - 1; rounded to 2 decimals, >= 1.01.
+        runners: number of runnerIds in the pool (starting at runner_base). Legs of a bet get distinct runners.
+        stakes: stakes to choose from.
+        adjustments: % odds adjustments to choose from, per bet.
+        platform: payload platform.
+    """
+    def __init__(self, legs=(2, 8), odds=('lognormal', 0.0, 0.6), runners=100000, runner_base=12000000,
+                 stakes=(5, 10, 20, 50, 100, 150, 200), adjustments=(0, 10, 25, 50), platform='euro'):
+        if not 1 <= legs[0] <= legs[1] <= 255:
+            raise ValueError(f'Invalid leg range {legs}')
+        if odds[0] not in ODDS_DISTRIBUTIONS:
+            raise ValueError(f"Unknown odds distribution '{odds[0]}', expected one of {ODDS_DISTRIBUTIONS}")
+        if runners < legs[1]:
+            raise ValueError(f'Runner pool of {runners} is smaller than {legs[1]} legs')
+        self.legs = legs
+        self.odds = odds
+        self.runners = runners
+        self.runner_base = runner_base
+        self.stakes = np.asarray(stakes, dtype=np.float64)
+        self.adjustments = np.asarray(adjustments, dtype=np.float64)
+        self.platform = platform
+
+
+def generate_chunk(options, seed, chunk_index, size):
+    """
+    Draw `size` bets. Returns (legs per bet, stakes, adjustments, multiple odds, leg odds, leg runnerIds),
+    leg arrays back to back.
+    """
+    rng = np.random.default_rng([seed, chunk_index])
+    legs = rng.integers(options.legs[0], options.legs[1] + 1, size, dtype=np.int64)
+    total = int(legs.sum())
+    kind, first, second = options.odds
+    if kind == 'uniform':
+        leg_odds = rng.uniform(first, second, total)
+    else:
+        leg_odds = 1 + rng.lognormal(first, second, total)
+    leg_odds = np.maximum(np.round(leg_odds, 2), 1.01)
+    runner_ids = options.runner_base + sample_runners(rng, legs, options.runners)
+    stakes = rng.choice(options.stakes, size)
+    adjustments = rng.choice(options.adjustments, size)
+    offsets = np.concatenate(([0], np.cumsum(legs)))
+    odds = np.round(batch_odds_adjustment(leg_odds, adjustments, offsets=offsets), 4)
+    return legs, stakes, adjustments, odds, leg_odds, runner_ids
+
+
+def sample_runners(rng, legs, runners):
+    """
+    For each bet, `legs` distinct runner indexes drawn uniformly without replacement from range(runners),
+    returned back to back. Robert Floyd's sampling, vectorised over bets: step j draws the (j + 1)th runner
+    of every bet with more than j legs, so it takes max(legs) steps whatever the pool size.
+    """
+    most = int(legs.max()) if len(legs) else 0
+    chosen = np.empty((len(legs), most), dtype=np.int64)
+    for step in range(most):
+        active = np.flatnonzero(legs > step)
+        # Floyd: draw from [0, top]; if already taken, take top itself, which no earlier step could draw
+        top = runners - legs[active] + step
+        drawn = rng.integers(0, top + 1)
+        taken = (chosen[active, :step] == drawn[:, None]).any(axis=1)
+        chosen[active, step] = np.where(taken, top, drawn)
+    return chosen[np.arange(most) < legs[:, None]]
+
+
+def encode_ndjson(options, chunk):
+    legs, stakes, _, odds, leg_odds, runner_ids = chunk
+    leg_odds, runner_ids = leg_odds.tolist(), runner_ids.tolist()
+    lines = []
+    position = 0
+    for count, stake, multiple in zip(legs.tolist(), stakes.tolist(), odds.tolist()):
+        bet_legs = ','.join(f'{{"odds":{leg_odds[leg]!r},"runnerId":{runner_ids[leg]},"oddsType":"DECIMAL"}}'
+                            for leg in range(position, position + count))
+        position += count
+        lines.append(f'{{"bets":[{{"multiplierBetLegs":[{bet_legs}],"stake":{stake!r},"submittedType":"MULTIPLIER",'
+                     f'"odds":{multiple!r},"oddsType":"DECIMAL"}}],"platform":{json.dumps(options.platform)}}}\n')
+    return ''.join(lines).encode()
+
+
+def encode_binary(chunk):
+    legs, stakes, adjustments, odds, leg_odds, runner_ids = chunk
+    return b''.join((_CHUNK_HEADER.pack(b'BETS', len(legs), len(leg_odds)), legs.astype(_LEGS).tobytes(),
+                     stakes.astype(_FLOATS).tobytes(), adjustments.astype(_FLOATS).tobytes(),
+                     odds.astype(_FLOATS).tobytes(), leg_odds.astype(_FLOATS).tobytes(),
+                     runner_ids.astype(_IDS).tobytes()))
+
+
+def _encoded_chunk(job):
+    options, output_format, seed, chunk_index, size = job
+    chunk = generate_chunk(options, seed, chunk_index, size)
+    return encode_ndjson(options, chunk) if output_format == 'ndjson' else encode_binary(chunk)
+
+
+def _ordered_map(pool, function, jobs, window):
+    """
+    pool.imap with at most `window` jobs submitted ahead of the result being consumed, so encoded chunks
+    cannot pile up in memory when the output is slower than the workers.
+    """
+    pending = collections.deque()
+    for job in jobs:
+        pending.append(pool.apply_async(function, (job,)))
+        if len(pending) >= window:
+            yield pending.popleft().get()
+    while pending:
+        yield pending.popleft().get()
+
+
+def _jobs(options, output_format, count, seed, chunk_size):
+    for chunk_index, start in enumerate(range(0, count, chunk_size)):
+        yield options, output_format, seed, chunk_index, min(chunk_size, count - start)
+
+
+def write_bets(file, count, options=None, output_format='ndjson', seed=0, processes=1, chunk_size=CHUNK_SIZE):
+    """
+    Generate `count` bets into the binary `file`, chunk by chunk.
+    Returns the number of bytes written.
+    """
+    if output_format not in FORMATS:
+        raise ValueError(f"Unknown format '{output_format}', expected one of {FORMATS}")
+    options = options or BetOptions()
+    jobs = _jobs(options, output_format, count, seed, chunk_size)
+    written = 0
+    if processes > 1:
+        with multiprocessing.Pool(processes) as pool:
+            # Results are taken in chunk order, so the output doesn't depend on the process count
+            for data in _ordered_map(pool, _encoded_chunk, jobs, 2 * processes):
+                file.write(data)
+                written += len(data)
+    else:
+        for job in jobs:
+            data = _encoded_chunk(job)
+            file.write(data)
+            written += len(data)
+    return written
+
+
+def generate_bets(count, options=None, seed=0, chunk_size=CHUNK_SIZE):
+    """
+    Lazily yield `count` bet payload dicts.
+    """
+    options = options or BetOptions()
+    for _, _, _, chunk_index, size in _jobs(options, 'ndjson', count, seed, chunk_size):
+        for line in encode_ndjson(options, generate_chunk(options, seed, chunk_index, size)).splitlines():
+            yield json.loads(line)
+
+
+def read_binary(file, platform='euro'):
+    """
+    Stream bet payload dicts back from a binary file written by write_bets.
+    """
+    while True:
+        header = file.read(_CHUNK_HEADER.size)
+        if not header:
+            return
+        magic, bets, total = _CHUNK_HEADER.unpack(header)
+        if magic != b'BETS':
+            raise ValueError('Not a bet chunk')
+        legs = np.frombuffer(file.read(bets * _LEGS.itemsize), _LEGS).tolist()
+        stakes = np.frombuffer(file.read(bets * _FLOATS.itemsize), _FLOATS).tolist()
+        file.read(bets * _FLOATS.itemsize)
+        odds = np.frombuffer(file.read(bets * _FLOATS.itemsize), _FLOATS).tolist()
+        leg_odds = np.frombuffer(file.read(total * _FLOATS.itemsize), _FLOATS).tolist()
+        runner_ids = np.frombuffer(file.read(total * _IDS.itemsize), _IDS).tolist()
+        position = 0
+        for count, stake, multiple in zip(legs, stakes, odds):
+            yield {
+                "bets": [{
+                    "multiplierBetLegs": [{"odds": leg_odds[leg], "runnerId": runner_ids[leg], "oddsType": "DECIMAL"}
+                                          for leg in range(position, position + count)],
+                    "stake": stake, "submittedType": "MULTIPLIER", "odds": multiple, "oddsType": "DECIMAL"
+                }],
+                "platform": platform
+            }
+            position += count
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Synthetic MULTIPLIER bet payload generator')
+    parser.add_argument('count', type=int)
+    parser.add_argument('--out', help='output file, stdout by default')
+    parser.add_argument('--format', choices=FORMATS, default='ndjson')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--processes', type=int, default=1)
+    parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE)
+    parser.add_argument('--legs', type=int, nargs=2, default=(2, 8), metavar=('MIN', 'MAX'))
+    parser.add_argument('--odds', nargs=3, default=('lognormal', '0.0', '0.6'), metavar=('DIST', 'A', 'B'),
+                        help="'uniform LOW HIGH' or 'lognormal MU SIGMA' (of odds - 1)")
+    parser.add_argument('--runners', type=int, default=100000, help='size of the runnerId pool')
+    parser.add_argument('--stakes', type=float, nargs='+', default=(5, 10, 20, 50, 100, 150, 200))
+    parser.add_argument('--adjustments', type=float, nargs='+', default=(0, 10, 25, 50))
+    args = parser.parse_args()
+    bet_options = BetOptions(tuple(args.legs), (args.odds[0], float(args.odds[1]), float(args.odds[2])),
+                             args.runners, stakes=args.stakes, adjustments=args.adjustments)
+    if args.out:
+        with open(args.out, 'wb') as output:
+            size = write_bets(output, args.count, bet_options, args.format, args.seed, args.processes,
+                              args.chunk_size)
+        print(f'Wrote {args.count:,} bets ({size:,} bytes) to {args.out}', file=sys.stderr)
+    else:
+        write_bets(sys.stdout.buffer, args.count, bet_options, args.format, args.seed, args.processes,
+                   args.chunk_size)
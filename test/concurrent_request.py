@@ -1,19 +1,318 @@
+"""
+Open-model load generator.
+
+Requests are sent at intended times given by an arrival schedule (constant
+rate, linear ramp or Poisson), independently of how fast responses come back.
+A dispatcher thread releases each request at its intended time to a pool of
+worker threads, each holding its own keep-alive requests.Session.
+
+Latency is measured from the intended send time, not from when a worker got
+round to sending it, so time spent queued behind a slow server is counted
+(coordinated omission correction). The time from the actual send is reported
+separately as service time. Both are recorded into per-endpoint HDR
+histograms (see latency.py) and reported as JSON, optionally with a
+JMeter-compatible CSV sample log.
+
+    python concurrent_request.py http://127.0.0.1:5000/cashier/neteller/deposit --rate 500 --duration 30 \
+        --arrival poisson --concurrency 64 --payload '{"amount": 10, "email": "a@b.c"}' \
+        --json-out run.json --csv-out run.csv
+"""
+import argparse, json, math, queue, random, threading, time
+from urllib.parse import urlsplit
+
 import requests
-from concurrent.futures import ThreadPoolExecutor
+from requests.adapters import HTTPAdapter
+
+from latency import JMeterCsvWriter, LatencyRecorder
+
+ARRIVALS = ('constant', 'ramp', 'poisson')
+CSV_FLUSH_EVERY = 1000
+
+
+def constant_arrivals(rate, duration):
+    """
+    Intended send times (seconds from start) for `rate` requests per second.
+    """
+    for index in range(int(rate * duration)):
+        yield index / rate
+
+
+def ramp_arrivals(start_rate, end_rate, duration):
+    """
+    Intended send times for a rate rising (or falling) linearly from `start_rate` to `end_rate`.
+    """
+    slope = (end_rate - start_rate) / duration
+    total = int((start_rate + end_rate) / 2 * duration)
+    for index in range(total):
+        # Solve start_rate * t + slope * t^2 / 2 = index for t
+        if slope == 0:
+            yield index / start_rate
+        else:
+            yield (-start_rate + math.sqrt(start_rate ** 2 + 2 * slope * index)) / slope
+
+
+def poisson_arrivals(rate, duration, seed=None):
+    """
+    Intended send times of a Poisson process averaging `rate` requests per second.
+    """
+    rng = random.Random(seed)
+    offset = rng.expovariate(rate)
+    while offset < duration:
+        yield offset
+        offset += rng.expovariate(rate)
+
+
+def arrivals(kind, rate, duration, end_rate=None, seed=None):
+    if kind == 'constant':
+        return constant_arrivals(rate, duration)
+    if kind == 'ramp':
+        return ramp_arrivals(rate, end_rate if end_rate is not None else rate, duration)
+    if kind == 'poisson':
+        return poisson_arrivals(rate, duration, seed)
+    raise ValueError(f"Unknown arrival '{kind}', expected one of {ARRIVALS}")
+
+
+def static_payload(payload):
+    """
+    Payload factory returning the same JSON body for every request.
+    """
+    return lambda index: payload
+
+
+class WorkerContext:
+    """
+    Per worker thread state: keep-alive session, results slot and pending CSV samples.
+    """
+    def __init__(self, engine, session, slot, start, csv_writer):
+        self.engine = engine
+        self.session = session
+        self.slot = slot
+        self.start = start
+        self.csv_writer = csv_writer
+        self.samples = []
+        self.thread_name = threading.current_thread().name
+
+    def request(self, label, method, url, intended, **kwargs):
+        """
+        Send one request and record it under `label`, with latency measured from `intended`.
+        Returns (response or None on a connection error, success).
+        """
+        sent_at = time.time()
+        started = time.perf_counter()
+        response = None
+        size = sent = 0
+        try:
+            response = self.session.request(method, url, timeout=self.engine.timeout, **kwargs)
+            code, message, success = response.status_code, response.reason, response.status_code < 400
+            size = len(response.content)
+            sent = len(response.request.body or b'')
+            first_byte = response.elapsed.total_seconds()
+        except requests.RequestException as err:
+            code, message, success = type(err).__name__, str(err), False
+            first_byte = 0.0
+        finished = time.perf_counter()
+        self.record(label, intended, started, finished, success, size)
+        if self.csv_writer:
+            concurrency = self.engine.concurrency
+            self.samples.append({
+                "timeStamp": int(sent_at * 1000), "elapsed": int((finished - started) * 1000),
+                "label": label, "responseCode": code, "responseMessage": message,
+                "threadName": self.thread_name, "dataType": "text", "success": str(success).lower(),
+                "failureMessage": "" if success else message, "bytes": size, "sentBytes": sent,
+                "grpThreads": concurrency, "allThreads": concurrency, "URL": url,
+                "Latency": int(first_byte * 1000), "IdleTime": 0, "Connect": 0})
+            if len(self.samples) >= CSV_FLUSH_EVERY:
+                self.csv_writer.write_samples(self.samples)
+                self.samples = []
+        return response, success
+
+    def record(self, label, intended, started, finished, success, size=0):
+        with self.slot[0]:
+            self.slot[1].record(label, intended - self.start, finished - intended, finished - started, success,
+                                size)
+
+    def close(self):
+        if self.samples:
+            self.csv_writer.write_samples(self.samples)
+        self.session.close()
+
+
+class LoadEngine:
+    """
+    Sends requests to `url` at the times of an arrival schedule with `concurrency` worker threads.
+
+    Args:
+        payload_factory: callable(request index) returning the JSON body, None for no body.
+        timeout: per-request timeout in seconds.
+        label: name the requests are reported under, 'METHOD /path' by default.
+        bucket_seconds: width of the report's time buckets.
+    """
+    def __init__(self, url, method='POST', concurrency=64, headers=None, payload_factory=None, timeout=30,
+                 label=None, bucket_seconds=1):
+        self.url = url
+        self.method = method.upper()
+        self.concurrency = concurrency
+        self.headers = headers or {}
+        self.payload_factory = payload_factory or (lambda index: None)
+        self.timeout = timeout
+        self.label = label or f'{self.method} {urlsplit(url).path or "/"}'
+        self.bucket_seconds = bucket_seconds
+        # One [lock, recorder] per worker thread; the lock is only contended by take_results
+        self._slots = []
+
+    def _session(self):
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=1)
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+        session.headers.update(self.headers)
+        return session
+
+    def perform(self, worker, index, intended):
+        """
+        Execute job `index`, due at perf_counter time `intended`, on `worker` (a WorkerContext).
+        Subclasses override this to run something other than one request per job.
+        """
+        worker.request(self.label, self.method, self.url, intended, json=self.payload_factory(index))
+
+    def _work(self, jobs, slot, start, csv_writer):
+        worker = WorkerContext(self, self._session(), slot, start, csv_writer)
+        while True:
+            job = jobs.get()
+            if job is None:
+                break
+            self.perform(worker, *job)
+        worker.close()
+
+    def run(self, schedule, csv_path=None):
+        """
+        Send one request per intended send time in `schedule` (seconds from start).
+        Blocks until every request has completed and returns the LatencyRecorder
+        of the run (less anything already taken with take_results) and its duration in seconds.
+
+        Args:
+            csv_path: JMeter-compatible CSV sample log to write, None for none.
+        """
+        jobs = queue.SimpleQueue()
+        csv_writer = JMeterCsvWriter(csv_path) if csv_path else None
+        self._slots = [[threading.Lock(), LatencyRecorder(self.bucket_seconds)] for _ in range(self.concurrency)]
+        start = time.perf_counter()
+        workers = [threading.Thread(target=self._work, args=(jobs, slot, start, csv_writer),
+                                    name=f'{self.label} 1-{number}', daemon=True)
+                   for number, slot in enumerate(self._slots, 1)]
+        for worker in workers:
+            worker.start()
+        for index, offset in enumerate(schedule):
+            intended = start + offset
+            delay = intended - time.perf_counter()
+            # Releasing a little early is cheaper than a sleep per request at high rates
+            if delay > 0.001:
+                time.sleep(delay)
+            jobs.put((index, intended))
+        for _ in workers:
+            jobs.put(None)
+        for worker in workers:
+            worker.join()
+        elapsed = time.perf_counter() - start
+        if csv_writer:
+            csv_writer.close()
+        return self.take_results(), elapsed
+
+    def take_results(self):
+        """
+        Merged results recorded since the previous call (or the start of the run).
+        Safe to call while the run is in progress, e.g. to stream deltas.
+        """
+        results = LatencyRecorder(self.bucket_seconds)
+        for slot in self._slots:
+            with slot[0]:
+                recorder, slot[1] = slot[1], LatencyRecorder(self.bucket_seconds)
+            results.merge(recorder)
+        return results
+
+
+def positive_float(value):
+    """
+    argparse type for rates and durations, which the arrival schedules divide by.
+    """
+    number = float(value)
+    if not number > 0:
+        raise argparse.ArgumentTypeError(f"must be greater than 0, got {value}")
+    return number
+
+
+def non_negative_float(value):
+    number = float(value)
+    if not number >= 0:
+        raise argparse.ArgumentTypeError(f"must not be negative, got {value}")
+    return number
+
+
+def add_arrival_arguments(parser):
+    """
+    Arguments describing the arrival schedule, concurrency and outputs of a run,
+    shared with load_workers.py and scenarios.py.
+    """
+    parser.add_argument('--arrival', choices=ARRIVALS, default='constant')
+    parser.add_argument('--rate', type=positive_float, default=100, help='requests per second (start rate of a ramp)')
+    parser.add_argument('--ramp-to', type=non_negative_float, help='end rate of a ramp')
+    parser.add_argument('--duration', type=positive_float, default=10, help='seconds')
+    parser.add_argument('--concurrency', type=int, default=64, help='worker threads / connections')
+    parser.add_argument('--seed', type=int, help='random seed of the Poisson arrivals')
+    parser.add_argument('--json-out', help='write the JSON summary to this file')
+    parser.add_argument('--csv-out', help='write a JMeter-compatible CSV sample log to this file')
+
+
+def add_run_arguments(parser):
+    """
+    Arguments describing a single-endpoint load run, shared with load_workers.py.
+    """
+    parser.add_argument('url')
+    parser.add_argument('--method', default='POST')
+    parser.add_argument('--payload', help='JSON body, or @file containing it')
+    parser.add_argument('--header', action='append', default=[], help='Name: value (repeatable)')
+    parser.add_argument('--label', help="name the requests are reported under, default 'METHOD /path'")
+    add_arrival_arguments(parser)
+
+
+def run_config(args):
+    """
+    JSON-serialisable description of the run given on the command line.
+    """
+    payload = None
+    if args.payload:
+        if args.payload.startswith('@'):
+            with open(args.payload[1:]) as file:
+                payload = json.load(file)
+        else:
+            payload = json.loads(args.payload)
+    headers = dict(header.split(':', 1) for header in args.header)
+    return {"url": args.url, "method": args.method, "arrival": args.arrival, "rate": args.rate,
+            "ramp_to": args.ramp_to, "duration": args.duration, "concurrency": args.concurrency,
+            "payload": payload, "headers": {name.strip(): value.strip() for name, value in headers.items()},
+            "seed": args.seed, "label": args.label}
+
 
-def send_request(data, url, headers=None):
-    return requests.post(url, json=data, headers=headers)
+def engine_from_config(config):
+    return LoadEngine(config["url"], config["method"], config["concurrency"], config["headers"],
+                      static_payload(config["payload"]), label=config["label"])
 
-url = "https://example.com/api"
-payload = {"foo": "bar"}
 
-with ThreadPoolExecutor(max_workers=2) as executor:
-    futures = [
-        executor.submit(send_request, payload, url),
-        executor.submit(send_request, payload, url)
-    ]
+def write_summary(recorder, elapsed, json_out=None):
+    summary = recorder.summary(elapsed)
+    if json_out:
+        with open(json_out, 'w') as file:
+            json.dump(summary, file, indent=2)
+    # One label: its totals. Several (scenario steps): per label, as totals would mix steps and journeys
+    print(json.dumps(summary["total"] if len(summary["labels"]) == 1 else summary["labels"], indent=2))
 
-responses = [f.result() for f in futures]
 
-for i, r in enumerate(responses):
-    print(f"Response {i+1}: {r.status_code} - {r.text}")
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Open-model HTTP load generator')
+    add_run_arguments(parser)
+    args = parser.parse_args()
+    config = run_config(args)
+    engine = engine_from_config(config)
+    recorder, elapsed = engine.run(arrivals(args.arrival, args.rate, args.duration, args.ramp_to, args.seed),
+                                   args.csv_out)
+    write_summary(recorder, elapsed, args.json_out)
@@ -0,0 +1,252 @@
+"""
+Latency recording for the load generator.
+
+Timings go into HDR-style log-linear histograms over microseconds (128
+sub-buckets per power of two, under 1% relative error), kept per endpoint
+label and per time bucket of the run. Histograms merge by adding bucket
+counts, so each worker thread records into its own LatencyRecorder without
+locks and the recorders are merged for reporting.
+
+The bucket layout is the one of mock-server/metrics.py, at a finer
+resolution. It is kept as a copy rather than imported: this directory is
+copied on its own to the hosts running load_workers.py, and the two script
+directories do not import from each other. test_latency.py checks both
+copies against the same bucket invariants.
+
+Reports are a JSON summary (p50/p95/p99/max, throughput, error rate per label
+and per time bucket) and, optionally, a JMeter-compatible CSV sample log with
+the same columns as reporting/audit_results.csv.
+"""
+import csv, threading
+
+SUB_BUCKET_BITS = 7
+SUB_BUCKETS = 1 << SUB_BUCKET_BITS
+# Enough buckets for values up to 2^40 us (~12 days)
+BUCKET_COUNT = (40 - SUB_BUCKET_BITS + 1) * SUB_BUCKETS
+PERCENTILES = {'p50': 0.5, 'p95': 0.95, 'p99': 0.99}
+JMETER_FIELDS = ['timeStamp', 'elapsed', 'label', 'responseCode', 'responseMessage', 'threadName', 'dataType',
+                 'success', 'failureMessage', 'bytes', 'sentBytes', 'grpThreads', 'allThreads', 'URL', 'Latency',
+                 'IdleTime', 'Connect']
+
+
+def bucket_index(value):
+    """
+    Histogram bucket for a non-negative integer `value` (microseconds).
+    """
+    if value < SUB_BUCKETS:
+        return value
+    shift = value.bit_length() - SUB_BUCKET_BITS - 1
+    index = (shift + 1) * SUB_BUCKETS + (value >> shift) - SUB_BUCKETS
+    return min(index, BUCKET_COUNT - 1)
+
+
+def bucket_bounds(index):
+    """
+    Inclusive (lowest, highest) value recorded into bucket `index`.
+    """
+    if index < SUB_BUCKETS:
+        return index, index
+    shift = index // SUB_BUCKETS - 1
+    top = index % SUB_BUCKETS + SUB_BUCKETS
+    return top << shift, ((top + 1) << shift) - 1
+
+
+class LatencyHistogram:
+    """
+    Mergeable log-linear histogram of latencies in microseconds.
+    """
+    __slots__ = ('counts', 'count', 'total', 'max')
+
+    def __init__(self):
+        self.counts = {}
+        self.count = 0
+        self.total = 0
+        self.max = 0
+
+    def record(self, value):
+        value = int(value)
+        index = bucket_index(value)
+        self.counts[index] = self.counts.get(index, 0) + 1
+        self.count += 1
+        self.total += value
+        if value > self.max:
+            self.max = value
+
+    def merge(self, other):
+        counts = self.counts
+        for index, count in other.counts.items():
+            counts[index] = counts.get(index, 0) + count
+        self.count += other.count
+        self.total += other.total
+        self.max = max(self.max, other.max)
+
+    def value_at(self, fraction):
+        """
+        Value at quantile `fraction` (0..1), to the histogram's precision.
+        """
+        if not self.count:
+            return 0
+        rank = max(1, round(fraction * self.count))
+        seen = 0
+        for index in sorted(self.counts):
+            seen += self.counts[index]
+            if seen >= rank:
+                return min(bucket_bounds(index)[1], self.max)
+        return self.max
+
+    def as_dict(self):
+        """
+        Compact, JSON-serialisable form (only non-empty buckets).
+        """
+        return {"counts": self.counts, "count": self.count, "total": self.total, "max": self.max}
+
+    @classmethod
+    def from_dict(cls, data):
+        histogram = cls()
+        histogram.counts = {int(index): count for index, count in data["counts"].items()}
+        histogram.count = data["count"]
+        histogram.total = data["total"]
+        histogram.max = data["max"]
+        return histogram
+
+
+class _LabelStats:
+    __slots__ = ('latency', 'service_time', 'errors', 'bytes')
+
+    def __init__(self):
+        self.latency = LatencyHistogram()
+        self.service_time = LatencyHistogram()
+        self.errors = 0
+        self.bytes = 0
+
+    def merge(self, other):
+        self.latency.merge(other.latency)
+        self.service_time.merge(other.service_time)
+        self.errors += other.errors
+        self.bytes += other.bytes
+
+    def as_dict(self):
+        return {"latency": self.latency.as_dict(), "service_time": self.service_time.as_dict(),
+                "errors": self.errors, "bytes": self.bytes}
+
+    @classmethod
+    def from_dict(cls, data):
+        stats = cls()
+        stats.latency = LatencyHistogram.from_dict(data["latency"])
+        stats.service_time = LatencyHistogram.from_dict(data["service_time"])
+        stats.errors = data["errors"]
+        stats.bytes = data["bytes"]
+        return stats
+
+
+def _stats_json(stats, elapsed):
+    latency = stats.latency
+    summary = {
+        "requests": latency.count,
+        "errors": stats.errors,
+        "error_rate": stats.errors / latency.count if latency.count else 0.0,
+        "throughput": latency.count / elapsed if elapsed else 0.0,
+        "bytes": stats.bytes,
+    }
+    for name, histogram in (("latency_ms", latency), ("service_time_ms", stats.service_time)):
+        summary[name] = {key: histogram.value_at(fraction) / 1000 for key, fraction in PERCENTILES.items()}
+        summary[name]["max"] = histogram.max / 1000
+        summary[name]["mean"] = histogram.total / histogram.count / 1000 if histogram.count else 0.0
+    return summary
+
+
+class LatencyRecorder:
+    """
+    Latency and service time histograms, error and byte counts per label,
+    overall and per `bucket_seconds` of run time. Not thread-safe: use one per thread and merge.
+    """
+    def __init__(self, bucket_seconds=1):
+        self.bucket_seconds = bucket_seconds
+        self.labels = {}
+        self.buckets = {}
+
+    def _stats(self, table, key):
+        stats = table.get(key)
+        if stats is None:
+            stats = table[key] = _LabelStats()
+        return stats
+
+    def record(self, label, offset, latency, service_time, success, size=0):
+        """
+        Args:
+            offset: seconds from the start of the run the request was due at.
+            latency: seconds from the intended send time to the response.
+            service_time: seconds from the actual send to the response.
+        """
+        for stats in (self._stats(self.labels, label),
+                      self._stats(self.buckets, (int(offset // self.bucket_seconds), label))):
+            stats.latency.record(latency * 1e6)
+            stats.service_time.record(service_time * 1e6)
+            stats.bytes += size
+            if not success:
+                stats.errors += 1
+
+    def merge(self, other):
+        for table, other_table in ((self.labels, other.labels), (self.buckets, other.buckets)):
+            for key, stats in other_table.items():
+                self._stats(table, key).merge(stats)
+
+    def __bool__(self):
+        return bool(self.labels)
+
+    def as_dict(self):
+        """
+        Compact, JSON-serialisable form, e.g. to send a worker's results to a coordinator.
+        """
+        return {"bucket_seconds": self.bucket_seconds,
+                "labels": [[label, stats.as_dict()] for label, stats in self.labels.items()],
+                "buckets": [[bucket, label, stats.as_dict()] for (bucket, label), stats in self.buckets.items()]}
+
+    @classmethod
+    def from_dict(cls, data):
+        recorder = cls(data["bucket_seconds"])
+        recorder.labels = {label: _LabelStats.from_dict(stats) for label, stats in data["labels"]}
+        recorder.buckets = {(bucket, label): _LabelStats.from_dict(stats) for bucket, label, stats in data["buckets"]}
+        return recorder
+
+    def summary(self, elapsed):
+        """
+        JSON-serialisable report: totals, per label and per time bucket.
+        """
+        total = _LabelStats()
+        for stats in self.labels.values():
+            total.merge(stats)
+        timeline = {}
+        for (bucket, label), stats in sorted(self.buckets.items()):
+            timeline.setdefault(bucket, {"start": bucket * self.bucket_seconds, "labels": {}})
+            timeline[bucket]["labels"][label] = _stats_json(stats, self.bucket_seconds)
+        return {
+            "elapsed": elapsed,
+            "total": _stats_json(total, elapsed),
+            "labels": {label: _stats_json(stats, elapsed) for label, stats in sorted(self.labels.items())},
+            "timeline": list(timeline.values()),
+        }
+
+
+class JMeterCsvWriter:
+    """
+    Thread-safe writer of JMeter-compatible CSV sample logs, one row per request.
+    """
+    def __init__(self, path):
+        self._file = open(path, 'w', newline='')
+        self._writer = csv.writer(self._file)
+        self._lock = threading.Lock()
+        self._writer.writerow(JMETER_FIELDS)
+
+    def write_samples(self, samples):
+        """
+        Args:
+            samples: iterable of dicts keyed by JMETER_FIELDS names (missing columns are left empty).
+        """
+        rows = [[sample.get(field, '') for field in JMETER_FIELDS] for sample in samples]
+        with self._lock:
+            self._writer.writerows(rows)
+
+    def close(self):
+        with self._lock:
+            self._file.close()
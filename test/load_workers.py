@@ -0,0 +1,224 @@
+"""
+Multi-process load generation with a TCP coordinator.
+
+One Python process saturates a core long before the services under test do,
+so the run is split over worker processes: local ones (one per core by
+default) and, optionally, workers on other hosts that join the coordinator
+over TCP. Each worker runs concurrent_request.LoadEngine at its share of the
+arrival rate and streams the histogram deltas recorded since its last report
+back to the coordinator, which merges them and prints live throughput and
+latency.
+
+Protocol: newline-delimited JSON over one TCP connection per worker.
+    worker -> {"type": "hello"}
+    coordinator -> {"type": "config", "config": {...}, "index": i, "count": n}
+    coordinator -> {"type": "start"}   (once every expected worker has joined)
+    worker -> {"type": "delta", "results": LatencyRecorder.as_dict()}  (every interval)
+    worker -> {"type": "done", "results": ..., "elapsed": seconds}
+    worker -> {"type": "error", "error": message}   (instead of "done" if the run failed)
+
+The coordinator aborts if the expected workers have not all joined within
+--join-timeout seconds.
+
+    # 8 local processes
+    python load_workers.py http://127.0.0.1:5000/cashier/neteller/deposit --rate 20000 --duration 60 --processes 8
+    # 4 local processes plus 2 workers on other hosts
+    python load_workers.py http://staging/cashier/neteller/deposit --rate 40000 --processes 4 --listen 0.0.0.0:7000 --remote 2
+    python load_workers.py --join coordinator-host:7000
+"""
+import argparse, json, multiprocessing, os, socket, socketserver, sys, threading, time
+
+from concurrent_request import add_run_arguments, arrivals, engine_from_config, run_config, write_summary
+from latency import LatencyRecorder
+
+REPORT_INTERVAL = 1.0
+JOIN_TIMEOUT = 60.0
+
+
+def _send(file, message):
+    file.write(json.dumps(message, separators=(',', ':')).encode() + b'\n')
+    file.flush()
+
+
+def _receive(file):
+    line = file.readline()
+    if not line:
+        raise ConnectionError('Connection closed')
+    return json.loads(line)
+
+
+def worker_schedule(config, index, count):
+    """
+    Arrival times of worker `index` of `count`: 1/count of the rate, phase-shifted so
+    that the workers' constant or ramp schedules interleave. Poisson streams are independent.
+    """
+    rate = config["rate"] / count
+    ramp_to = config["ramp_to"] / count if config["ramp_to"] is not None else None
+    seed = config["seed"] + index if config["seed"] is not None else None
+    schedule = arrivals(config["arrival"], rate, config["duration"], ramp_to, seed)
+    if config["arrival"] == 'poisson':
+        return schedule
+    phase = index / config["rate"]
+    return (offset + phase for offset in schedule)
+
+
+def run_worker(address, report_interval=REPORT_INTERVAL):
+    """
+    Join the coordinator at (host, port), run the configured share of the load and report back.
+    """
+    with socket.create_connection(address) as connection:
+        file = connection.makefile('rwb')
+        _send(file, {"type": "hello", "host": socket.gethostname(), "pid": os.getpid()})
+        message = _receive(file)
+        config, index, count = message["config"], message["index"], message["count"]
+        engine = engine_from_config(config)
+        csv_path = None
+        if config.get("csv_out"):
+            # One sample log per worker: run.csv -> run-0.csv, run-1.csv...
+            base, extension = os.path.splitext(config["csv_out"])
+            csv_path = f'{base}-{index}{extension}'
+        _receive(file)
+        outcome = {}
+
+        def run():
+            try:
+                outcome.update(zip(('results', 'elapsed'), engine.run(worker_schedule(config, index, count), csv_path)))
+            except Exception as err:
+                outcome["error"] = f'{type(err).__name__}: {err}'
+        runner = threading.Thread(target=run)
+        runner.start()
+        while runner.is_alive():
+            runner.join(report_interval)
+            if runner.is_alive():
+                _send(file, {"type": "delta", "results": engine.take_results().as_dict()})
+        if "error" in outcome:
+            _send(file, {"type": "error", "error": outcome["error"]})
+        else:
+            _send(file, {"type": "done", "results": outcome["results"].as_dict(), "elapsed": outcome["elapsed"]})
+
+
+class Coordinator(socketserver.ThreadingTCPServer):
+    """
+    Hands out the run config to `expected` workers, starts them together and merges their results.
+    """
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, address, config, expected):
+        super().__init__(address, _WorkerHandler)
+        self.config = config
+        self.expected = expected
+        self.lock = threading.Condition()
+        self.joined = 0
+        self.finished = 0
+        self.started = threading.Event()
+        self.total = LatencyRecorder()
+        self.interval = LatencyRecorder()
+        self.elapsed = 0.0
+
+    def add_results(self, data):
+        results = LatencyRecorder.from_dict(data)
+        with self.lock:
+            self.total.merge(results)
+            self.interval.merge(results)
+
+    def take_interval(self):
+        with self.lock:
+            interval, self.interval = self.interval, LatencyRecorder()
+        return interval
+
+    def wait(self, join_timeout=JOIN_TIMEOUT):
+        """
+        Start the run once every worker has joined, print live stats until all are done.
+        Raises TimeoutError if they have not all joined within `join_timeout` seconds.
+        """
+        with self.lock:
+            if not self.lock.wait_for(lambda: self.joined >= self.expected, timeout=join_timeout):
+                raise TimeoutError(f'Only {self.joined} of {self.expected} workers joined within {join_timeout}s')
+        print(f'{self.expected} workers joined, starting.')
+        started = time.monotonic()
+        self.started.set()
+        while True:
+            with self.lock:
+                done = self.lock.wait_for(lambda: self.finished >= self.expected, timeout=REPORT_INTERVAL)
+            total = self.take_interval().summary(REPORT_INTERVAL)["total"]
+            print(f'{time.monotonic() - started:6.1f}s  {total["requests"] / REPORT_INTERVAL:9.0f} req/s  '
+                  f'p50 {total["latency_ms"]["p50"]:8.1f} ms  p99 {total["latency_ms"]["p99"]:8.1f} ms  '
+                  f'errors {total["errors"]}')
+            if done:
+                return
+
+
+class _WorkerHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        coordinator = self.server
+        _receive(self.rfile)
+        with coordinator.lock:
+            if coordinator.joined >= coordinator.expected:
+                return
+            index = coordinator.joined
+            coordinator.joined += 1
+            coordinator.lock.notify_all()
+        _send(self.wfile, {"type": "config", "config": coordinator.config, "index": index,
+                           "count": coordinator.expected})
+        coordinator.started.wait()
+        _send(self.wfile, {"type": "start"})
+        elapsed = 0.0
+        try:
+            while True:
+                message = _receive(self.rfile)
+                if message["type"] == 'error':
+                    print(f'Worker {index} failed: {message["error"]}')
+                    break
+                coordinator.add_results(message["results"])
+                if message["type"] == 'done':
+                    elapsed = message["elapsed"]
+                    break
+        except (ConnectionError, ValueError) as err:
+            # A lost worker must not keep the run waiting; its reported deltas are kept
+            print(f'Worker {index} lost: {err}')
+        with coordinator.lock:
+            coordinator.elapsed = max(coordinator.elapsed, elapsed)
+            coordinator.finished += 1
+            coordinator.lock.notify_all()
+
+
+def parse_address(value):
+    host, port = value.rsplit(':', 1)
+    return host, int(port)
+
+
+if __name__ == '__main__':
+    if len(sys.argv) == 3 and sys.argv[1] == '--join':
+        run_worker(parse_address(sys.argv[2]))
+        raise SystemExit(0)
+    parser = argparse.ArgumentParser(description='Multi-process open-model HTTP load generator. '
+                                                 'Remote workers: load_workers.py --join HOST:PORT')
+    add_run_arguments(parser)
+    parser.add_argument('--processes', type=int, default=os.cpu_count(), help='local worker processes')
+    parser.add_argument('--listen', default='127.0.0.1:0', help='coordinator address for remote workers')
+    parser.add_argument('--remote', type=int, default=0, help='number of remote workers to wait for')
+    parser.add_argument('--join-timeout', type=float, default=JOIN_TIMEOUT,
+                        help='seconds to wait for every worker to join before aborting')
+    args = parser.parse_args()
+    config = run_config(args)
+    config["csv_out"] = args.csv_out
+    coordinator = Coordinator(parse_address(args.listen), config, args.processes + args.remote)
+    threading.Thread(target=coordinator.serve_forever, daemon=True).start()
+    print(f'Coordinator listening on {coordinator.server_address[0]}:{coordinator.server_address[1]}')
+    processes = [multiprocessing.Process(target=run_worker, args=(coordinator.server_address,))
+                 for _ in range(args.processes)]
+    for process in processes:
+        process.start()
+    try:
+        coordinator.wait(args.join_timeout)
+    except TimeoutError as err:
+        print(f'{err}, aborting.')
+        for process in processes:
+            process.terminate()
+        coordinator.shutdown()
+        raise SystemExit(1)
+    for process in processes:
+        process.join()
+    coordinator.shutdown()
+    write_summary(coordinator.total, coordinator.elapsed, args.json_out)
@@ -0,0 +1,185 @@
+"""
+Exact-combinatorics lottery engine (EuroMillions-style: 5 of 50 + 2 of 12 by default).
+
+Every ticket maps to a dense index in [0, total) and back, using the
+combinatorial number system: a sorted k-combination c_1 < ... < c_k of
+0-based numbers has rank C(c_1, 1) + C(c_2, 2) + ... + C(c_k, k). A ticket's
+index is main rank * C(lucky pool, lucky picks) + lucky rank. Ranking and
+unranking are vectorised with NumPy (unranking is one searchsorted per pick
+over a table of binomials).
+
+Unique tickets are generated by pushing 0, 1, 2... through a seeded
+pseudo-random permutation of the index space (a Feistel network with cycle
+walking), so they are distinct by construction, with no rejection loop and
+no set of already drawn tickets.
+
+Prize tier probabilities are exact fractions (hypergeometric).
+
+    python lottery.py 10000000 --seed 42 --out tickets.csv
+"""
+import argparse, math, sys
+from fractions import Fraction
+
+import numpy as np
+
+# (main matched, lucky matched), best first
+EUROMILLIONS_TIERS = ((5, 2), (5, 1), (5, 0), (4, 2), (4, 1), (3, 2), (4, 0), (2, 2), (3, 1), (3, 0), (1, 2),
+                      (2, 1), (2, 0))
+FEISTEL_ROUNDS = 6
+CHUNK_SIZE = 1000000
+
+
+class _Combinations:
+    """
+    Ranking/unranking of k-combinations of range(n) in colex order.
+    """
+    def __init__(self, n, k):
+        self.n = n
+        self.k = k
+        self.total = math.comb(n, k)
+        # table[i][c] = C(c, i + 1), increasing in c
+        self.table = np.array([[math.comb(c, i + 1) for c in range(n)] for i in range(k)], dtype=np.int64)
+
+    def rank(self, numbers):
+        """
+        Ranks of sorted 0-based combinations, shape (..., k).
+        """
+        ranks = np.zeros(numbers.shape[:-1], dtype=np.int64)
+        for i in range(self.k):
+            ranks += self.table[i][numbers[..., i]]
+        return ranks
+
+    def unrank(self, ranks):
+        """
+        Sorted 0-based combinations (..., k) of `ranks`.
+        """
+        ranks = np.array(ranks, dtype=np.int64)
+        numbers = np.empty(ranks.shape + (self.k,), dtype=np.int64)
+        for i in range(self.k - 1, -1, -1):
+            # Largest c with C(c, i + 1) <= rank
+            number = np.searchsorted(self.table[i], ranks, side='right') - 1
+            numbers[..., i] = number
+            ranks = ranks - self.table[i][number]
+        return numbers
+
+
+class Lottery:
+    """
+    Ticket indexing, unique ticket generation and prize probabilities for a
+    `main_picks` of `main_pool` + `lucky_picks` of `lucky_pool` lottery. Numbers are 1-based.
+    """
+    def __init__(self, main_pool=50, main_picks=5, lucky_pool=12, lucky_picks=2):
+        self.main = _Combinations(main_pool, main_picks)
+        self.lucky = _Combinations(lucky_pool, lucky_picks)
+        self.total = self.main.total * self.lucky.total
+
+    def rank(self, main_numbers, lucky_numbers):
+        """
+        Index of one ticket, numbers in any order.
+        """
+        return int(self.rank_many([main_numbers], [lucky_numbers])[0])
+
+    def unrank(self, index):
+        """
+        (main numbers, lucky numbers) of ticket `index`, sorted.
+        """
+        main, lucky = self.unrank_many([index])
+        return main[0].tolist(), lucky[0].tolist()
+
+    def rank_many(self, main_numbers, lucky_numbers):
+        """
+        Indexes of tickets given as arrays (tickets x main_picks), (tickets x lucky_picks).
+        """
+        main = np.sort(np.asarray(main_numbers, dtype=np.int64), axis=-1) - 1
+        lucky = np.sort(np.asarray(lucky_numbers, dtype=np.int64), axis=-1) - 1
+        return self.main.rank(main) * self.lucky.total + self.lucky.rank(lucky)
+
+    def unrank_many(self, indexes):
+        """
+        (main numbers, lucky numbers) arrays of tickets `indexes`, sorted per ticket.
+        """
+        indexes = np.asarray(indexes, dtype=np.int64)
+        main_ranks, lucky_ranks = np.divmod(indexes, self.lucky.total)
+        return self.main.unrank(main_ranks) + 1, self.lucky.unrank(lucky_ranks) + 1
+
+    def unique_tickets(self, count, seed=0, chunk_size=CHUNK_SIZE):
+        """
+        Yield `count` distinct random tickets as (main, lucky) array chunks.
+        The same seed always yields the same tickets, in the same order.
+        """
+        if count > self.total:
+            raise ValueError(f'Only {self.total:,} distinct tickets exist, {count:,} requested')
+        permutation = IndexPermutation(self.total, seed)
+        for start in range(0, count, chunk_size):
+            positions = np.arange(start, min(start + chunk_size, count), dtype=np.uint64)
+            yield self.unrank_many(permutation(positions).astype(np.int64))
+
+    def tier_probability(self, main_matched, lucky_matched):
+        """
+        Exact probability that a ticket matches exactly `main_matched` main and `lucky_matched` lucky numbers.
+        """
+        def matched(combinations, hits):
+            return Fraction(math.comb(combinations.k, hits) * math.comb(combinations.n - combinations.k,
+                                                                        combinations.k - hits),
+                            combinations.total)
+        return matched(self.main, main_matched) * matched(self.lucky, lucky_matched)
+
+    def prize_probabilities(self, tiers=EUROMILLIONS_TIERS):
+        """
+        {(main matched, lucky matched): exact probability} of each prize tier.
+        """
+        return {tier: self.tier_probability(*tier) for tier in tiers}
+
+
+class IndexPermutation:
+    """
+    Seeded pseudo-random bijection of [0, size): a balanced Feistel network over
+    the smallest even number of bits covering `size`, with cycle walking for values >= size.
+    """
+    def __init__(self, size, seed=0):
+        self.size = size
+        self.half_bits = max(1, ((size - 1).bit_length() + 1) // 2)
+        self.mask = np.uint64((1 << self.half_bits) - 1)
+        rng = np.random.default_rng(seed)
+        self.keys = [np.uint64(key) for key in rng.integers(0, 1 << 62, FEISTEL_ROUNDS, dtype=np.int64)]
+
+    def _round(self, right, key):
+        mixed = (right ^ key) * np.uint64(0x9E3779B97F4A7C15)
+        mixed ^= mixed >> np.uint64(29)
+        mixed *= np.uint64(0xBF58476D1CE4E5B9)
+        return (mixed >> np.uint64(32)) & self.mask
+
+    def _encrypt(self, values):
+        shift = np.uint64(self.half_bits)
+        left, right = values >> shift, values & self.mask
+        for key in self.keys:
+            left, right = right, left ^ self._round(right, key)
+        return (left << shift) | right
+
+    def __call__(self, values):
+        values = self._encrypt(np.asarray(values, dtype=np.uint64))
+        size = np.uint64(self.size)
+        # Cycle walking: re-encrypt until inside [0, size), still a bijection of [0, size)
+        outside = values >= size
+        while outside.any():
+            values[outside] = self._encrypt(values[outside])
+            outside = values >= size
+        return values
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Unique lottery ticket generator (5 of 50 + 2 of 12)')
+    parser.add_argument('count', type=int, nargs='?', default=0)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--out', help='CSV file of tickets (main numbers, lucky numbers), stdout by default')
+    args = parser.parse_args()
+    lottery = Lottery()
+    print(f'Total number of combinations: {lottery.total:,}', file=sys.stderr)
+    for (main_matched, lucky_matched), probability in lottery.prize_probabilities().items():
+        print(f'  {main_matched}+{lucky_matched}: {probability} (1 in {float(1 / probability):,.1f})', file=sys.stderr)
+    if args.count:
+        output = open(args.out, 'w') if args.out else sys.stdout
+        for main, lucky in lottery.unique_tickets(args.count, args.seed):
+            np.savetxt(output, np.hstack((main, lucky)), fmt='%d', delimiter=',')
+        if args.out:
+            output.close()
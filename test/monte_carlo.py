@@ -0,0 +1,229 @@
+"""
+Monte-Carlo simulation of lottery and accumulator payouts.
+
+Samples are simulated in fixed-size chunks, vectorised with NumPy, across a
+process pool. Chunk i uses its own RNG stream spawned from the run's seed
+(numpy SeedSequence), so results depend on the seed and chunk size only, not
+on the number of processes. By default chunks are sized so that one chunk's
+arrays fit in CHUNK_MEMORY per worker process (see chunk_size_for). Each chunk
+returns count, sum and sum of squares of the return per unit staked plus a
+log-binned histogram of returns; the chunks are merged into expected return,
+variance and tail percentiles with 95% confidence intervals.
+
+- lottery: one ticket per draw. Matches of a ticket against a random draw are
+  hypergeometric, so they are sampled directly (numpy hypergeometric) rather
+  than by drawing and comparing numbers. The exact expected return from
+  lottery.Lottery's prize tier probabilities is reported alongside.
+- accumulator: bets from bet_generator; each leg wins with probability
+  (1 - margin) / odds, the bet pays stake x multiple odds if every leg wins.
+
+    python monte_carlo.py lottery --samples 1000000000 --processes 16
+    python monte_carlo.py accumulator --samples 100000000 --margin 0.05
+"""
+import argparse, json, math, multiprocessing, os, time
+
+import numpy as np
+
+from bet_generator import BetOptions, generate_chunk
+from lottery import EUROMILLIONS_TIERS, Lottery
+
+# Peak memory of one chunk in a worker; with the defaults about 8M draws or 800k accumulators
+CHUNK_MEMORY = 256 * 1024 * 1024
+# Measured peak bytes per simulated draw, and per accumulator leg (bets are drawn and settled leg by leg)
+BYTES_PER_DRAW = 32
+BYTES_PER_LEG = 64
+# Relative width of a histogram bin, bounds the percentile error
+BIN_PRECISION = 0.001
+PERCENTILES = {'p50': 0.5, 'p90': 0.9, 'p99': 0.99, 'p99.9': 0.999, 'p99.99': 0.9999}
+Z_95 = 1.959963984540054
+TICKET_PRICE = 2.5
+# Illustrative prize per tier (main matched, lucky matched)
+DEFAULT_PRIZES = dict(zip(EUROMILLIONS_TIERS, (17000000, 250000, 30000, 2000, 150, 60, 50, 15, 10, 9, 8, 6, 4)))
+
+
+def _bins(values):
+    """
+    Histogram bin of each non-negative value: 0 for zero, else 1 + floor(log(value) / log(1 + precision))
+    offset so that bins stay positive for values down to 1e-6. Smaller values are counted as zero (bin 0).
+    """
+    bins = np.zeros(values.shape, dtype=np.int64)
+    positive = values > 0
+    bins[positive] = 1 + np.floor((np.log(values[positive]) - math.log(1e-6)) / math.log1p(BIN_PRECISION))
+    return np.maximum(bins, 0)
+
+
+def _bin_value(index):
+    if index == 0:
+        return 0.0
+    return 1e-6 * (1 + BIN_PRECISION) ** (index - 0.5)
+
+
+class ChunkStats:
+    """
+    Mergeable summary of simulated returns (payout / stake).
+    """
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.squares = 0.0
+        self.histogram = {}
+
+    @classmethod
+    def of(cls, returns):
+        stats = cls()
+        stats.count = len(returns)
+        stats.total = float(returns.sum())
+        stats.squares = float(np.dot(returns, returns))
+        bins, counts = np.unique(_bins(returns), return_counts=True)
+        stats.histogram = dict(zip(bins.tolist(), counts.tolist()))
+        return stats
+
+    def merge(self, other):
+        self.count += other.count
+        self.total += other.total
+        self.squares += other.squares
+        for index, count in other.histogram.items():
+            self.histogram[index] = self.histogram.get(index, 0) + count
+
+    def _value_at_rank(self, rank, bins):
+        seen = 0
+        for index in bins:
+            seen += self.histogram[index]
+            if seen >= rank:
+                return _bin_value(index)
+        return _bin_value(bins[-1])
+
+    def report(self):
+        mean = self.total / self.count
+        variance = max(0.0, self.squares / self.count - mean ** 2) * self.count / max(1, self.count - 1)
+        margin = Z_95 * math.sqrt(variance / self.count)
+        bins = sorted(self.histogram)
+        percentiles = {}
+        for name, fraction in PERCENTILES.items():
+            # Distribution-free interval: ranks of the order statistics bracketing the quantile
+            spread = Z_95 * math.sqrt(self.count * fraction * (1 - fraction))
+            rank = max(1, math.ceil(fraction * self.count))
+            percentiles[name] = {
+                "value": self._value_at_rank(rank, bins),
+                "ci95": [self._value_at_rank(max(1, math.floor(rank - spread)), bins),
+                         self._value_at_rank(min(self.count, math.ceil(rank + spread)), bins)],
+            }
+        return {"samples": self.count, "expected_return": mean, "expected_return_ci95": [mean - margin, mean + margin],
+                "variance": variance, "std": math.sqrt(variance), "percentiles": percentiles,
+                "max": _bin_value(bins[-1])}
+
+
+def simulate_lottery(rng, size, options):
+    """
+    Return per unit staked of `size` single-ticket draws.
+    """
+    lottery, prizes, price = options
+    main = rng.hypergeometric(lottery.main.k, lottery.main.n - lottery.main.k, lottery.main.k, size)
+    lucky = rng.hypergeometric(lottery.lucky.k, lottery.lucky.n - lottery.lucky.k, lottery.lucky.k, size)
+    table = np.zeros((lottery.main.k + 1, lottery.lucky.k + 1))
+    for (main_matched, lucky_matched), prize in prizes.items():
+        table[main_matched, lucky_matched] = prize / price
+    return table[main, lucky]
+
+
+def simulate_accumulators(rng, size, options):
+    """
+    Return per unit staked of `size` settled accumulators.
+    """
+    bet_options, margin = options
+    # Bets are drawn from their own stream of this chunk's RNG
+    legs, _, _, odds, leg_odds, _ = generate_chunk(bet_options, int(rng.integers(1 << 62)), 0, size)
+    lost = rng.random(len(leg_odds)) >= (1 - margin) / leg_odds
+    offsets = np.concatenate(([0], np.cumsum(legs)))
+    won = np.add.reduceat(lost, offsets[:-1]) == 0
+    return np.where(won, odds, 0.0)
+
+
+SIMULATIONS = {'lottery': simulate_lottery, 'accumulator': simulate_accumulators}
+
+
+def _run_chunk(job):
+    name, seed_sequence, size, options = job
+    return ChunkStats.of(SIMULATIONS[name](np.random.default_rng(seed_sequence), size, options))
+
+
+def chunk_size_for(name, options, memory=CHUNK_MEMORY):
+    """
+    Largest chunk of `name` simulations whose arrays fit in `memory` bytes.
+    """
+    if name == 'lottery':
+        per_sample = BYTES_PER_DRAW
+    else:
+        legs = options[0].legs
+        per_sample = BYTES_PER_LEG * (legs[0] + legs[1]) / 2
+    return max(1, int(memory // per_sample))
+
+
+def simulate(name, samples, options, seed=0, processes=None, chunk_size=None):
+    """
+    Run `samples` simulations of kind `name` ('lottery' or 'accumulator') and return the report.
+    `chunk_size` defaults to chunk_size_for(name, options).
+    """
+    if samples < 1:
+        raise ValueError(f'samples must be at least 1, got {samples}')
+    chunk_size = chunk_size or chunk_size_for(name, options)
+    sizes = [min(chunk_size, samples - start) for start in range(0, samples, chunk_size)]
+    streams = np.random.SeedSequence(seed).spawn(len(sizes))
+    jobs = [(name, stream, size, options) for stream, size in zip(streams, sizes)]
+    stats = ChunkStats()
+    processes = processes or os.cpu_count()
+    if processes > 1:
+        with multiprocessing.Pool(processes) as pool:
+            # In chunk order, so float sums are identical whatever the process count
+            for chunk in pool.imap(_run_chunk, jobs):
+                stats.merge(chunk)
+    else:
+        for job in jobs:
+            stats.merge(_run_chunk(job))
+    return stats.report()
+
+
+def exact_lottery_return(lottery, prizes, price):
+    """
+    Exact expected return per unit staked, from the prize tier probabilities.
+    """
+    return float(sum(lottery.tier_probability(*tier) * prize for tier, prize in prizes.items()) / price)
+
+
+def positive_count(value):
+    """
+    argparse type for sample and chunk counts; accepts '1e8'.
+    """
+    number = float(value)
+    if not number >= 1 or not number.is_integer():
+        raise argparse.ArgumentTypeError(f"must be a whole number of at least 1, got {value}")
+    return int(number)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Monte-Carlo payout simulation')
+    parser.add_argument('kind', choices=SIMULATIONS)
+    parser.add_argument('--samples', type=positive_count, default=100000000, help='draws or bets to simulate')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--processes', type=int, help='default: one per core')
+    parser.add_argument('--chunk-size', type=positive_count, help='samples per chunk, default: sized to fit 256 MB per process')
+    parser.add_argument('--prizes', help='JSON file {"main+lucky": prize}, e.g. {"5+2": 17000000, ...}')
+    parser.add_argument('--ticket-price', type=float, default=TICKET_PRICE)
+    parser.add_argument('--margin', type=float, default=0.05, help='bookmaker margin of accumulator legs')
+    parser.add_argument('--legs', type=int, nargs=2, default=(2, 8), metavar=('MIN', 'MAX'))
+    args = parser.parse_args()
+    started = time.perf_counter()
+    if args.kind == 'lottery':
+        prizes = DEFAULT_PRIZES
+        if args.prizes:
+            with open(args.prizes) as file:
+                prizes = {tuple(int(part) for part in tier.split('+')): prize for tier, prize in json.load(file).items()}
+        lottery = Lottery()
+        report = simulate('lottery', args.samples, (lottery, prizes, args.ticket_price), args.seed,
+                          args.processes, args.chunk_size)
+        report["exact_expected_return"] = exact_lottery_return(lottery, prizes, args.ticket_price)
+    else:
+        report = simulate('accumulator', args.samples, (BetOptions(legs=tuple(args.legs)), args.margin),
+                          args.seed, args.processes, args.chunk_size)
+    report["seconds"] = time.perf_counter() - started
+    print(json.dumps(report, indent=2))
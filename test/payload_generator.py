@@ -119,6 +119,53 @@ def odds_adjustment_calculation(odds, adjustment=None):
     else:
         return (odds - 1) * (100 - adjustment) / 100 + 1
 
+def batch_odds_adjustment(odds, adjustments=None, mask=None, offsets=None):
+    """
+        Vectorised `odds_adjustment_calculation` for many accumulators at once (NumPy).
+        Same per-leg arithmetic as the scalar function, so results match it within 1e-12 (relative).
+        @param `odds`: 2-D array (bets x legs), or 1-D array of all legs back to back when `offsets` is given.
+            -- type: float
+        @param `adjustments`: % adjustment per bet (1-D array, one per bet) or one value for every bet.
+            -- if None, each bet's odds are summed up (as the scalar function does).
+        @param `mask`: bool array shaped like `odds`, False for padding legs of shorter bets.
+        @param `offsets`: bets + 1 non-decreasing indices into a 1-D `odds`; bet i is odds[offsets[i]:offsets[i + 1]].
+            -- legs outside odds[offsets[0]:offsets[-1]] are ignored.
+        @return: 1-D float64 array - adjusted multiple (or sum) per bet
+    """
+    import numpy as np
+
+    odds = np.asarray(odds, dtype=np.float64)
+    if offsets is not None:
+        offsets = np.asarray(offsets, dtype=np.int64)
+        legs = np.diff(offsets)
+        if len(offsets) == 0 or (legs < 0).any() or offsets[0] < 0 or offsets[-1] > len(odds):
+            raise ValueError(f'offsets must be non-decreasing indices into the {len(odds)} odds')
+        # Rebase onto the legs actually covered
+        odds = odds[offsets[0]:offsets[-1]]
+        offsets = offsets - offsets[0]
+        if adjustments is None:
+            legs_values = odds
+        else:
+            per_leg = np.repeat(np.broadcast_to(np.asarray(adjustments, dtype=np.float64), legs.shape), legs)
+            legs_values = (odds - 1) * (100 - per_leg) / 100 + 1
+        reduce = np.add if adjustments is None else np.multiply
+        # reduceat needs in-range starts and returns an element (not the identity) for empty bets
+        results = np.full(legs.shape, 0.0 if adjustments is None else 1.0)
+        filled = legs > 0
+        if filled.any():
+            results[filled] = reduce.reduceat(legs_values, offsets[:-1][filled])
+        return results
+    if adjustments is None:
+        return np.where(mask, odds, 0.0).sum(axis=1) if mask is not None else odds.sum(axis=1)
+    adjustments = np.asarray(adjustments, dtype=np.float64)
+    if adjustments.ndim == 1:
+        adjustments = adjustments[:, None]
+    adjusted = (odds - 1) * (100 - adjustments) / 100 + 1
+    if mask is not None:
+        # 1 is neutral in the product
+        adjusted = np.where(mask, adjusted, 1.0)
+    return adjusted.prod(axis=1)
+
 def build_payload_for_multiple_bets(data, adjustment=None):
     """
         Build multiple offer payload.
@@ -207,21 +254,22 @@ def generate_numbers():
     
     return main_numbers, lucky_numbers
 
-# Example usage
-main_numbers, lucky_numbers = generate_numbers()
-print("Main Numbers:", main_numbers)
-print("Lucky Numbers:", lucky_numbers)
-
 def calculate_combinations(n, k):
     return math.comb(n, k)
 
-total_combinations = calculate_combinations(50, 5) * calculate_combinations(12, 2)
+if __name__ == '__main__':
+    # Example usage
+    main_numbers, lucky_numbers = generate_numbers()
+    print("Main Numbers:", main_numbers)
+    print("Lucky Numbers:", lucky_numbers)
+
+    total_combinations = calculate_combinations(50, 5) * calculate_combinations(12, 2)
 
-# Format with commas as thousand separators
-formatted_with_commas = f"{total_combinations:,}"
+    # Format with commas as thousand separators
+    formatted_with_commas = f"{total_combinations:,}"
 
-print("Total number of combinations (with commas):", formatted_with_commas)
+    print("Total number of combinations (with commas):", formatted_with_commas)
 
-odds_values = [1.340, 5.750, 1.610]
-# print(json.dumps(build_payload_for_multiple_bets(payload, 50), indent=4))
-# print(odds_adjustment_calculation(odds_values, 50))
+    odds_values = [1.340, 5.750, 1.610]
+    # print(json.dumps(build_payload_for_multiple_bets(payload, 50), indent=4))
+    # print(odds_adjustment_calculation(odds_values, 50))
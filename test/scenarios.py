@@ -0,0 +1,176 @@
+"""
+Scenario load tests: weighted mixes of chained request flows (user journeys).
+
+A scenario file (JSON, or YAML with PyYAML installed) describes journeys as
+steps. Strings in a step's path, headers and JSON body may reference variables
+as {{name}}; a string that is only '{{name}}' is replaced by the variable's
+value with its JSON type. Variables come from the scenario's 'vars', the
+built-ins 'index' (journey number) and 'uuid' (one per journey), and values
+extracted from earlier responses ('extract': {variable: dotted.json.path}).
+
+    base_url: http://127.0.0.1:5000
+    scenarios:
+      - name: neteller deposit
+        weight: 3
+        vars: {amount: 10}
+        steps:
+          - name: deposit
+            method: POST
+            path: /cashier/neteller/deposit
+            json: {amount: "{{amount}}", email: "user{{index}}@example.com"}
+            extract: {internal_id: internalId}
+            think: [0.1, 0.5]            # seconds, fixed or [min, max]
+          - name: finish payment
+            method: POST
+            path: /mercury/api2/cashier/neteller/paysafe/finishPayment/{{internal_id}}
+            expect: [200, 409]           # default: any status below 400
+
+Journeys start at the times of the arrival schedule and are run by the
+LoadEngine worker threads (think times hold a worker, so size --concurrency
+for rate x journey duration). Every step is reported under
+'<scenario>/<step>', the whole journey under '<scenario>'. The first step's
+latency is measured from the journey's intended start (coordinated omission
+correction); a failed step ends its journey.
+
+    python scenarios.py cashier_journeys.yaml --rate 200 --duration 60 --concurrency 256
+"""
+import argparse, json, random, re, time, uuid
+
+from concurrent_request import LoadEngine, add_arrival_arguments, arrivals, write_summary
+
+VARIABLE = re.compile(r'\{\{\s*([A-Za-z_][A-Za-z0-9_]*)\s*\}\}')
+
+
+class ScenarioError(ValueError):
+    """Raised for an invalid scenario definition."""
+
+
+def load_scenarios(path):
+    """
+    Read a scenario file. Returns (base_url, [scenario dict]).
+    """
+    with open(path) as file:
+        if path.endswith(('.yaml', '.yml')):
+            try:
+                import yaml
+            except ImportError:
+                raise ScenarioError(f"PyYAML is required to load {path} (pip install pyyaml)")
+            data = yaml.safe_load(file)
+        else:
+            data = json.load(file)
+    scenarios = data.get('scenarios') or []
+    if not scenarios:
+        raise ScenarioError(f'{path} defines no scenarios')
+    for scenario in scenarios:
+        if not scenario.get('name') or not scenario.get('steps'):
+            raise ScenarioError(f"Every scenario needs a 'name' and 'steps': {scenario}")
+        for step in scenario['steps']:
+            if not step.get('path'):
+                raise ScenarioError(f"Step of scenario '{scenario['name']}' has no 'path': {step}")
+            step.setdefault('name', f"{step.get('method', 'GET').upper()} {step['path']}")
+    return data.get('base_url', ''), scenarios
+
+
+def render(value, variables):
+    """
+    Substitute {{name}} references in `value` (any JSON value) with `variables`.
+    """
+    if isinstance(value, str):
+        whole = VARIABLE.fullmatch(value)
+        if whole:
+            return variables[whole.group(1)]
+        return VARIABLE.sub(lambda match: str(variables[match.group(1)]), value)
+    if isinstance(value, dict):
+        return {key: render(item, variables) for key, item in value.items()}
+    if isinstance(value, list):
+        return [render(item, variables) for item in value]
+    return value
+
+
+def extract(body, path):
+    """
+    Value at dotted `path` in a parsed JSON body ('links.0.href'), or None.
+    """
+    for part in path.split('.'):
+        if isinstance(body, list) and part.isdigit() and int(part) < len(body):
+            body = body[int(part)]
+        elif isinstance(body, dict):
+            body = body.get(part)
+        else:
+            return None
+    return body
+
+
+def think_time(think):
+    if not think:
+        return 0
+    if isinstance(think, (list, tuple)):
+        return random.uniform(think[0], think[1])
+    return think
+
+
+class ScenarioEngine(LoadEngine):
+    """
+    LoadEngine whose jobs are journeys drawn from a weighted mix of `scenarios`.
+    """
+    def __init__(self, base_url, scenarios, concurrency=64, headers=None, timeout=30, bucket_seconds=1):
+        super().__init__(base_url, concurrency=concurrency, headers=headers, timeout=timeout, label='journey',
+                         bucket_seconds=bucket_seconds)
+        self.base_url = base_url.rstrip('/')
+        self.scenarios = scenarios
+        self.weights = [scenario.get('weight', 1) for scenario in scenarios]
+
+    def perform(self, worker, index, intended):
+        scenario = random.choices(self.scenarios, self.weights)[0]
+        name = scenario['name']
+        variables = {**scenario.get('vars', {}), "index": index, "uuid": str(uuid.uuid4())}
+        success = True
+        step_intended = intended
+        started = time.perf_counter()
+        for step in scenario['steps']:
+            try:
+                kwargs = {"headers": render(step['headers'], variables)} if step.get('headers') else {}
+                if 'json' in step:
+                    kwargs['json'] = render(step['json'], variables)
+                url = self.base_url + render(step['path'], variables)
+            except KeyError as err:
+                print(f"Scenario '{name}' step '{step['name']}' uses undefined variable {err}")
+                success = False
+                break
+            response, success = worker.request(f"{name}/{step['name']}", step.get('method', 'GET').upper(), url,
+                                               step_intended, **kwargs)
+            expected = step.get('expect')
+            if response is not None and expected is not None:
+                success = response.status_code in (expected if isinstance(expected, list) else [expected])
+            if success and step.get('extract'):
+                try:
+                    body = response.json()
+                except ValueError:
+                    body = None
+                for variable, path in step['extract'].items():
+                    variables[variable] = extract(body, path)
+                    if variables[variable] is None:
+                        success = False
+            if not success:
+                break
+            pause = think_time(step.get('think'))
+            if pause:
+                time.sleep(pause)
+            step_intended = time.perf_counter()
+        worker.record(name, intended, started, time.perf_counter(), success)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Scenario (user journey) load generator')
+    parser.add_argument('scenarios', help='JSON/YAML scenario file')
+    parser.add_argument('--base-url', help="overrides the file's base_url")
+    parser.add_argument('--header', action='append', default=[], help='Name: value sent on every step (repeatable)')
+    add_arrival_arguments(parser)
+    args = parser.parse_args()
+    base_url, scenarios = load_scenarios(args.scenarios)
+    headers = dict(header.split(':', 1) for header in args.header)
+    engine = ScenarioEngine(args.base_url or base_url, scenarios, args.concurrency,
+                            {name.strip(): value.strip() for name, value in headers.items()})
+    recorder, elapsed = engine.run(arrivals(args.arrival, args.rate, args.duration, args.ramp_to, args.seed),
+                                   args.csv_out)
+    write_summary(recorder, elapsed, args.json_out)
@@ -0,0 +1,49 @@
+import io
+from collections import Counter
+
+import pytest
+
+np = pytest.importorskip('numpy')
+
+from bet_generator import BetOptions, generate_bets, generate_chunk, read_binary, sample_runners, write_bets
+
+
+def runner_ids(bet):
+    return [leg['runnerId'] for leg in bet['bets'][0]['multiplierBetLegs']]
+
+
+def test_runners_are_distinct_within_each_bet():
+    options = BetOptions(legs=(2, 8), runners=8, runner_base=100)
+    for bet in generate_bets(2000, options, seed=1, chunk_size=300):
+        ids = runner_ids(bet)
+        assert len(set(ids)) == len(ids) and all(100 <= runner < 108 for runner in ids)
+
+
+def test_runner_sampling_is_uniform():
+    rng = np.random.default_rng(5)
+    legs = np.full(60000, 2)
+    pairs = sample_runners(rng, legs, 4).reshape(-1, 2)
+    # Every unordered pair of 4 runners is equally likely: 6 pairs, 10000 expected each
+    counts = Counter(tuple(sorted(pair)) for pair in pairs.tolist())
+    assert len(counts) == 6 and all(9500 < count < 10500 for count in counts.values())
+    # Runners of a bet are not an arithmetic progression
+    bets = generate_chunk(BetOptions(legs=(3, 3)), 0, 0, 1000)[5].reshape(-1, 3)
+    assert (np.diff(bets, axis=1)[:, 0] != np.diff(bets, axis=1)[:, 1]).mean() > 0.9
+
+
+@pytest.mark.parametrize('output_format', ['ndjson', 'binary'])
+def test_output_does_not_depend_on_process_count(output_format):
+    outputs = []
+    for processes in (1, 3):
+        output = io.BytesIO()
+        write_bets(output, 1000, output_format=output_format, seed=42, processes=processes, chunk_size=64)
+        outputs.append(output.getvalue())
+    assert outputs[0] == outputs[1]
+
+
+def test_binary_round_trip():
+    options = BetOptions(legs=(1, 5), platform='uk')
+    output = io.BytesIO()
+    write_bets(output, 500, options, output_format='binary', seed=9, chunk_size=128)
+    output.seek(0)
+    assert list(read_binary(output, platform='uk')) == list(generate_bets(500, options, seed=9, chunk_size=128))
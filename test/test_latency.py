@@ -0,0 +1,68 @@
+import importlib.util
+import os
+import random
+
+import pytest
+
+import latency
+from latency import LatencyHistogram, LatencyRecorder
+
+METRICS_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'mock-server', 'metrics.py')
+
+
+def load_metrics():
+    spec = importlib.util.spec_from_file_location('mock_server_metrics', METRICS_PATH)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+@pytest.fixture(params=['latency', 'metrics'])
+def buckets(request):
+    return latency if request.param == 'latency' else load_metrics()
+
+
+def test_buckets_cover_values_in_order(buckets):
+    previous_high = -1
+    for index in range(buckets.BUCKET_COUNT):
+        low, high = buckets.bucket_bounds(index)
+        assert low == previous_high + 1 and high >= low
+        previous_high = high
+
+
+def test_values_land_in_their_bucket(buckets):
+    rng = random.Random(3)
+    highest = buckets.bucket_bounds(buckets.BUCKET_COUNT - 1)[1]
+    values = list(range(4 * buckets.SUB_BUCKETS)) + [rng.randrange(highest) for _ in range(5000)]
+    for value in values:
+        low, high = buckets.bucket_bounds(buckets.bucket_index(value))
+        assert low <= value <= high
+        assert high - low <= value / buckets.SUB_BUCKETS
+
+
+def test_values_past_the_last_bucket_are_clamped(buckets):
+    assert buckets.bucket_index(1 << 60) == buckets.BUCKET_COUNT - 1
+
+
+def test_value_at_is_within_precision():
+    histogram = LatencyHistogram()
+    values = list(range(1, 100001))
+    for value in values:
+        histogram.record(value)
+    for fraction in (0.5, 0.95, 0.99):
+        exact = values[round(fraction * len(values)) - 1]
+        assert exact <= histogram.value_at(fraction) <= exact * (1 + 1 / latency.SUB_BUCKETS)
+    assert histogram.value_at(1) == 100000 and LatencyHistogram().value_at(0.5) == 0
+
+
+def test_recorders_merge_and_round_trip():
+    first, second = LatencyRecorder(), LatencyRecorder()
+    first.record('deposit', 0.2, 0.010, 0.008, True, 100)
+    second.record('deposit', 1.5, 0.030, 0.020, False, 50)
+    second.record('login', 1.7, 0.001, 0.001, True)
+    first.merge(LatencyRecorder.from_dict(second.as_dict()))
+    summary = first.summary(2)
+    assert summary['total']['requests'] == 3 and summary['total']['errors'] == 1
+    assert summary['labels']['deposit']['bytes'] == 150
+    assert summary['labels']['deposit']['latency_ms']['max'] == 30
+    assert [bucket['start'] for bucket in summary['timeline']] == [0, 1]
@@ -0,0 +1,53 @@
+import itertools
+import math
+from fractions import Fraction
+
+import pytest
+
+np = pytest.importorskip('numpy')
+
+from lottery import IndexPermutation, Lottery
+
+
+@pytest.fixture(scope='module')
+def small():
+    return Lottery(main_pool=8, main_picks=3, lucky_pool=5, lucky_picks=2)
+
+
+def test_rank_is_a_dense_bijection(small):
+    tickets = [(list(main), list(lucky)) for main in itertools.combinations(range(1, 9), 3)
+               for lucky in itertools.combinations(range(1, 6), 2)]
+    ranks = small.rank_many([main for main, _ in tickets], [lucky for _, lucky in tickets])
+    assert sorted(ranks.tolist()) == list(range(small.total)) == list(range(len(tickets)))
+    main, lucky = small.unrank_many(ranks)
+    assert [(m, l) for m, l in zip(main.tolist(), lucky.tolist())] == tickets
+
+
+def test_rank_ignores_number_order():
+    lottery = Lottery()
+    assert lottery.rank([50, 1, 17, 3, 22], [12, 1]) == lottery.rank([1, 3, 17, 22, 50], [1, 12])
+    assert lottery.unrank(lottery.total - 1) == ([46, 47, 48, 49, 50], [11, 12])
+    assert lottery.unrank(0) == ([1, 2, 3, 4, 5], [1, 2])
+
+
+@pytest.mark.parametrize('size', [1, 2, 7, 1000, 4097])
+def test_index_permutation_is_a_bijection(size):
+    permuted = IndexPermutation(size, seed=5)(np.arange(size, dtype=np.uint64))
+    assert sorted(permuted.tolist()) == list(range(size))
+
+
+def test_unique_tickets_are_distinct_and_reproducible(small):
+    first = [small.rank_many(main, lucky).tolist() for main, lucky in small.unique_tickets(small.total, 9, 100)]
+    again = [small.rank_many(main, lucky).tolist() for main, lucky in small.unique_tickets(small.total, 9, 100)]
+    flat = [rank for chunk in first for rank in chunk]
+    assert first == again and sorted(flat) == list(range(small.total))
+    with pytest.raises(ValueError):
+        next(small.unique_tickets(small.total + 1))
+
+
+def test_tier_probabilities_are_exact():
+    lottery = Lottery()
+    every_outcome = {(main, lucky): lottery.tier_probability(main, lucky) for main in range(6) for lucky in range(3)}
+    assert sum(every_outcome.values()) == 1
+    assert lottery.prize_probabilities()[(5, 2)] == every_outcome[(5, 2)] == Fraction(1, lottery.total)
+    assert lottery.total == math.comb(50, 5) * math.comb(12, 2)
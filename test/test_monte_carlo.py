@@ -0,0 +1,41 @@
+import math
+
+import pytest
+
+np = pytest.importorskip('numpy')
+
+from bet_generator import BetOptions
+from lottery import Lottery
+from monte_carlo import _bins, exact_lottery_return, simulate
+
+
+def assert_close(report, exact):
+    # Fixed seeds, so this is deterministic; 4 standard errors leaves room for other seeds
+    assert abs(report['expected_return'] - exact) < 4 * report['std'] / math.sqrt(report['samples'])
+
+
+def test_lottery_mean_matches_the_exact_return():
+    lottery = Lottery(main_pool=8, main_picks=3, lucky_pool=5, lucky_picks=2)
+    prizes = {(3, 2): 500, (3, 1): 50, (3, 0): 20, (2, 2): 10, (2, 1): 3, (1, 2): 2}
+    options = (lottery, prizes, 2.0)
+    report = simulate('lottery', 200000, options, seed=7, processes=1, chunk_size=50000)
+    assert_close(report, exact_lottery_return(lottery, prizes, 2.0))
+    # Same chunks and seed, same result whatever the process count
+    assert simulate('lottery', 200000, options, seed=7, processes=2, chunk_size=50000) == report
+
+
+def test_accumulator_mean_matches_the_exact_return():
+    # Unadjusted two-leg bets: each leg returns (1 - margin) per unit staked on average
+    options = (BetOptions(legs=(2, 2), adjustments=(0,)), 0.05)
+    report = simulate('accumulator', 100000, options, seed=3, processes=1, chunk_size=25000)
+    assert_close(report, 0.95 ** 2)
+
+
+def test_non_positive_samples_are_rejected():
+    with pytest.raises(ValueError):
+        simulate('lottery', 0, (Lottery(), {}, 2.5), processes=1)
+
+
+def test_tiny_returns_fall_into_bin_zero():
+    bins = _bins(np.array([0.0, 1e-9, 1e-6, 1.0]))
+    assert bins[0] == bins[1] == 0 and 0 < bins[2] < bins[3]
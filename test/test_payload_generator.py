@@ -0,0 +1,52 @@
+import math
+
+import pytest
+
+np = pytest.importorskip('numpy')
+
+from payload_generator import batch_odds_adjustment, odds_adjustment_calculation
+
+BETS = [[1.737, 1.815, 1.892, 1.039, 2.56], [2.0], [1.5, 3.25, 1.01]]
+
+
+def flat(bets):
+    return np.array([odds for bet in bets for odds in bet]), np.cumsum([0] + [len(bet) for bet in bets])
+
+
+def padded(bets):
+    width = max(len(bet) for bet in bets)
+    odds = np.ones((len(bets), width))
+    mask = np.zeros((len(bets), width), dtype=bool)
+    for row, bet in enumerate(bets):
+        odds[row, :len(bet)] = bet
+        mask[row, :len(bet)] = True
+    return odds, mask
+
+
+@pytest.mark.parametrize('adjustments', [None, 25, [0, 10, 50]])
+def test_matches_scalar_function(adjustments):
+    per_bet = adjustments if isinstance(adjustments, list) else [adjustments] * len(BETS)
+    expected = [odds_adjustment_calculation(bet, adjustment) for bet, adjustment in zip(BETS, per_bet)]
+    odds, offsets = flat(BETS)
+    odds_2d, mask = padded(BETS)
+    for result in (batch_odds_adjustment(odds, adjustments, offsets=offsets),
+                   batch_odds_adjustment(odds_2d, adjustments, mask=mask)):
+        assert all(math.isclose(value, target, rel_tol=1e-12) for value, target in zip(result, expected))
+
+
+def test_empty_bets_get_the_identity():
+    odds = np.array([2.0, 3.0])
+    assert batch_odds_adjustment(odds, 0, offsets=[0, 0, 2, 2]).tolist() == [1.0, 6.0, 1.0]
+    assert batch_odds_adjustment(odds, offsets=[0, 0, 2, 2]).tolist() == [0.0, 5.0, 0.0]
+
+
+def test_offsets_covering_part_of_the_odds():
+    odds = np.array([9.0, 2.0, 3.0, 4.0, 9.0])
+    assert batch_odds_adjustment(odds, 0, offsets=[1, 3, 4]).tolist() == [6.0, 4.0]
+    assert batch_odds_adjustment(odds, offsets=[2, 4]).tolist() == [7.0]
+
+
+@pytest.mark.parametrize('offsets', [[0, 3, 2], [-1, 2], [0, 6], []])
+def test_invalid_offsets(offsets):
+    with pytest.raises(ValueError):
+        batch_odds_adjustment(np.ones(5), 10, offsets=offsets)